@@ -0,0 +1,26 @@
+# Cấu hình gunicorn cho production (ASGI, nhiều process):
+#   DJANGO_SETTINGS_MODULE=jobPortal.settings_prod gunicorn -c gunicorn.conf.py jobPortal.asgi:application
+# Mỗi worker là một process uvicorn (event loop riêng) phục vụ cả HTTP API và websocket ChatConsumer,
+# các worker dùng chung channel layer Redis nên tin nhắn giữa các socket ở worker khác nhau vẫn tới được.
+# Reload không gián đoạn: kill -HUP <pid master> (worker cũ xử lý xong request rồi mới thoát)
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# Worker async nên không cần 2*CPU+1 như worker đồng bộ, mặc định một worker cho mỗi core
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+# Thời gian chờ worker xử lý xong khi tắt/reload (websocket bị đóng sau thời gian này)
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+keepalive = 5
+
+# Thay worker định kỳ để tránh rò rỉ bộ nhớ, jitter để các worker không khởi động lại cùng lúc
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
@@ -1,14 +1,17 @@
 import os
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
-from jobs import routing
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'jobPortal.settings')
+django_asgi_app = get_asgi_application()
+
+# Import sau khi Django đã khởi tạo (jobs.auth dùng models)
+from jobs import routing
+from jobs.auth import TokenAuthMiddlewareStack
 
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
-    "websocket": AuthMiddlewareStack(
+    "http": django_asgi_app,
+    "websocket": TokenAuthMiddlewareStack(
         URLRouter(
             routing.websocket_urlpatterns
         )
@@ -82,7 +82,8 @@ CACHES = {
 
 
 # EMAIL_BACKEND = 'jobs.send-email.SendEmail'
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Khi test dùng 'django.core.mail.backends.locmem.EmailBackend' (SMTP giả, lưu mail trong bộ nhớ)
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
@@ -93,6 +94,9 @@ EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
 REDIS_HOST = 'localhost'  # Địa chỉ host của Redis
 REDIS_PORT = 6379         # Cổng mặc định của Redis
 
+# Hàng đợi tác vụ nền (jobs/tasks.py): True => chạy ngay trong request, không cần worker (test/dev)
+TASKS_ALWAYS_EAGER = os.environ.get('TASKS_ALWAYS_EAGER', default='0').lower() in ['true', '1', 't', 'y', 'yes']
+
 # Cho phép tất cả domain truy cập
 CORS_ALLOW_ALL_ORIGINS = True
 
@@ -113,6 +117,8 @@ MIDDLEWARE = [
     "debug_toolbar.middleware.DebugToolbarMiddleware",
     'corsheaders.middleware.CorsMiddleware',
     'oauth2_provider.middleware.OAuth2TokenMiddleware',
+    # Ghim người dùng vừa ghi dữ liệu vào primary (đọc lại thấy ngay dữ liệu của mình)
+    'jobs.db.router.ReplicaPinMiddleware',
 
 ]
 
@@ -154,17 +160,44 @@ TEMPLATES = [
 
 AUTH_USER_MODEL = 'jobs.User'
 
+# DATABASE_POOL_MAX_CONNECTIONS > 0 => dùng backend jobs.db.mysql_pool, giới hạn số kết nối MySQL mỗi process
+DATABASE_POOL_MAX_CONNECTIONS = int(os.environ.get('DATABASE_POOL_MAX_CONNECTIONS', default='0'))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        'ENGINE': 'jobs.db.mysql_pool' if DATABASE_POOL_MAX_CONNECTIONS else 'django.db.backends.mysql',
         'NAME': os.environ.get("DATABASE_NAME"),
         'USER': os.environ.get('DATABASE_USER'),
         'PASSWORD': os.environ.get('DATABASE_PASSWORD'),
         'HOST': os.environ.get('DATABASE_HOST', default=''),
         'PORT': os.environ.get('DATABASE_PORT', default='3306'),
+        # Giữ kết nối giữa các request (giây) thay vì bắt tay TCP + xác thực MySQL mỗi request
+        # Backend giới hạn kết nối cần CONN_MAX_AGE = 0 để đóng kết nối (trả chỗ) khi request kết thúc
+        'CONN_MAX_AGE': 0 if DATABASE_POOL_MAX_CONNECTIONS else int(
+            os.environ.get('DATABASE_CONN_MAX_AGE', default='60')),
+        # Kiểm tra kết nối cũ còn dùng được trước khi dùng lại (MySQL đóng kết nối sau wait_timeout)
+        'CONN_HEALTH_CHECKS': True,
+        'POOL_MAX_CONNECTIONS': DATABASE_POOL_MAX_CONNECTIONS,
+        'POOL_TIMEOUT': int(os.environ.get('DATABASE_POOL_TIMEOUT', default='10')),
     }
 }
 
+# Bản sao chỉ đọc (MySQL replica): có DATABASE_REPLICA_HOST thì thêm alias 'replica',
+# jobs.db.router gửi các truy vấn đọc an toàn sang đó (danh sách, thống kê)
+if os.environ.get('DATABASE_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ.get('DATABASE_REPLICA_NAME', DATABASES['default']['NAME']),
+        'USER': os.environ.get('DATABASE_REPLICA_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.environ.get('DATABASE_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+        'HOST': os.environ.get('DATABASE_REPLICA_HOST'),
+        'PORT': os.environ.get('DATABASE_REPLICA_PORT', DATABASES['default']['PORT']),
+        # Khi chạy test, replica dùng chung cơ sở dữ liệu test của default
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['jobs.db.router.PrimaryReplicaRouter']
+
 #
 # DATABASES = {
 #     'default': {
@@ -235,12 +268,22 @@ STATICFILES_DIRS = [
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
 OAUTH2_PROVIDER = {
-    'OAUTH2_BACKEND_CLASS': 'oauth2_provider.oauth2_backends.JSONOAuthLibCore'
+    'OAUTH2_BACKEND_CLASS': 'oauth2_provider.oauth2_backends.JSONOAuthLibCore',
+    # Cache kết quả xác thực access token (Redis + LRU trong process), xem jobs/auth.py
+    'OAUTH2_VALIDATOR_CLASS': 'jobs.auth.CachedOAuth2Validator',
 }
 
 SITE_URL ='http://localhost:3000'
 
+# Tỉ giá quy đổi lương USD sang VNĐ khi phân tích chuỗi lương (jobs/salary.py)
+SALARY_USD_TO_VND = int(os.environ.get('SALARY_USD_TO_VND', default='25000'))
+
 STRIPE_SECRET_KEY = os.environ.get("STRIPE_SECRET_KEY")
+# Secret ký webhook (whsec_...) của endpoint /payment_stripe/webhook/
+# Không có giá trị mặc định: chưa cấu hình thì webhook trả 503 thay vì chấp nhận chữ ký với khóa rỗng
+STRIPE_WEBHOOK_SECRET = os.environ.get("STRIPE_WEBHOOK_SECRET")
+# 'fake' => dùng Stripe giả lập trong jobs/payments.py (test/dev, không gọi mạng)
+STRIPE_BACKEND = os.environ.get("STRIPE_BACKEND", "stripe")
 
 CSRF_TRUSTED_ORIGINS = [
     'http://localhost:3000',
@@ -0,0 +1,15 @@
+# Cấu hình chạy production: DJANGO_SETTINGS_MODULE=jobPortal.settings_prod
+# Kế thừa settings.py, bỏ các phần chỉ dùng khi phát triển (Debug toolbar, DEBUG)
+import os
+
+from jobPortal.settings import *  # noqa: F401,F403
+
+DEBUG = False
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app != 'debug_toolbar']
+MIDDLEWARE = [m for m in MIDDLEWARE if m != 'debug_toolbar.middleware.DebugToolbarMiddleware']
+
+# Chạy sau reverse proxy (nginx) kết thúc HTTPS
+SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+SESSION_COOKIE_SECURE = os.environ.get('SESSION_COOKIE_SECURE', default='1').lower() in ['true', '1', 't', 'y', 'yes']
+CSRF_COOKIE_SECURE = SESSION_COOKIE_SECURE
@@ -1,7 +1,6 @@
-import debug_toolbar
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include, re_path
-from jobPortal import settings
 from jobs.admin import my_admin_site
 from drf_yasg.views import get_schema_view
 from rest_framework import permissions
@@ -29,8 +28,6 @@ urlpatterns = [
     path('', include('jobs.urls')),
     # Phần custom lại
     path('myadmin/', my_admin_site.urls),
-    # Phần Debug Toolbar
-    path('__debug__/', include(debug_toolbar.urls)),
     # Phần của CKEditor
     re_path(r'^ckeditor/', include('ckeditor_uploader.urls')),
 
@@ -50,3 +47,8 @@ urlpatterns = [
     path('o/', include('oauth2_provider.urls', namespace='oauth2_provider')),
 ]
 
+# Phần Debug Toolbar (chỉ khi app được cài, cấu hình production không có)
+if 'debug_toolbar' in settings.INSTALLED_APPS:
+    import debug_toolbar
+
+    urlpatterns.append(path('__debug__/', include(debug_toolbar.urls)))
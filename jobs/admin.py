@@ -9,6 +9,7 @@ from ckeditor_uploader.widgets import CKEditorUploadingWidget
 import cloudinary
 from django.urls import path
 from jobs import dao
+from jobs.db.router import read_from_replica
 from django.shortcuts import render
 from django.contrib.auth.models import Permission  # Phần chứng thực
 from oauth2_provider.models import AccessToken, Application, Grant, RefreshToken, IDToken
@@ -184,7 +185,7 @@ class JobAdmin(admin.ModelAdmin):
         # Nếu có mức lương được nhập vào trong thanh tìm kiếm
         if search_term.isdigit():
             salary = int(search_term)
-            queryset |= self.model.objects.filter(salary__gte=salary)
+            queryset |= self.model.objects.filter(salary_min__gte=salary)
 
         return queryset, use_distinct
 
@@ -290,11 +291,16 @@ class MyAdminSite(admin.AdminSite):
 
     # Cái này dẫn tới folder templates/
     def stats_view(self, request):
-        return TemplateResponse(request, 'admin/jobStats.html', {
-            'queryset': dao.count_job_application_quarter_career(),
-
-            'femaleApply': dao.recruitment_posts_with_female_applicants(),
-        })
+        # Trang thống kê chỉ đọc: truy vấn trên replica, số liệu lấy từ các bảng tổng hợp
+        with read_from_replica():
+            response = TemplateResponse(request, 'admin/jobStats.html', {
+                'queryset': dao.count_job_application_quarter_career(),
+
+                'femaleApply': dao.recruitment_posts_with_female_applicants(),
+                'monthApply': dao.count_job_applications_per_month(),
+                'careerPosts': dao.count_recruitment_posts_by_career(),
+            })
+            return response.render()
 
     # Cái này dẫn tới folder templates/
     def search_by_salary(self, request):
@@ -0,0 +1,161 @@
+import copy
+import threading
+from urllib.parse import parse_qs
+
+from cachetools import TTLCache
+
+from channels.auth import AuthMiddlewareStack
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.utils import timezone
+from oauth2_provider.models import AccessToken, Application
+from oauth2_provider.oauth2_validators import OAuth2Validator
+
+from jobs.models import User
+
+# Cache token -> {id, user_id, application_id, scope, expires} trong Redis,
+# thời gian sống không vượt quá AccessToken.expires
+TOKEN_CACHE_TIMEOUT = 300  # Giây
+# Thêm một LRU nhỏ trong process với TTL ngắn: middleware và DRF cùng xác thực một token
+# trong một request nên lần thứ hai không cần tới Redis/DB
+TOKEN_LOCAL_CACHE_SIZE = 1024
+TOKEN_LOCAL_CACHE_TTL = 10  # Giây
+
+_local_tokens = TTLCache(maxsize=TOKEN_LOCAL_CACHE_SIZE, ttl=TOKEN_LOCAL_CACHE_TTL)
+_local_applications = TTLCache(maxsize=64, ttl=TOKEN_CACHE_TIMEOUT)
+_local_lock = threading.Lock()
+
+
+def token_cache_key(token):
+    return f'oauth2_token:{token}'
+
+
+def _token_info(access_token):
+    return {
+        'id': access_token.id,
+        'user_id': access_token.user_id,
+        'application_id': access_token.application_id,
+        'scope': access_token.scope,
+        'expires': access_token.expires,
+    }
+
+
+def cache_token_info(access_token):
+    info = _token_info(access_token)
+    timeout = min(TOKEN_CACHE_TIMEOUT, int((info['expires'] - timezone.now()).total_seconds()))
+    if timeout > 0:
+        cache.set(token_cache_key(access_token.token), info, timeout)
+    return info
+
+
+# Lấy thông tin token từ cache, nếu chưa có thì truy vấn AccessToken một lần rồi lưu lại
+# Trả về None nếu token không tồn tại hoặc đã hết hạn
+def get_token_info(token):
+    info = cache.get(token_cache_key(token))
+    if info is None:
+        access_token = AccessToken.objects.filter(token=token) \
+            .only('id', 'token', 'user_id', 'application_id', 'scope', 'expires').first()
+        if access_token is None:
+            return None
+        info = cache_token_info(access_token)
+
+    if info['user_id'] is None or info['expires'] <= timezone.now():
+        return None
+    return info
+
+
+# Gọi khi token bị thu hồi/làm mới (chỉ xóa được LRU của process hiện tại, process khác hết hạn sau TTL)
+def invalidate_token(token):
+    cache.delete(token_cache_key(token))
+    with _local_lock:
+        _local_tokens.pop(token, None)
+
+
+# Người dùng thay đổi (khóa tài khoản, đổi quyền) thì bỏ các token đang giữ user cũ trong LRU
+def invalidate_user_tokens(user_id):
+    with _local_lock:
+        for token, (info, user, application) in list(_local_tokens.items()):
+            if info['user_id'] == user_id:
+                _local_tokens.pop(token, None)
+
+
+def _get_application(application_id):
+    if application_id is None:
+        return None
+    with _local_lock:
+        application = _local_applications.get(application_id)
+    if application is None:
+        application = Application.objects.filter(pk=application_id).first()
+        with _local_lock:
+            _local_applications[application_id] = application
+    return application
+
+
+# Validator của django-oauth-toolkit dùng cho cả OAuth2TokenMiddleware và OAuth2Authentication của DRF:
+# LRU trong process -> Redis (chỉ lấy User theo khóa chính) -> truy vấn gốc (join user, application)
+class CachedOAuth2Validator(OAuth2Validator):
+    def _load_access_token(self, token):
+        with _local_lock:
+            entry = _local_tokens.get(token)
+
+        if entry is None:
+            info = cache.get(token_cache_key(token))
+            if info is not None:
+                user = User.objects.filter(pk=info['user_id']).first() if info['user_id'] else None
+                entry = (info, user, _get_application(info['application_id']))
+            else:
+                access_token = super()._load_access_token(token)
+                if access_token is None:
+                    return None
+                entry = (cache_token_info(access_token), access_token.user, access_token.application)
+            with _local_lock:
+                _local_tokens[token] = entry
+
+        info, user, application = entry
+        # Mỗi request nhận bản sao riêng để không chia sẻ instance giữa các luồng
+        access_token = AccessToken(id=info['id'], token=token, user_id=info['user_id'],
+                                   application_id=info['application_id'], scope=info['scope'],
+                                   expires=info['expires'])
+        if user is not None:
+            access_token.user = copy.copy(user)
+        if application is not None:
+            access_token.application = application
+        return access_token
+
+
+@database_sync_to_async
+def get_user_for_token(token):
+    info = get_token_info(token)
+    if info is None:
+        return AnonymousUser()
+    return User.objects.filter(pk=info['user_id'], is_active=True).first() or AnonymousUser()
+
+
+# Token lấy từ query string (?token=...) vì trình duyệt không gửi được header cho websocket,
+# hoặc header Authorization: Bearer ... với các client khác
+def get_token_from_scope(scope):
+    token = parse_qs(scope.get('query_string', b'').decode()).get('token')
+    if token:
+        return token[0]
+    for name, value in scope.get('headers', []):
+        if name == b'authorization':
+            auth_type, _, credentials = value.decode().partition(' ')
+            if auth_type.lower() == 'bearer' and credentials:
+                return credentials.strip()
+    return None
+
+
+# Xác thực websocket bằng OAuth2 bearer token (một lần cho mỗi kết nối)
+class TokenAuthMiddleware(BaseMiddleware):
+    async def __call__(self, scope, receive, send):
+        token = get_token_from_scope(scope)
+        if token:
+            scope = dict(scope, user=await get_user_for_token(token))
+        return await super().__call__(scope, receive, send)
+
+
+# Session trước (trang admin), token ghi đè nếu có
+def TokenAuthMiddlewareStack(inner):
+    return AuthMiddlewareStack(TokenAuthMiddleware(inner))
@@ -1,61 +1,214 @@
+import asyncio
 import json
+import logging
+from django.db import IntegrityError, transaction
 from django.db.models import Q
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_datetime
 
+from jobs import dao, presence
 from .models import User, Room, Message
+from .serializers import RoomInboxSerializer
+
+logger = logging.getLogger(__name__)
+
+# Lịch sử chat được gửi theo từng trang (before_id/limit) thay vì toàn bộ phòng trong một frame
+HISTORY_PAGE_SIZE = 30
+HISTORY_MAX_PAGE_SIZE = 100
+
+# Hộp thư (user_chat_rooms) được phân trang theo (before_activity, before_id)
+INBOX_PAGE_SIZE = 20
+INBOX_MAX_PAGE_SIZE = 50
+
+# Kết nối dạng ws/chat/ (không có room_name) là kết nối dùng chung cho mọi phòng của người dùng,
+# tham gia nhóm user_<id> thay vì một nhóm chat_<room_name> cho mỗi socket
+def user_group(user_id):
+    return f'user_{user_id}'
+
+
+# Tin nhắn được gom lại và ghi bằng một câu bulk_create khi đủ số lượng hoặc hết thời gian chờ
+MESSAGE_BATCH_SIZE = 20
+MESSAGE_BATCH_INTERVAL = 0.5  # Giây
+# Ghi lô thất bại (DB lỗi, hết slot pool) thì giữ lại và thử lại với thời gian chờ tăng dần,
+# quá số lần này thì bỏ lô, ghi log và báo lỗi cho người gửi (on_failure)
+MESSAGE_FLUSH_ATTEMPTS = 5
+
+
+class MessageBatcher:
+    def __init__(self, batch_size=MESSAGE_BATCH_SIZE, interval=MESSAGE_BATCH_INTERVAL, on_failure=None,
+                 max_attempts=MESSAGE_FLUSH_ATTEMPTS):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.on_failure = on_failure
+        self.max_attempts = max_attempts
+        self.pending = []
+        self.attempts = 0
+        self._flush_task = None
+        self._lock = asyncio.Lock()
+
+    async def add(self, message):
+        self.pending.append(message)
+        # Đang chờ thử lại sau lỗi thì để tác vụ hẹn giờ ghi, không thử lại theo từng tin nhắn
+        if len(self.pending) >= self.batch_size and not self.attempts:
+            await self.flush()
+        elif self._flush_task is None:
+            self._schedule(self.interval)
+
+    def _schedule(self, delay):
+        self._flush_task = asyncio.ensure_future(self._flush_later(delay))
+        self._flush_task.add_done_callback(self._log_task_error)
+
+    @staticmethod
+    def _log_task_error(task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error('Flushing chat messages failed', exc_info=task.exception())
+
+    async def _flush_later(self, delay):
+        await asyncio.sleep(delay)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        async with self._lock:
+            if not self.pending:
+                return
+            # Chỉ bỏ lô khỏi pending sau khi ghi thành công (tin mới có thể được thêm vào trong lúc chờ)
+            batch = self.pending[:]
+            try:
+                await self.bulk_create(batch)
+            except Exception:
+                self.attempts += 1
+                if self.attempts < self.max_attempts:
+                    delay = self.interval * 2 ** self.attempts
+                    logger.warning('Saving %s chat messages failed, retrying in %ss', len(batch), delay,
+                                   exc_info=True)
+                    if self._flush_task is None:
+                        self._schedule(delay)
+                    return
+                logger.exception('Dropping %s chat messages after %s attempts', len(batch), self.attempts)
+                del self.pending[:len(batch)]
+                self.attempts = 0
+                if self.on_failure is not None:
+                    await self.on_failure(batch)
+                return
+            del self.pending[:len(batch)]
+            self.attempts = 0
+
+    @database_sync_to_async
+    def bulk_create(self, batch):
+        with transaction.atomic():
+            Message.objects.bulk_create(batch)
+            # Cập nhật tin nhắn cuối cho hộp thư (MySQL không trả id sau bulk_create nên dùng subquery)
+            dao.update_rooms_last_message({message.room_id for message in batch})
+
 
 class ChatConsumer(AsyncWebsocketConsumer):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # Cache id phòng chat theo (cặp người dùng, job) trong suốt kết nối
+        self.rooms = {}
+        # Người còn lại của mỗi phòng mà người dùng là thành viên (None: không phải thành viên)
+        self.room_peers = {}
+        self.message_batcher = MessageBatcher(on_failure=self.messages_not_saved)
+        self.user = None
+        self.user_id = None
+        self.room_group_name = None  # Kết nối cũ theo từng phòng (ws/chat/<room_name>/)
+        self.user_group_name = None  # Kết nối dùng chung (ws/chat/)
         self.list_event = {
                 "chat" : self.build_message_chat,
                 "previous_messages" : self.previous_messages,
-                "user_chat_rooms": self.user_chat_rooms
+                "user_chat_rooms": self.user_chat_rooms,
+                "mark_read": self.mark_read,
+                "heartbeat": self.heartbeat,
+                "presence": self.get_presence,
+                "typing": self.typing,
         }
 
     async def connect(self):
-        self.room_name = self.scope['url_route']['kwargs']['room_name']
-        self.room_group_name = f'chat_{self.room_name}'
-        print("self.room_name", self.room_name)
-        print("self.room_group_name", self.room_group_name)
-        await self.channel_layer.group_add(
-            self.room_group_name,
-            self.channel_name
-        )
+        # Người dùng được xác thực bằng OAuth2 token trong jobs.auth.TokenAuthMiddleware
+        self.user = self.scope.get('user')
+        if self.user is None or not self.user.is_authenticated:
+            await self.close()
+            return
+        self.user_id = self.user.id
+
+        room_name = self.scope['url_route']['kwargs'].get('room_name')
+        if room_name:
+            self.room_group_name = f'chat_{room_name}'
+            await self.channel_layer.group_add(self.room_group_name, self.channel_name)
+        else:
+            # Một socket, một nhóm cho tất cả các phòng chat của người dùng
+            self.user_group_name = user_group(self.user_id)
+            await self.channel_layer.group_add(self.user_group_name, self.channel_name)
+            await presence.touch(self.user_id, self.channel_name)
+
         await self.accept()
 
+    # Thông tin người gửi lấy từ scope (không truy vấn User cho mỗi tin nhắn)
+    def get_sender_info(self):
+        return {
+            'id': self.user.id,
+            'username': self.user.username,
+            'avatar': self.user.avatar.url if self.user.avatar else None,
+        }
+
 
     @database_sync_to_async
-    def get_previous_messages(self, sender_id, receiver_id, job_id):
-        try:
-            room = Room.objects.get(
-                (Q(sender_id=sender_id) & Q(receiver_id=receiver_id) |
-                 Q(sender_id=receiver_id) & Q(receiver_id=sender_id)) &
-                Q(job_id=job_id)
-            )
-            messages = Message.objects.filter(room=room).select_related('sender').order_by('created_at')
-            return [{
-                'message': msg.message,
-                'jobId': room.job.id,
-                'sender': {
-                    'id': msg.sender.id,
-                    'username': msg.sender.username,
-                    'avatar': msg.sender.avatar.url if msg.sender.avatar else None,
-                },
-                'sender_id': msg.sender.id,
-                'receiver_id': receiver_id
-            } for msg in messages]
-        except Room.DoesNotExist:
-            return []  # Return empty if room does not exist
+    def get_previous_messages(self, sender_id, receiver_id, job_id, before_id=None, limit=HISTORY_PAGE_SIZE):
+        room = Room.objects.filter(
+            (Q(sender_id=sender_id) & Q(receiver_id=receiver_id) |
+             Q(sender_id=receiver_id) & Q(receiver_id=sender_id)) &
+            Q(job_id=job_id)
+        ).only('id', 'sender_id', 'receiver_id').first()
+        if room is None:
+            return {'messages': [], 'senders': {}, 'has_more': False, 'before_id': None}
+
+        messages = Message.objects.filter(room=room)
+        if before_id:
+            messages = messages.filter(id__lt=before_id)
+        # Lấy dư 1 tin để biết còn trang cũ hơn hay không
+        page = list(messages.order_by('-id').values('id', 'message', 'sender_id', 'created_at')[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit][::-1]
+
+        # Thông tin người gửi chỉ gửi một lần cho mỗi trang
+        sender_ids = {msg['sender_id'] for msg in page}
+        senders = {
+            user.id: {
+                'id': user.id,
+                'username': user.username,
+                'avatar': user.avatar.url if user.avatar else None,
+            } for user in User.objects.filter(id__in=sender_ids).only('id', 'username', 'avatar')
+        }
+
+        return {
+            'messages': [{
+                'id': msg['id'],
+                'message': msg['message'],
+                'jobId': job_id,
+                'sender_id': msg['sender_id'],
+                'receiver_id': room.receiver_id if msg['sender_id'] == room.sender_id else room.sender_id,
+                'created_at': msg['created_at'],
+            } for msg in page],
+            'senders': senders,
+            'has_more': has_more,
+            # Client gửi lại before_id này để lấy trang cũ hơn
+            'before_id': page[0]['id'] if page else None,
+        }
 
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(
-            self.room_group_name,
-            self.channel_name
-        )
+        await self.message_batcher.flush()
+        if self.room_group_name:
+            await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        if self.user_group_name:
+            await self.channel_layer.group_discard(self.user_group_name, self.channel_name)
+            await presence.leave(self.user_id, self.channel_name)
 
     async def receive(self, text_data):
         message = json.loads(text_data)
@@ -64,108 +217,213 @@ class ChatConsumer(AsyncWebsocketConsumer):
         if event_handler:
             await event_handler(message)
 
+    # {"type": "previous_messages", "receiver_id", "jobId", "before_id"?, "limit"?}
     async def previous_messages(self, message):
-        sender_id = message.get('sender_id')
+        sender_id = self.user_id
         receiver_id = message.get('receiver_id')
         job_id = message.get('jobId')
+        # before_id/limit do client gửi: không phải số thì báo lỗi thay vì để lỗi truy vấn đóng kết nối
+        try:
+            before_id = int(message['before_id']) if message.get('before_id') is not None else None
+            limit = min(max(int(message.get('limit') or HISTORY_PAGE_SIZE), 1), HISTORY_MAX_PAGE_SIZE)
+        except (TypeError, ValueError):
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'error': 'invalid_previous_messages',
+                'detail': 'before_id and limit must be integers.',
+            }))
+            return
 
-        previous_msgs = await self.get_previous_messages(sender_id, receiver_id, job_id)
+        # Ghi các tin đang chờ trước để lịch sử đầy đủ
+        await self.message_batcher.flush()
+        history = await self.get_previous_messages(sender_id, receiver_id, job_id, before_id, limit)
 
         await self.send(text_data=json.dumps({
             'type': 'previous_messages',
-            'messages': previous_msgs
+            **history
         }, cls=DjangoJSONEncoder))
 
 
     async def build_message_chat(self, text_data_json):
         message = text_data_json.get('message', [])
         job_id = text_data_json.get('jobId', [])
-        sender_id = text_data_json.get('sender_id', [])
         receiver_id = text_data_json.get('receiver_id', [])
-        sender = text_data_json.get('sender', [])
-
-        # Kiểm tra hoặc tạo ChatRoom
-        room = await self.get_or_create_chatroom(sender_id, receiver_id, job_id)
-        # Lưu tin nhắn vào database
-        await self.save_message(room, sender_id, message, job_id)
-
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'chat_message',
-                'message': message,
-                'jobId': job_id,
-                'sender': sender,
-                'sender_id': sender_id,
-                'receiver_id': receiver_id,
-            }
-        )
+        # Người gửi luôn là người dùng đã xác thực của kết nối, không tin sender_id từ client
+        sender_id = self.user_id
+        sender = self.get_sender_info()
 
-    async def chat_message(self, event):
-        message = event['message']
-        job_id = event['jobId']
-        sender = event['sender']
-        sender_id = event['sender_id']
-        receiver_id = event['receiver_id']
+        # Kiểm tra hoặc tạo ChatRoom (chỉ truy vấn lần đầu, sau đó dùng cache của kết nối)
+        room_key = (frozenset((sender_id, receiver_id)), job_id)
+        room_id = self.rooms.get(room_key)
+        if room_id is None:
+            room_id = self.rooms[room_key] = await self.get_or_create_chatroom(sender_id, receiver_id, job_id)
+            self.room_peers[room_id] = receiver_id
+        # Lưu tin nhắn vào database (gom theo lô)
+        await self.save_message(room_id, sender_id, message, job_id)
+        await presence.clear_typing(room_id, sender_id)
 
-        await self.send(text_data=json.dumps({
+        event = {
+            'type': 'chat_message',
             'message': message,
+            'room_id': room_id,
             'jobId': job_id,
             'sender': sender,
             'sender_id': sender_id,
-            'receiver_id': receiver_id
+            'receiver_id': receiver_id,
+        }
+        # Gửi tới kết nối dùng chung của hai bên (mọi thiết bị), và nhóm phòng nếu là kết nối cũ
+        groups = {user_group(sender_id), user_group(receiver_id)}
+        if self.room_group_name:
+            groups.add(self.room_group_name)
+        for group in groups:
+            await self.channel_layer.group_send(group, event)
+
+    # Lô tin nhắn không ghi được vào database: báo cho người gửi (người nhận đã nhận qua group_send)
+    async def messages_not_saved(self, batch):
+        try:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'error': 'messages_not_saved',
+                'messages': [{'room_id': message.room_id, 'message': message.message} for message in batch],
+            }))
+        except Exception:
+            logger.warning('Could not notify user %s about unsaved messages', self.user_id, exc_info=True)
+
+    async def chat_message(self, event):
+        await self.send(text_data=json.dumps({
+            'message': event['message'],
+            'room_id': event.get('room_id'),
+            'jobId': event['jobId'],
+            'sender': event['sender'],
+            'sender_id': event['sender_id'],
+            'receiver_id': event['receiver_id']
         }))
 
+    # {"type": "heartbeat"}: gia hạn trạng thái online của kết nối
+    async def heartbeat(self, message):
+        if self.user_group_name:
+            await presence.touch(self.user_id, self.channel_name)
+
+    # {"type": "presence", "user_ids": [...]}
+    async def get_presence(self, message):
+        try:
+            user_ids = [int(user_id) for user_id in message.get('user_ids') or []][:INBOX_MAX_PAGE_SIZE]
+        except (TypeError, ValueError):
+            return
+        online = await presence.get_online(user_ids)
+        await self.send(text_data=json.dumps({
+            'type': 'presence',
+            'online': online,
+        }))
+
+    # {"type": "typing", "room_id"}: chỉ phát một lần mỗi presence.TYPING_TTL giây,
+    # tới người còn lại của phòng (receiver_id của client không được dùng)
+    async def typing(self, message):
+        if not self.user_group_name:
+            return
+        try:
+            room_id = int(message.get('room_id'))
+        except (TypeError, ValueError):
+            return
+        if room_id not in self.room_peers:
+            self.room_peers[room_id] = await self.get_room_peer(room_id)
+        receiver_id = self.room_peers[room_id]
+        if receiver_id is None:
+            return
+        if await presence.should_broadcast_typing(room_id, self.user_id):
+            await self.channel_layer.group_send(user_group(receiver_id), {
+                'type': 'chat_typing',
+                'room_id': room_id,
+                'sender_id': self.user_id,
+            })
+
+    async def chat_typing(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'typing',
+            'room_id': event['room_id'],
+            'sender_id': event['sender_id'],
+            'expires_in': presence.TYPING_TTL,
+        }))
+
+    # {"type": "user_chat_rooms", "before_activity"?, "before_id"?, "limit"?}
     async def user_chat_rooms(self, message):
-        user_id = message.get('user_id')
+        user_id = self.user_id
+        try:
+            limit = min(int(message.get('limit') or INBOX_PAGE_SIZE), INBOX_MAX_PAGE_SIZE)
+        except (TypeError, ValueError):
+            return
+        before_activity = parse_datetime(message['before_activity']) if message.get('before_activity') else None
+        before_id = message.get('before_id')
 
-        chat_rooms = await self.get_user_chat_rooms(user_id)
+        # Tin đang chờ phải được ghi trước để tin nhắn cuối/số chưa đọc chính xác
+        await self.message_batcher.flush()
+        inbox = await self.get_user_chat_rooms(user_id, before_activity, before_id, max(limit, 1))
 
         await self.send(text_data=json.dumps({
             'type': 'user_chat_rooms',
-            'rooms': chat_rooms
+            **inbox
         }, cls=DjangoJSONEncoder))
 
+    # {"type": "mark_read", "room_id", "message_id"?}
+    async def mark_read(self, message):
+        user_id = self.user_id
+        try:
+            room_id = int(message.get('room_id'))
+        except (TypeError, ValueError):
+            return
+        await self.message_batcher.flush()
+        await self.mark_room_read(room_id, user_id, message.get('message_id'))
+
     @database_sync_to_async
     def get_or_create_chatroom(self, sender_id, receiver_id, job_id):
-        sender = User.objects.get(id=sender_id)
-        receiver = User.objects.get(id=receiver_id)
-
-        # Tìm phòng chat không phân biệt thứ tự giữa sender và receiver
-        room = Room.objects.filter(
-            (Q(sender=sender) & Q(receiver=receiver)) | (Q(sender=receiver) & Q(receiver=sender)&
-        Q(job_id=job_id))
-        ).first()
+        # Tìm phòng chat không phân biệt thứ tự giữa sender và receiver (theo id, không cần lấy User)
+        pair = (Q(sender_id=sender_id) & Q(receiver_id=receiver_id)) | \
+               (Q(sender_id=receiver_id) & Q(receiver_id=sender_id))
+        room_id = Room.objects.filter(pair, job_id=job_id).values_list('id', flat=True).first()
 
         # Nếu không có phòng chat, tạo mới
-        if not room:
-            room = Room.objects.create(sender=sender, receiver=receiver, job_id=job_id)
+        if room_id is None:
+            try:
+                room_id = Room.objects.create(sender_id=sender_id, receiver_id=receiver_id, job_id=job_id).id
+            except IntegrityError:
+                # Mỗi cặp (sender, receiver) chỉ có một phòng: dùng lại phòng đã có
+                room_id = Room.objects.filter(pair).values_list('id', flat=True).first()
 
-        return room
+        return room_id
+
+    async def save_message(self, room_id, sender_id, message, job_id):
+        await self.message_batcher.add(Message(room_id=room_id, sender_id=sender_id, message=message, job_id=job_id))
 
     @database_sync_to_async
-    def save_message(self, room, sender_id, message, job_id):
-        sender = User.objects.get(id=sender_id)
-        Message.objects.create(room=room, sender=sender, message=message, job_id=job_id)
+    def get_user_chat_rooms(self, user_id, before_activity=None, before_id=None, limit=INBOX_PAGE_SIZE):
+        # Một truy vấn: phòng + job + người đối diện + tin nhắn cuối + số tin chưa đọc
+        rooms = dao.page_chat_inbox(user_id, before_activity, before_id, limit + 1)
+        has_more = len(rooms) > limit
+        rooms = rooms[:limit]
+        last = rooms[-1] if rooms else None
+        return {
+            'rooms': RoomInboxSerializer(rooms, many=True, context={'user_id': user_id}).data,
+            'has_more': has_more,
+            # Client gửi lại before_activity/before_id để lấy trang tiếp theo
+            'before_activity': last.last_activity if last else None,
+            'before_id': last.id if last else None,
+        }
 
+    # Người còn lại của phòng, None nếu người dùng không thuộc phòng này
     @database_sync_to_async
-    def get_user_chat_rooms(self, user_id):
-        try:
-            # Get rooms where the user is either the sender or receiver
-            rooms = Room.objects.filter(Q(sender_id=user_id) | Q(receiver_id=user_id)).distinct()
-
-            # Serialize the room data
-            return [{
-                'room_id': room.id,
-                'job_id': room.job.id,
-                'job_title': room.job.title,
-                'sender_user': {
-                    'id': room.receiver.id if room.sender.id == user_id else room.sender.id,
-                    'username': room.receiver.username if room.sender.id == user_id else room.sender.username,
-                    'avatar': (room.receiver.avatar.url if room.sender.id == user_id else room.sender.avatar.url) if (
-                                room.receiver.avatar or room.sender.avatar) else None,
-                }
-            } for room in rooms]
-        except Exception as e:
-            # Handle exceptions as needed
-            return {"error": str(e)}
\ No newline at end of file
+    def get_room_peer(self, room_id):
+        room = Room.objects.filter(Q(sender_id=self.user_id) | Q(receiver_id=self.user_id), pk=room_id) \
+            .values('sender_id', 'receiver_id').first()
+        if room is None:
+            return None
+        return room['receiver_id'] if room['sender_id'] == self.user_id else room['sender_id']
+
+    @database_sync_to_async
+    def mark_room_read(self, room_id, user_id, message_id=None):
+        room = Room.objects.filter(Q(sender_id=user_id) | Q(receiver_id=user_id), pk=room_id) \
+            .only('id', 'last_message_id').first()
+        if room is None:
+            return
+        message_id = message_id or room.last_message_id
+        if message_id:
+            dao.mark_room_read(room.id, user_id, int(message_id))
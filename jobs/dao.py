@@ -1,8 +1,11 @@
-from jobs.models import (JobApplication, Job, Company, JobSeeker, EmploymentType,
-                         Career, Invoice,
+from jobs.models import (Job, Company, JobSeeker, EmploymentType,
+                         Career, Invoice, Like, Room, Message, RoomReadCursor,
+                         ApplicationQuarterStat, ApplicationMonthStat, JobPostStat,
                          )
-from django.db.models import Count, Q, Avg
-from django.db.models.functions import ExtractQuarter, ExtractYear, TruncMonth
+from django.db.models import Count, Q, Avg, Exists, OuterRef, Value, BooleanField, F, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from jobs.db.router import read_alias
 
 #Truy vấn và trả về danh sách các hóa đơn đã thanh toán của người dùng.
 def get_paid_invoices(user):
@@ -13,60 +16,170 @@ def get_latest_paid_invoice(user_id):
     return Invoice.objects.filter(user_id=user_id, payment_status='paid').order_by('-payment_date').first()
 
 
+# Các hàm thống kê bên dưới đọc từ replica (read_alias), trừ khi người dùng đang bị ghim vào primary
+# Số liệu đếm lấy từ các bảng tổng hợp (jobs.stats) thay vì quét bảng đơn ứng tuyển/bài đăng
+
 # Theo đề bài: Viết câu truy vấn đếm số đơn ứng tuyển của sinh viên theo nghề qua các quý và năm
 def count_job_application_quarter_career():
-    queryset = JobApplication.objects.filter(is_student=True) \
-        .annotate(quarter=ExtractQuarter('date'), year=ExtractYear('date')) \
-        .values('job__career__name', 'quarter', 'year') \
-        .annotate(total_applications=Count('id')).order_by('total_applications', 'year', 'quarter')
+    queryset = ApplicationQuarterStat.objects.using(read_alias()).filter(is_student=True) \
+        .values('career__name', 'quarter', 'year') \
+        .annotate(total_applications=Sum('total')).filter(total_applications__gt=0) \
+        .order_by('total_applications', 'year', 'quarter')
 
     return queryset
 
 
+# Tìm các bài đăng tuyển dụng có mức lương tối thiểu lớn hơn hoặc bằng mức lương nhập vào
+def search_salary_recruiment_post(salary):
+    return Job.objects.using(read_alias()).filter(active=True, salary_min__gte=salary).order_by('salary_min', 'id')
+
+
 # Tìm danh sách các bài đăng tuyển dụng được sắp xếp theo số lượng apply giảm dần
+# Dùng bộ đếm application_count (có index active, -application_count, -id) thay vì Count mỗi request
 def recruiment_posts_by_appy():
-    return Job.objects.filter(active=True).annotate(
-                num_applications=Count('jobapplication')).order_by('-num_applications')
+    return Job.objects.filter(active=True).order_by('-application_count', '-id')
 
 # Đếm số lượng đơn ứng tuyển theo mỗi bài đăng tuyển dụng (id mình nhập vào)
 def count_apply_by_id_recruiment_post(id):
-    # Lấy bài đăng tuyển dụng theo pk (primary key)
-    job = Job.objects.get(pk=id)
-    # Đếm số lượng đơn ứng tuyển cho bài đăng này
-    return job.jobapplication_set.count()  # jobapplication_set : truy vấn ngược
+    # Đọc bộ đếm application_count của bài đăng (raise Job.DoesNotExist nếu không có)
+    return Job.objects.values_list('application_count', flat=True).get(pk=id)
+
+
+# Cập nhật nguyên tử các bộ đếm của bài đăng, vd: update_job_counters(job.id, application_count=1)
+def update_job_counters(job_id, **deltas):
+    Job.objects.filter(pk=job_id).update(**{field: F(field) + delta for field, delta in deltas.items()})
 
 
 # Đếm số lượng bài tuyển dụng của mỗi nhà tuyển dụng
 def count_recruitment_posts_per_employer():
-    return Company.objects.annotate(num_recruitment_posts=Count('job'))
+    return Company.objects.using(read_alias()).annotate(
+        num_recruitment_posts=Coalesce(Sum('jobpoststat__total'), 0))
 
 
 # Đếm số lượng đơn xin việc của mỗi ứng viên
 def count_job_applications_per_applicant():
-    return JobSeeker.objects.annotate(num_job_applications=Count('jobapplication'))
+    return JobSeeker.objects.using(read_alias()).annotate(num_job_applications=Count('jobapplication'))
 
 
 # Đếm số lượng bài tuyển dụng theo loại công việc
 def count_recruitment_posts_per_employment_type():
-    return EmploymentType.objects.annotate(num_recruitment_posts=Count('job'))
+    return EmploymentType.objects.using(read_alias()).annotate(
+        num_recruitment_posts=Coalesce(Sum('jobpoststat__total'), 0))
 
 
 # Đếm số lượng bài tuyển dụng theo ngành nghề
 def count_recruitment_posts_per_career():
-    return Career.objects.annotate(num_recruitment_posts=Count('job'))
+    return Career.objects.using(read_alias()).annotate(
+        num_recruitment_posts=Coalesce(Sum('jobpoststat__total'), 0))
 
 
 # Đếm số lượng đơn xin việc theo tháng
 def count_job_applications_per_month():
-    return JobApplication.objects.annotate(
-        month=TruncMonth('date')
-    ).values('month').annotate(
-        total_applications=Count('id')
-    )
+    return ApplicationMonthStat.objects.using(read_alias()).filter(total__gt=0) \
+        .values('month').annotate(total_applications=Sum('total')).order_by('month')
 
 # Đếm số bài tuyển dụng theo nghề
 def count_recruitment_posts_by_career():
-    return Job.objects.values('career__name').annotate(total_posts=Count('id'))
-
-
-
+    return JobPostStat.objects.using(read_alias()).values('career__name') \
+        .annotate(total_posts=Sum('total')).filter(total_posts__gt=0).order_by('-total_posts')
+
+
+# Các bài đăng có ứng viên nữ: số đơn của ứng viên nữ và tổng số đơn, nhiều ứng viên nữ nhất trước
+def recruitment_posts_with_female_applicants(limit=50):
+    return Job.objects.using(read_alias()).filter(gender_stats__gender=1, gender_stats__total__gt=0) \
+        .annotate(num_female_applicants=Sum('gender_stats__total'), total_applications=F('application_count')) \
+        .values('id', 'title', 'num_female_applicants', 'total_applications') \
+        .order_by('-num_female_applicants', 'id')[:limit]
+
+
+# Bảng tổng hợp ứng viên của nhà tuyển dụng: mỗi job một dòng với số đơn theo trạng thái và số đơn mới
+# từ thời điểm since, một truy vấn GROUP BY (chỉ mục job, status, date của JobApplication)
+# statuses: [Status, ...] -> mỗi trạng thái thành một cột đếm tên pipeline_status_key(status)
+# (đặt theo id: role là dữ liệu tự do, có thể chứa dấu cách/"__" hoặc trùng tên cột khác)
+def pipeline_status_key(status):
+    return f'status_{status.id}'
+
+
+def get_applicant_pipeline(company_id, statuses, since=None):
+    counts = {'total': Count('jobapplication')}
+    for status in statuses:
+        counts[pipeline_status_key(status)] = Count('jobapplication', filter=Q(jobapplication__status_id=status.id))
+    counts['new'] = Count('jobapplication', filter=Q(jobapplication__date__gt=since)) if since \
+        else Count('jobapplication')
+
+    return Job.objects.filter(company_id=company_id) \
+        .values('id', 'title', 'deadline', 'active') \
+        .annotate(**counts) \
+        .order_by('-id')
+
+
+# Lấy đối tượng thực hiện like của user (JobSeeker hoặc Company), None nếu chưa đăng nhập/không có hồ sơ
+def get_like_owner(user):
+    if user is None or not user.is_authenticated:
+        return None
+    return getattr(user, 'jobseeker', None) or getattr(user, 'company', None)
+
+
+def _owner_like_filter(owner):
+    return {f'{owner.__class__.__name__.lower()}_id': owner.id}
+
+
+# Gắn cờ liked của user hiện tại vào từng bài đăng bằng một subquery EXISTS (không tốn thêm truy vấn mỗi dòng)
+def annotate_liked(queryset, user):
+    owner = get_like_owner(user)
+    if owner is None:
+        return queryset.annotate(liked=Value(False, output_field=BooleanField()))
+    likes = Like.objects.filter(job=OuterRef('pk'), active=True, **_owner_like_filter(owner))
+    return queryset.annotate(liked=Exists(likes))
+
+
+# Kiểm tra user đã like một bài đăng chưa (dùng khi job không được annotate sẵn)
+def is_liked(job, user):
+    owner = get_like_owner(user)
+    if owner is None:
+        return False
+    return Like.objects.filter(job=job, active=True, **_owner_like_filter(owner)).exists()
+
+
+# HỘP THƯ CHAT
+# Cập nhật tin nhắn mới nhất/thời điểm hoạt động của các phòng vừa có tin nhắn mới
+def update_rooms_last_message(room_ids):
+    now = timezone.now()
+    for room_id in room_ids:
+        Room.objects.filter(pk=room_id).update(
+            last_message_id=Subquery(Message.objects.filter(room_id=room_id).order_by('-id').values('id')[:1]),
+            last_activity=now,
+        )
+
+
+# Danh sách phòng chat của user kèm người đối diện, job, tin nhắn cuối và số tin chưa đọc (một truy vấn)
+# Sắp xếp theo hoạt động gần nhất (last_activity, id) giảm dần
+def get_chat_inbox(user_id):
+    last_read = RoomReadCursor.objects.filter(room=OuterRef('pk'), user_id=user_id).values('last_read_message_id')[:1]
+    unread = Message.objects.filter(room=OuterRef('pk'), id__gt=OuterRef('last_read_id')) \
+        .exclude(sender_id=user_id).order_by().values('room').annotate(total=Count('id')).values('total')
+
+    return Room.objects.filter(Q(sender_id=user_id) | Q(receiver_id=user_id)) \
+        .select_related('job', 'sender', 'receiver', 'last_message') \
+        .annotate(last_read_id=Coalesce(Subquery(last_read), 0)) \
+        .annotate(unread_count=Coalesce(Subquery(unread), 0)) \
+        .order_by('-last_activity', '-id')
+
+
+# Phân trang keyset cho hộp thư: lấy các phòng hoạt động trước (before_activity, before_id)
+def page_chat_inbox(user_id, before_activity=None, before_id=None, limit=20):
+    rooms = get_chat_inbox(user_id)
+    if before_activity is not None and before_id is not None:
+        rooms = rooms.filter(Q(last_activity__lt=before_activity) |
+                             Q(last_activity=before_activity, id__lt=before_id))
+    return list(rooms[:limit])
+
+
+# Đánh dấu đã đọc tới message_id (chỉ tiến lên, không lùi lại)
+def mark_room_read(room_id, user_id, message_id):
+    updated = RoomReadCursor.objects.filter(room_id=room_id, user_id=user_id,
+                                            last_read_message_id__lt=message_id) \
+        .update(last_read_message_id=message_id)
+    if not updated:
+        RoomReadCursor.objects.get_or_create(room_id=room_id, user_id=user_id,
+                                             defaults={'last_read_message_id': message_id})
@@ -0,0 +1,55 @@
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.mysql import base
+from django.db.utils import OperationalError
+
+# Backend MySQL giới hạn số kết nối mở cùng lúc trong một process (ENGINE = 'jobs.db.mysql_pool')
+# Django giữ một kết nối cho mỗi luồng (CONN_MAX_AGE), nên số luồng xử lý request và luồng
+# database_sync_to_async có thể mở nhiều kết nối hơn max_connections của MySQL chia cho số worker.
+# Mỗi kết nối mới phải lấy một chỗ từ semaphore của alias, đóng kết nối thì trả chỗ lại;
+# hết chỗ thì chờ tối đa POOL_TIMEOUT giây rồi báo lỗi OperationalError.
+# Bắt buộc CONN_MAX_AGE = 0: Django chỉ đóng kết nối (trả chỗ) ở request_finished và quanh mỗi lời gọi
+# database_sync_to_async khi kết nối hết hạn; giữ kết nối lâu hơn thì luồng rảnh vẫn chiếm chỗ
+# và các luồng khác phải chờ dù DB không bận.
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    _slots = {}
+    _slots_lock = threading.Lock()
+
+    def __init__(self, settings_dict, *args, **kwargs):
+        if settings_dict.get('CONN_MAX_AGE'):
+            raise ImproperlyConfigured(
+                f"The pooled MySQL backend requires CONN_MAX_AGE = 0 (got {settings_dict['CONN_MAX_AGE']}), "
+                f"otherwise idle threads keep their connection slot.")
+        super().__init__(settings_dict, *args, **kwargs)
+
+    def _get_slots(self):
+        with self._slots_lock:
+            slots = self._slots.get(self.alias)
+            if slots is None:
+                slots = self._slots[self.alias] = threading.BoundedSemaphore(
+                    self.settings_dict.get('POOL_MAX_CONNECTIONS') or 10)
+            return slots
+
+    def get_new_connection(self, conn_params):
+        slots = self._get_slots()
+        if not slots.acquire(timeout=self.settings_dict.get('POOL_TIMEOUT', 10)):
+            raise OperationalError(f"No free database connection for '{self.alias}' "
+                                   f"(POOL_MAX_CONNECTIONS={self.settings_dict.get('POOL_MAX_CONNECTIONS')}).")
+        try:
+            connection = super().get_new_connection(conn_params)
+        except Exception:
+            slots.release()
+            raise
+        self._holds_slot = True
+        return connection
+
+    def _close(self):
+        try:
+            super()._close()
+        finally:
+            if getattr(self, '_holds_slot', False):
+                self._holds_slot = False
+                self._get_slots().release()
@@ -0,0 +1,107 @@
+import contextvars
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+# Định tuyến đọc sang bản sao (alias 'replica') cho các truy vấn an toàn
+# - Mặc định mọi truy vấn đi vào 'default' (primary), chỉ các đoạn được đánh dấu mới đọc từ replica:
+#   action list/retrieve của viewset có ReplicaReadMixin, trang thống kê admin, các hàm thống kê trong dao
+# - Người dùng vừa ghi (POST/PUT/PATCH/DELETE thành công) bị "ghim" vào primary trong PIN_SECONDS giây
+#   bằng một khóa trong cache, để đọc lại thấy ngay dữ liệu mình vừa ghi dù replica còn trễ
+# - Không cấu hình DATABASE_REPLICA_HOST thì không có alias 'replica', mọi thứ chạy trên primary
+REPLICA_ALIAS = 'replica'
+PIN_SECONDS = 5
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+_pinned = contextvars.ContextVar('pinned_to_primary', default=False)
+
+
+def pin_cache_key(user_id):
+    return f'db_pin:{user_id}'
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+# Alias dùng để đọc trong ngữ cảnh hiện tại
+def read_alias():
+    if not replica_configured() or _pinned.get() or connections['default'].in_atomic_block:
+        return 'default'
+    return REPLICA_ALIAS
+
+
+@contextmanager
+def read_from_replica():
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def pin_user(user_id):
+    cache.set(pin_cache_key(user_id), 1, PIN_SECONDS)
+
+
+def is_user_pinned(user_id):
+    return bool(cache.get(pin_cache_key(user_id)))
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get():
+            return read_alias()
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Hai alias là cùng một cơ sở dữ liệu
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+# Đặt sau AuthenticationMiddleware/OAuth2TokenMiddleware (cần request.user)
+class ReplicaPinMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        user = getattr(request, 'user', None)
+        user_id = user.id if user is not None and user.is_authenticated else None
+        token = _pinned.set(bool(user_id) and replica_configured() and is_user_pinned(user_id))
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinned.reset(token)
+
+        # DRF xác thực lại trong view, lấy user sau cùng của request
+        user = getattr(request, 'user', None)
+        if request.method not in SAFE_METHODS and response.status_code < 400 and replica_configured() \
+                and user is not None and user.is_authenticated:
+            pin_user(user.id)
+        return response
+
+
+# Viewset: các action chỉ đọc trong replica_actions được đọc từ replica
+class ReplicaReadMixin:
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions and request.method in SAFE_METHODS:
+            self._replica_token = _use_replica.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _use_replica.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -3,8 +3,9 @@ from .models import Job
 
 
 class JobFilter(django_filters.FilterSet):
-    min_salary = django_filters.NumberFilter(field_name='salary', lookup_expr='gte')
-    max_salary = django_filters.NumberFilter(field_name='salary', lookup_expr='lte')
+    # Lọc theo khoảng lương đã phân tích (số nguyên, có index) thay vì so sánh chuỗi salary
+    min_salary = django_filters.NumberFilter(field_name='salary_min', lookup_expr='gte')
+    max_salary = django_filters.NumberFilter(field_name='salary_max', lookup_expr='lte')
 
     class Meta:
         model = Job
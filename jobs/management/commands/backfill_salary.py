@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from jobs.models import Job
+from jobs.salary import parse_salary
+
+
+# Phân tích lại cột salary của các bài tuyển dụng đã có để điền salary_min/salary_max
+# python manage.py backfill_salary --batch-size 1000
+class Command(BaseCommand):
+    help = 'Backfill Job.salary_min/salary_max from the free-text salary column'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        batch = []
+        updated = 0
+
+        jobs = Job.objects.only('id', 'salary', 'salary_min', 'salary_max').order_by('id')
+        for job in jobs.iterator(chunk_size=batch_size):
+            salary_min, salary_max = parse_salary(job.salary)
+            if (salary_min, salary_max) != (job.salary_min, job.salary_max):
+                job.salary_min, job.salary_max = salary_min, salary_max
+                batch.append(job)
+
+            if len(batch) >= batch_size:
+                Job.objects.bulk_update(batch, ['salary_min', 'salary_max'])
+                updated += len(batch)
+                batch = []
+
+        if batch:
+            Job.objects.bulk_update(batch, ['salary_min', 'salary_max'])
+            updated += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Updated salary range of {updated} jobs.'))
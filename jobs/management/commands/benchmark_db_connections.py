@@ -0,0 +1,40 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+
+# So sánh độ trễ một "request" khi mở kết nối MySQL mới (như CONN_MAX_AGE=0) và khi dùng lại kết nối cũ
+# python manage.py benchmark_db_connections --iterations 200
+class Command(BaseCommand):
+    help = 'Measure per-request latency with fresh vs persistent MySQL connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=100)
+
+    def run(self, iterations, reconnect):
+        timings = []
+        for _ in range(iterations):
+            if reconnect:
+                connection.close()
+            started = time.perf_counter()
+            # Giống đầu request: kiểm tra kết nối (health check) rồi chạy một truy vấn nhỏ
+            connection.close_if_unusable_or_obsolete()
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        fresh = self.run(iterations, reconnect=True)
+        persistent = self.run(iterations, reconnect=False)
+
+        for label, timings in (('fresh connection', fresh), ('persistent', persistent)):
+            self.stdout.write(f'{label:>17}: mean {statistics.mean(timings):.2f} ms, '
+                              f'median {statistics.median(timings):.2f} ms, max {max(timings):.2f} ms')
+        saved = statistics.mean(fresh) - statistics.mean(persistent)
+        self.stdout.write(self.style.SUCCESS(f'Saved per request: {saved:.2f} ms '
+                                             f'(CONN_MAX_AGE={connection.settings_dict.get("CONN_MAX_AGE")})'))
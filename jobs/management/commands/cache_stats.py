@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from jobs import response_cache
+
+
+# Xem số liệu hit/stale/miss của cache response
+# python manage.py cache_stats [--reset]
+class Command(BaseCommand):
+    help = 'Show hit/stale/miss counters of the public response cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true')
+
+    def handle(self, *args, **options):
+        metrics = response_cache.get_metrics()
+        total = sum(metrics.values())
+        for name, value in metrics.items():
+            self.stdout.write(f'{name}: {value}')
+        if total:
+            ratio = (metrics['hit'] + metrics['stale']) / total
+            self.stdout.write(f'hit ratio: {ratio:.2%}')
+
+        if options['reset']:
+            response_cache.reset_metrics()
+            self.stdout.write(self.style.SUCCESS('Metrics reset.'))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from jobs import tasks
+
+
+# Xem và xử lý các tác vụ nền đã thử lại quá số lần cho phép (tasks:dead)
+# python manage.py dead_tasks                      => liệt kê
+# python manage.py dead_tasks --show <id>          => xem cả traceback
+# python manage.py dead_tasks --requeue <id> ...   => đưa lại vào hàng đợi (--all: tất cả)
+# python manage.py dead_tasks --purge <id> ...     => xóa (--all: tất cả)
+class Command(BaseCommand):
+    help = 'List, requeue or purge background tasks in the dead-letter list'
+
+    def add_arguments(self, parser):
+        parser.add_argument('task_ids', nargs='*')
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument('--show', action='store_true', help='Print the full payload and traceback')
+        group.add_argument('--requeue', action='store_true')
+        group.add_argument('--purge', action='store_true')
+        parser.add_argument('--all', action='store_true', help='Apply --requeue/--purge to every dead task')
+
+    def handle(self, *args, **options):
+        task_ids = set(options['task_ids']) or None
+        if (options['requeue'] or options['purge']) and task_ids is None and not options['all']:
+            raise CommandError('Pass task ids or --all.')
+
+        if options['requeue']:
+            count = tasks.requeue_dead_tasks(task_ids)
+            self.stdout.write(self.style.SUCCESS(f'Requeued {count} tasks.'))
+            return
+        if options['purge']:
+            count = tasks.purge_dead_tasks(task_ids)
+            self.stdout.write(self.style.SUCCESS(f'Purged {count} tasks.'))
+            return
+
+        dead = [payload for payload in tasks.list_dead_tasks() if task_ids is None or payload['id'] in task_ids]
+        for payload in dead:
+            error = (payload.get('error') or '').strip()
+            self.stdout.write(f"{payload['id']}  {payload['task']}  attempts={payload['attempts']}  "
+                              f"args={payload['args']} kwargs={payload['kwargs']}")
+            if options['show']:
+                self.stdout.write(error + '\n')
+            elif error:
+                self.stdout.write(f'    {error.splitlines()[-1]}')
+        self.stdout.write(f'{len(dead)} dead tasks.')
@@ -0,0 +1,101 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from jobs.models import Invoice, Job, JobApplication, Like, Message
+
+
+def _first_value(queryset, field):
+    return queryset.exclude(**{f'{field}__isnull': True}).order_by() \
+        .values_list(field, flat=True).first() or 0
+
+
+# Các truy vấn nóng: (tên, bảng cần kiểm tra, queryset), dùng giá trị có thật trong DB để kế hoạch giống thực tế
+def hot_queries(using):
+    now = timezone.now()
+    company_id = _first_value(Job.objects.using(using), 'company_id')
+    job_id = _first_value(JobApplication.objects.using(using), 'job_id')
+    jobseeker_id = _first_value(JobApplication.objects.using(using), 'jobseeker_id')
+    user_id = _first_value(Invoice.objects.using(using), 'user_id')
+    room_id = _first_value(Message.objects.using(using), 'room_id')
+
+    return [
+        ('job_active_by_deadline', 'jobs_job',
+         Job.objects.using(using).filter(active=True, deadline__gte=now.date()).order_by('deadline', 'id')[:20]),
+        ('job_by_company', 'jobs_job',
+         Job.objects.using(using).filter(company_id=company_id).order_by('-id')[:20]),
+        ('application_by_job', 'jobs_jobapplication',
+         JobApplication.objects.using(using).filter(job_id=job_id).order_by('date')[:20]),
+        ('application_by_jobseeker', 'jobs_jobapplication',
+         JobApplication.objects.using(using).filter(jobseeker_id=jobseeker_id, job__active=True)
+         .order_by('date', 'id')[:20]),
+        ('like_by_jobseeker', 'jobs_like',
+         Like.objects.using(using).filter(jobseeker_id=jobseeker_id, active=True)),
+        ('like_by_company', 'jobs_like',
+         Like.objects.using(using).filter(company_id=company_id, active=True)),
+        # Giống dao.get_latest_paid_invoice
+        ('latest_paid_invoice', 'jobs_invoice',
+         Invoice.objects.using(using).filter(user_id=user_id, payment_status='paid').order_by('-payment_date')[:1]),
+        ('messages_by_room_time', 'jobs_message',
+         Message.objects.using(using).filter(room_id=room_id, created_at__gte=now - timezone.timedelta(days=7))
+         .order_by('created_at')[:50]),
+    ]
+
+
+# Các bảng trong kế hoạch EXPLAIN FORMAT=JSON của MySQL (query_block có thể lồng nested_loop, ordering_operation...)
+def _plan_tables(node):
+    if isinstance(node, dict):
+        if 'table_name' in node and 'access_type' in node:
+            yield node
+        for value in node.values():
+            yield from _plan_tables(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _plan_tables(value)
+
+
+# EXPLAIN từng truy vấn nóng: (tên, bảng, các dòng kế hoạch của bảng đó, kế hoạch đầy đủ)
+# Dùng chung cho lệnh bên dưới và jobs.tests.ExplainHotQueriesTestCase
+def explain_hot_queries(using='default'):
+    results = []
+    for name, table, queryset in hot_queries(using):
+        plan = json.loads(queryset.explain(format='JSON'))
+        results.append((name, table, [row for row in _plan_tables(plan) if row['table_name'] == table], plan))
+    return results
+
+
+# Chạy EXPLAIN cho các truy vấn nóng và báo lỗi nếu bảng chính bị quét toàn bộ (access_type ALL)
+# Chạy trên DB có dữ liệu gần thực tế: bảng quá nhỏ thì MySQL có thể chọn quét toàn bộ dù có chỉ mục
+# python manage.py explain_hot_queries
+# python manage.py explain_hot_queries --database replica --verbosity 2
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot queries and fail if any of them falls back to a full table scan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if connections[using].vendor != 'mysql':
+            raise CommandError('explain_hot_queries only understands MySQL plans.')
+
+        failures = []
+        for name, table, rows, plan in explain_hot_queries(using):
+            if not rows:
+                # vd "no matching row in const table": không cần đọc bảng
+                self.stdout.write(f'{name:28} {table:22} (not read)')
+                continue
+
+            for row in rows:
+                self.stdout.write(f"{name:28} {table:22} {row['access_type']:8} key={row.get('key')} "
+                                  f"rows={row.get('rows_examined_per_scan')}")
+                if row['access_type'] == 'ALL':
+                    failures.append(name)
+            if options['verbosity'] > 1:
+                self.stdout.write(json.dumps(plan, indent=2))
+
+        if failures:
+            raise CommandError(f"Full table scan in: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS('No hot query does a full table scan.'))
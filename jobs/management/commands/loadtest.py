@@ -0,0 +1,120 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import websockets
+from django.core.management.base import BaseCommand
+
+
+def _percentile(values, percent):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+# Đo tải cho server đang chạy (runserver hoặc gunicorn) để so sánh trước/sau khi đổi cấu hình:
+# - HTTP: nhiều luồng gọi liên tục một endpoint trong --duration giây -> requests/sec, độ trễ p50/p95/p99
+# - Websocket: mở --ws-connections kết nối tới ws/chat/ rồi gửi heartbeat/presence -> số kết nối giữ được, độ trễ
+# python manage.py loadtest --url http://localhost:8000/jobs/ --concurrency 50 --duration 30
+# python manage.py loadtest --ws-url ws://localhost:8000/ws/chat/ --ws-connections 1000 --token <access token>
+class Command(BaseCommand):
+    help = 'Measure HTTP requests/sec and websocket connection capacity of a running server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='HTTP endpoint to hit, e.g. http://localhost:8000/jobs/')
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--duration', type=float, default=10, help='Seconds')
+        parser.add_argument('--ws-url', help='Websocket endpoint, e.g. ws://localhost:8000/ws/chat/')
+        parser.add_argument('--ws-connections', type=int, default=100)
+        parser.add_argument('--ws-hold', type=float, default=10, help='Seconds to keep sockets open')
+        parser.add_argument('--token', help='OAuth2 access token (Authorization header / ?token=)')
+
+    def handle(self, *args, **options):
+        if not options['url'] and not options['ws_url']:
+            self.stderr.write('Nothing to do: pass --url and/or --ws-url.')
+            return
+        if options['url']:
+            self.run_http(options['url'], options['concurrency'], options['duration'], options['token'])
+        if options['ws_url']:
+            asyncio.run(self.run_websocket(options['ws_url'], options['ws_connections'], options['ws_hold'],
+                                           options['token']))
+
+    def run_http(self, url, concurrency, duration, token):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        latencies, errors = [], []
+        lock = threading.Lock()
+        deadline = time.monotonic() + duration
+
+        def worker():
+            while time.monotonic() < deadline:
+                started = time.monotonic()
+                try:
+                    with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=30) as resp:
+                        resp.read()
+                    ok = True
+                except (urllib.error.URLError, OSError) as e:
+                    ok = False
+                    error = e
+                elapsed = time.monotonic() - started
+                with lock:
+                    if ok:
+                        latencies.append(elapsed)
+                    else:
+                        errors.append(error)
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(f'HTTP {url}')
+        self.stdout.write(f'  concurrency {concurrency}, {elapsed:.1f}s, {len(latencies)} ok, {len(errors)} errors')
+        self.stdout.write(f'  requests/sec {len(latencies) / elapsed:.1f}')
+        if latencies:
+            self.stdout.write('  latency ms: mean {:.1f}  p50 {:.1f}  p95 {:.1f}  p99 {:.1f}'.format(
+                statistics.mean(latencies) * 1000, _percentile(latencies, 50) * 1000,
+                _percentile(latencies, 95) * 1000, _percentile(latencies, 99) * 1000))
+        if errors:
+            self.stdout.write(f'  first error: {errors[0]}')
+
+    async def run_websocket(self, ws_url, connections, hold, token):
+        if token:
+            ws_url = f"{ws_url}{'&' if '?' in ws_url else '?'}token={token}"
+        round_trips, failures = [], []
+
+        async def client(index):
+            try:
+                async with websockets.connect(ws_url, open_timeout=30) as ws:
+                    deadline = time.monotonic() + hold
+                    while time.monotonic() < deadline:
+                        started = time.monotonic()
+                        await ws.send(json.dumps({'type': 'heartbeat'}))
+                        await ws.send(json.dumps({'type': 'presence', 'user_ids': [index]}))
+                        await asyncio.wait_for(ws.recv(), timeout=30)
+                        round_trips.append(time.monotonic() - started)
+                        await asyncio.sleep(1)
+                return True
+            except Exception as e:
+                failures.append(e)
+                return False
+
+        started = time.monotonic()
+        results = await asyncio.gather(*(client(i) for i in range(connections)))
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(f'Websocket {ws_url.split("?")[0]}')
+        self.stdout.write(f'  {sum(results)}/{connections} connections held for {hold:.0f}s ({elapsed:.1f}s total)')
+        if round_trips:
+            self.stdout.write('  round trip ms: p50 {:.1f}  p95 {:.1f}  p99 {:.1f}  ({} messages/sec)'.format(
+                _percentile(round_trips, 50) * 1000, _percentile(round_trips, 95) * 1000,
+                _percentile(round_trips, 99) * 1000, round(len(round_trips) / elapsed, 1)))
+        if failures:
+            self.stdout.write(f'  first failure: {failures[0]!r}')
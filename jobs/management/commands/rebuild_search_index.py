@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from jobs.models import Job
+from jobs.search import build_search_document
+
+
+# Dựng lại văn bản tìm kiếm (Job.search_document) cho toàn bộ bài tuyển dụng
+# python manage.py rebuild_search_index --batch-size 1000
+class Command(BaseCommand):
+    help = 'Rebuild Job.search_document used by the FULLTEXT job search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        batch = []
+        updated = 0
+
+        jobs = Job.objects.select_related('company').order_by('id')
+        for job in jobs.iterator(chunk_size=batch_size):
+            job.search_document = build_search_document(job)
+            batch.append(job)
+
+            if len(batch) >= batch_size:
+                Job.objects.bulk_update(batch, ['search_document'])
+                updated += len(batch)
+                batch = []
+
+        if batch:
+            Job.objects.bulk_update(batch, ['search_document'])
+            updated += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt search document of {updated} jobs.'))
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, DateField
+from django.db.models.functions import ExtractQuarter, ExtractYear, TruncMonth
+from jobs.models import (ApplicationQuarterStat, ApplicationMonthStat, JobPostStat, JobGenderStat,
+                         Job, JobApplication)
+
+
+# Tính lại toàn bộ các bảng thống kê tổng hợp từ bảng gốc (lần đầu triển khai, hoặc sửa lệch
+# do dữ liệu ghi ngoài signal, vd đổi giới tính người dùng, import trực tiếp vào DB)
+# Nên chạy lúc ít truy cập: đơn ứng tuyển tạo trong lúc chạy có thể bị đếm thiếu/thừa
+# python manage.py rebuild_stats
+class Command(BaseCommand):
+    help = 'Rebuild the statistics rollup tables used by the admin stats dashboard'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        applications = JobApplication.objects.order_by()
+
+        quarters = applications.filter(date__isnull=False) \
+            .annotate(year=ExtractYear('date'), quarter=ExtractQuarter('date')) \
+            .values('job__career_id', 'year', 'quarter', 'is_student').annotate(total=Count('id'))
+        months = applications.filter(date__isnull=False) \
+            .annotate(month=TruncMonth('date', output_field=DateField())) \
+            .values('month').annotate(total=Count('id'))
+        genders = applications.filter(job__isnull=False) \
+            .values('job_id', 'jobseeker__user__gender').annotate(total=Count('id'))
+        posts = Job.objects.order_by() \
+            .values('company_id', 'career_id', 'employmenttype_id').annotate(total=Count('id'))
+
+        with transaction.atomic():
+            for model in (ApplicationQuarterStat, ApplicationMonthStat, JobPostStat, JobGenderStat):
+                model.objects.all().delete()
+
+            # Hai dòng is_student NULL/False gộp chung một khóa
+            quarter_totals = {}
+            for row in quarters:
+                key = (row['job__career_id'], row['year'], row['quarter'], bool(row['is_student']))
+                quarter_totals[key] = quarter_totals.get(key, 0) + row['total']
+            ApplicationQuarterStat.objects.bulk_create([
+                ApplicationQuarterStat(career_id=career_id, year=year, quarter=quarter, is_student=is_student,
+                                       total=total)
+                for (career_id, year, quarter, is_student), total in quarter_totals.items()
+            ], batch_size=batch_size)
+
+            ApplicationMonthStat.objects.bulk_create([
+                ApplicationMonthStat(month=row['month'], total=row['total']) for row in months
+            ], batch_size=batch_size)
+            JobGenderStat.objects.bulk_create([
+                JobGenderStat(job_id=row['job_id'], gender=row['jobseeker__user__gender'], total=row['total'])
+                for row in genders
+            ], batch_size=batch_size)
+            JobPostStat.objects.bulk_create([
+                JobPostStat(company_id=row['company_id'], career_id=row['career_id'],
+                            employmenttype_id=row['employmenttype_id'], total=row['total'])
+                for row in posts
+            ], batch_size=batch_size)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {len(quarter_totals)} quarter, {len(months)} month, {len(genders)} gender '
+            f'and {len(posts)} job post rows.'))
@@ -0,0 +1,20 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from jobs import payments
+
+
+# Đối chiếu hóa đơn đang chờ với Stripe (bổ sung cho webhook khi sự kiện bị lỡ), chạy định kỳ bằng cron
+# python manage.py reconcile_invoices --max-age-hours 24
+class Command(BaseCommand):
+    help = 'Reconcile pending invoices with Stripe checkout sessions and expire abandoned ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-hours', type=int, default=24)
+        parser.add_argument('--page-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        updated, expired = payments.reconcile_pending_invoices(
+            max_age=timedelta(hours=options['max_age_hours']),
+            page_size=options['page_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated} invoices, expired {expired} abandoned invoices.'))
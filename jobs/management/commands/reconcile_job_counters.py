@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from jobs.models import Job, JobApplication, Like, Rating
+
+
+def _aggregate(model, expression, **filters):
+    return Coalesce(Subquery(
+        model.objects.filter(job=OuterRef('pk'), **filters).order_by()
+        .values('job').annotate(value=expression).values('value')[:1]
+    ), 0)
+
+
+# Tính lại bộ đếm application_count, like_count, rating_count, rating_sum từ các bảng gốc
+# (sửa lệch do dữ liệu thêm/xóa ngoài API, vd qua trang admin)
+# python manage.py reconcile_job_counters --batch-size 1000
+class Command(BaseCommand):
+    help = 'Recompute the denormalized application/like/rating counters on Job'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        updated = 0
+
+        # Cập nhật theo từng khoảng id để không khóa cả bảng trong một câu UPDATE
+        while True:
+            ids = list(Job.objects.filter(pk__gt=last_id).order_by('pk')
+                       .values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+
+            updated += Job.objects.filter(pk__in=ids).update(
+                application_count=_aggregate(JobApplication, Count('id')),
+                like_count=_aggregate(Like, Count('id'), active=True),
+                rating_count=_aggregate(Rating, Count('id')),
+                rating_sum=_aggregate(Rating, Sum('rating')),
+            )
+            last_id = ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f'Reconciled counters of {updated} jobs.'))
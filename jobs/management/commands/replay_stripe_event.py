@@ -0,0 +1,38 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from jobs import payments
+
+
+# Chạy một sự kiện Stripe mẫu (jobs/fixtures/stripe_events/*.json) qua đúng luồng của webhook:
+# ký payload bằng STRIPE_WEBHOOK_SECRET, xác thực chữ ký, rồi cập nhật hóa đơn
+# python manage.py replay_stripe_event jobs/fixtures/stripe_events/checkout_session_completed.json --invoice-id 12
+class Command(BaseCommand):
+    help = 'Sign and process a Stripe webhook event fixture locally'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--invoice-id', type=int)
+        parser.add_argument('--session-id')
+
+    def handle(self, *args, **options):
+        with open(options['path'], encoding='utf-8') as f:
+            event = json.load(f)
+
+        session = event['data']['object']
+        if options['invoice_id']:
+            session['client_reference_id'] = str(options['invoice_id'])
+            session['metadata']['invoice_id'] = str(options['invoice_id'])
+        if options['session_id']:
+            session['id'] = options['session_id']
+
+        payload = json.dumps(event)
+        try:
+            stripe_event = payments.construct_event(payload, payments.generate_signature_header(payload))
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        invoice = payments.handle_event(stripe_event)
+        if invoice is None:
+            self.stdout.write('Event ignored (already processed, unsupported type or unknown invoice).')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Invoice {invoice.id} is now {invoice.payment_status}.'))
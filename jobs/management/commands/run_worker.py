@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from jobs import tasks
+
+
+# Chạy worker xử lý hàng đợi tác vụ nền trên Redis (gửi mail, tạo phiên Stripe, upload ảnh)
+# python manage.py run_worker [--burst] [--worker-id worker-1]
+# Chạy nhiều worker trên cùng một máy thì mỗi worker cần --worker-id riêng (mặc định: hostname),
+# worker khởi động lại với cùng id sẽ chạy lại các tác vụ bị dở dang
+class Command(BaseCommand):
+    help = 'Run the Redis background task worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-timeout', type=int, default=5)
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--worker-id', help='Name of the processing list (default: hostname)')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Worker started.')
+        tasks.run_worker(poll_timeout=options['poll_timeout'], burst=options['burst'],
+                         worker_id=options['worker_id'])
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.11 on 2026-10-18 09:30
+
+from django.db import migrations, models
+
+
+def create_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('CREATE FULLTEXT INDEX job_search_document_ft ON jobs_job (search_document)')
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('DROP INDEX job_search_document_ft ON jobs_job')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0047_job_salary_min_job_salary_max_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.11 on 2026-10-18 10:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_job_counters(apps, schema_editor):
+    Job = apps.get_model('jobs', 'Job')
+    JobApplication = apps.get_model('jobs', 'JobApplication')
+    Like = apps.get_model('jobs', 'Like')
+    Rating = apps.get_model('jobs', 'Rating')
+
+    def aggregate(model, expression, **filters):
+        return Coalesce(Subquery(
+            model.objects.filter(job=OuterRef('pk'), **filters).order_by()
+            .values('job').annotate(value=expression).values('value')[:1]
+        ), 0)
+
+    Job.objects.update(
+        application_count=aggregate(JobApplication, Count('id')),
+        like_count=aggregate(Like, Count('id'), active=True),
+        rating_count=aggregate(Rating, Count('id')),
+        rating_sum=aggregate(Rating, Sum('rating')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0048_job_search_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='application_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='like_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='rating_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='rating_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['active', '-application_count', '-id'], name='job_active_popular_idx'),
+        ),
+        migrations.RunPython(populate_job_counters, migrations.RunPython.noop),
+    ]
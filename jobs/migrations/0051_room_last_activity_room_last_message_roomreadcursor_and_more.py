@@ -0,0 +1,62 @@
+# Generated by Django 4.2.11 on 2026-10-18 11:00
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def backfill_room_activity(apps, schema_editor):
+    Room = apps.get_model('jobs', 'Room')
+    Message = apps.get_model('jobs', 'Message')
+
+    latest = Message.objects.filter(room=OuterRef('pk')).order_by('-id')
+    Room.objects.update(
+        last_message_id=Subquery(latest.values('id')[:1]),
+        last_activity=Coalesce(Subquery(latest.values('created_at')[:1]), 'created_at', 'last_activity'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('jobs', '0050_message_message_room_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='last_activity',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='jobs.message'),
+        ),
+        migrations.CreateModel(
+            name='RoomReadCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_message_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_cursors', to='jobs.room')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('room', 'user')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['sender', '-last_activity', '-id'], name='room_sender_activity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['receiver', '-last_activity', '-id'], name='room_receiver_activity_idx'),
+        ),
+        migrations.RunPython(backfill_room_activity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 4.2.11 on 2026-10-18 13:00
+
+from django.db import migrations, models
+from django.db.models import Count, DateField
+from django.db.models.functions import ExtractQuarter, ExtractYear, TruncMonth
+import django.db.models.deletion
+
+
+def backfill_stats(apps, schema_editor):
+    Job = apps.get_model('jobs', 'Job')
+    JobApplication = apps.get_model('jobs', 'JobApplication')
+    ApplicationQuarterStat = apps.get_model('jobs', 'ApplicationQuarterStat')
+    ApplicationMonthStat = apps.get_model('jobs', 'ApplicationMonthStat')
+    JobPostStat = apps.get_model('jobs', 'JobPostStat')
+    JobGenderStat = apps.get_model('jobs', 'JobGenderStat')
+    applications = JobApplication.objects.filter(date__isnull=False).order_by()
+
+    quarter_totals = {}
+    for row in applications.annotate(year=ExtractYear('date'), quarter=ExtractQuarter('date')) \
+            .values('job__career_id', 'year', 'quarter', 'is_student').annotate(total=Count('id')):
+        key = (row['job__career_id'], row['year'], row['quarter'], bool(row['is_student']))
+        quarter_totals[key] = quarter_totals.get(key, 0) + row['total']
+    ApplicationQuarterStat.objects.bulk_create([
+        ApplicationQuarterStat(career_id=career_id, year=year, quarter=quarter, is_student=is_student, total=total)
+        for (career_id, year, quarter, is_student), total in quarter_totals.items()
+    ], batch_size=1000)
+
+    ApplicationMonthStat.objects.bulk_create([
+        ApplicationMonthStat(month=row['month'], total=row['total'])
+        for row in applications.annotate(month=TruncMonth('date', output_field=DateField()))
+        .values('month').annotate(total=Count('id'))
+    ], batch_size=1000)
+
+    JobGenderStat.objects.bulk_create([
+        JobGenderStat(job_id=row['job_id'], gender=row['jobseeker__user__gender'], total=row['total'])
+        for row in JobApplication.objects.filter(job__isnull=False).order_by()
+        .values('job_id', 'jobseeker__user__gender').annotate(total=Count('id'))
+    ], batch_size=1000)
+
+    JobPostStat.objects.bulk_create([
+        JobPostStat(company_id=row['company_id'], career_id=row['career_id'],
+                    employmenttype_id=row['employmenttype_id'], total=row['total'])
+        for row in Job.objects.order_by().values('company_id', 'career_id', 'employmenttype_id')
+        .annotate(total=Count('id'))
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0053_invoice_invoice_user_status_date_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplicationMonthStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('total', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['month'],
+            },
+        ),
+        migrations.CreateModel(
+            name='JobPostStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.IntegerField(default=0)),
+                ('career', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='jobs.career')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='jobs.company')),
+                ('employmenttype', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='jobs.employmenttype')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='JobGenderStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gender', models.IntegerField(blank=True, choices=[(0, 'Male'), (1, 'Female'), (2, 'N/A')], null=True)),
+                ('total', models.IntegerField(default=0)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gender_stats', to='jobs.job')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['gender', '-total'], name='stat_job_gender_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ApplicationQuarterStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('quarter', models.SmallIntegerField()),
+                ('is_student', models.BooleanField(default=False)),
+                ('total', models.IntegerField(default=0)),
+                ('career', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='jobs.career')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['is_student', 'year', 'quarter'], name='stat_quarter_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
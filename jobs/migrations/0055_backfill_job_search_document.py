@@ -0,0 +1,30 @@
+# Generated by Django 4.2.11 on 2026-10-18 14:00
+
+from django.db import migrations
+
+from jobs.search import build_search_document
+
+
+# 0048 thêm cột search_document rỗng cho các bài đăng đã có, dựng lại văn bản tìm kiếm cho chúng
+def backfill_search_document(apps, schema_editor):
+    Job = apps.get_model('jobs', 'Job')
+    batch = []
+    for job in Job.objects.filter(search_document='').select_related('company').order_by('id').iterator(chunk_size=1000):
+        job.search_document = build_search_document(job)
+        batch.append(job)
+        if len(batch) >= 1000:
+            Job.objects.bulk_update(batch, ['search_document'])
+            batch = []
+    if batch:
+        Job.objects.bulk_update(batch, ['search_document'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0054_applicationmonthstat_applicationquarterstat_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_document, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.11 on 2026-10-18 15:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0055_backfill_job_search_document'),
+    ]
+
+    operations = [
+        # Tên chỉ mục tạo ở 0052 dài hơn 30 ký tự (models.E034)
+        migrations.RenameIndex(
+            model_name='jobapplication',
+            new_name='application_job_status_idx',
+            old_name='application_job_status_date_idx',
+        ),
+    ]
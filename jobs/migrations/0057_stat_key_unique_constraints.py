@@ -0,0 +1,48 @@
+# Generated by Django 4.2.11 on 2026-10-18 16:00
+
+from django.db import migrations, models
+import django.db.models.functions.comparison
+
+
+# Gộp các dòng trùng khóa (do _bump cũ đọc rồi tạo không có ràng buộc) trước khi thêm ràng buộc duy nhất
+def merge_duplicate_stats(apps, schema_editor):
+    for model_name, keys in (('ApplicationQuarterStat', ('career_id', 'year', 'quarter', 'is_student')),
+                             ('JobPostStat', ('company_id', 'career_id', 'employmenttype_id')),
+                             ('JobGenderStat', ('job_id', 'gender'))):
+        model = apps.get_model('jobs', model_name)
+        kept = {}
+        for row in model.objects.order_by('id').values('id', 'total', *keys).iterator(chunk_size=1000):
+            key = tuple(row[field] for field in keys)
+            if key in kept:
+                kept[key]['total'] += row['total']
+                kept[key]['duplicates'].append(row['id'])
+            else:
+                kept[key] = {'id': row['id'], 'total': row['total'], 'duplicates': []}
+
+        for row in kept.values():
+            if row['duplicates']:
+                model.objects.filter(pk=row['id']).update(total=row['total'])
+                model.objects.filter(pk__in=row['duplicates']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0056_rename_application_job_status_date_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_stats, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='applicationquarterstat',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Coalesce('career', 0), models.F('year'), models.F('quarter'), models.F('is_student'), name='stat_quarter_key_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='jobgenderstat',
+            constraint=models.UniqueConstraint(models.F('job'), django.db.models.functions.comparison.Coalesce('gender', -1), name='stat_job_gender_key_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='jobpoststat',
+            constraint=models.UniqueConstraint(models.F('company'), django.db.models.functions.comparison.Coalesce('career', 0), django.db.models.functions.comparison.Coalesce('employmenttype', 0), name='stat_job_post_key_uniq'),
+        ),
+    ]
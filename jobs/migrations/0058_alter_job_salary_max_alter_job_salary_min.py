@@ -0,0 +1,23 @@
+# Generated by Django 4.2.11 on 2026-10-18 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0057_stat_key_unique_constraints'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='salary_max',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='salary_min',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -3,9 +3,12 @@ from django.contrib.auth.models import AbstractUser
 from cloudinary.models import CloudinaryField
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
+from django.db.models.functions import Coalesce
 from phonenumber_field.modelfields import PhoneNumberField
 from ckeditor.fields import RichTextField
 from django.utils import timezone
+from jobs.salary import parse_salary
+from jobs.search import build_search_document
 
 class BaseModel(models.Model):
     created_date = models.DateTimeField(auto_now_add=True, null=True)
@@ -81,6 +84,10 @@ class Invoice(models.Model):
 
     class Meta:
         ordering = ['-payment_date']
+        indexes = [
+            # Hóa đơn đã thanh toán mới nhất của người dùng (get_latest_paid_invoice)
+            models.Index(fields=['user', 'payment_status', '-payment_date'], name='invoice_user_status_date_idx'),
+        ]
 
 # Nhà tuyển dụng
 class Company(models.Model):
@@ -92,6 +99,8 @@ class Company(models.Model):
     # Loại hình công ty (công ty TNHH, công ty cổ phần, v.v)
     company_type = models.IntegerField(choices=COMPANY_CHOICES, null=True, blank=True)
     logo = CloudinaryField('logo', null=True, blank=True)
+    # Lần cuối nhà tuyển dụng xem bảng tổng hợp ứng viên (đếm đơn mới từ thời điểm này)
+    applications_seen_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return self.user.username
@@ -125,17 +134,68 @@ class Job(BaseModel):
     gender = models.IntegerField(choices=GENDER_CHOICES, default=0, null=True, blank=True)
     location = models.CharField(max_length=255)
     salary = models.CharField(max_length=255)
+    # Khoảng lương (VNĐ) được phân tích từ salary để lọc/sắp xếp theo số, tự cập nhật khi save
+    # BIGINT: "3 tỷ" hay "$100,000" vượt quá giới hạn INT (khoảng 2,1 tỷ)
+    salary_min = models.PositiveBigIntegerField(null=True, blank=True)
+    salary_max = models.PositiveBigIntegerField(null=True, blank=True)
+    # Văn bản đã bỏ dấu (title, position, description, location, tên công ty) cho chỉ mục FULLTEXT
+    search_document = models.TextField(blank=True, default='', editable=False)
     position = models.CharField(max_length=255)   # Vị trí ứng tuyển
     description = models.TextField(null=True, blank=True)
     experience = models.CharField(max_length=255)
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True)
+    # Bộ đếm phi chuẩn hóa, chỉ cập nhật nguyên tử bằng F() (dao.update_job_counters)
+    application_count = models.IntegerField(default=0)
+    like_count = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+
+    COUNTER_FIELDS = ('application_count', 'like_count', 'rating_count', 'rating_sum')
+    # Khóa của bảng thống kê JobPostStat (jobs.stats)
+    STAT_KEY_FIELDS = ('company_id', 'career_id', 'employmenttype_id')
 
     def __str__(self):
         return self.title
 
+    # Giữ giá trị khóa thống kê lúc nạp từ DB để jobs.signals biết bộ đếm cũ mà không SELECT lại khi save
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        if all(loaded.get(key, models.DEFERRED) is not models.DEFERRED for key in cls.STAT_KEY_FIELDS):
+            instance._loaded_stat_keys = {key: loaded[key] for key in cls.STAT_KEY_FIELDS}
+        return instance
+
+    @property
+    def rating_average(self):
+        if self.rating_count:
+            return self.rating_sum / self.rating_count
+        return None
+
+    # Các cột dẫn xuất: khoảng lương dạng số và văn bản tìm kiếm
+    def save(self, *args, **kwargs):
+        self.salary_min, self.salary_max = parse_salary(self.salary)
+        self.search_document = build_search_document(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'salary_min', 'salary_max', 'search_document'}
+        elif not self._state.adding:
+            # Không ghi đè bộ đếm bằng giá trị cũ đang nằm trong bộ nhớ
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name not in self.COUNTER_FIELDS]
+        super().save(*args, **kwargs)
+
     class Meta:
         unique_together = ('company', 'title')
         ordering = ['deadline', 'id']
+        indexes = [
+            models.Index(fields=['active', 'salary_min', 'deadline'], name='job_active_salary_min_idx'),
+            models.Index(fields=['active', 'salary_max', 'deadline'], name='job_active_salary_max_idx'),
+            models.Index(fields=['active', '-application_count', '-id'], name='job_active_popular_idx'),
+            models.Index(fields=['active', 'deadline', 'id'], name='job_active_deadline_idx'),
+            # Bài đăng của một nhà tuyển dụng, mới nhất trước
+            models.Index(fields=['company', '-id'], name='job_company_id_idx'),
+        ]
 
 
 class Room(models.Model):
@@ -145,11 +205,19 @@ class Room(models.Model):
     job = models.ForeignKey(Job, related_name='job_room', on_delete=models.CASCADE, null=True,
                                  blank=True)
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
+    # Tin nhắn mới nhất và thời điểm hoạt động gần nhất, dùng cho hộp thư (sắp xếp theo hoạt động)
+    last_message = models.ForeignKey('Message', related_name='+', on_delete=models.SET_NULL, null=True,
+                                     blank=True)
+    last_activity = models.DateTimeField(default=timezone.now)
 
     class Meta:
         # Đảm bảo mỗi cặp người dùng (sender, receiver) chỉ có một phòng chat.
         unique_together = ('sender', 'receiver')
         ordering = ['-id']
+        indexes = [
+            models.Index(fields=['sender', '-last_activity', '-id'], name='room_sender_activity_idx'),
+            models.Index(fields=['receiver', '-last_activity', '-id'], name='room_receiver_activity_idx'),
+        ]
 
     def __str__(self):
         return f"ChatRoom between {self.sender.username} and {self.receiver.username}"
@@ -166,6 +234,28 @@ class Message(models.Model):
     def __str__(self):
         return f"Message from {self.sender.username} in room {self.room.id}"
 
+    class Meta:
+        # Lấy lịch sử chat theo trang: WHERE room_id = ? AND id < ? ORDER BY id DESC
+        indexes = [
+            models.Index(fields=['room', 'id'], name='message_room_id_idx'),
+            # Tin nhắn của phòng trong một khoảng thời gian
+            models.Index(fields=['room', 'created_at'], name='message_room_created_idx'),
+        ]
+
+# Vị trí đã đọc của mỗi người dùng trong một phòng chat (tính số tin chưa đọc)
+class RoomReadCursor(models.Model):
+    room = models.ForeignKey(Room, related_name='read_cursors', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    last_read_message_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('room', 'user')
+
+    def __str__(self):
+        return f"{self.user_id} read room {self.room_id} up to {self.last_read_message_id}"
+
+
 # Khu vực
 class Area(models.Model):
     name = models.CharField(max_length=255)
@@ -205,6 +295,13 @@ class JobApplication(BaseModel):
     class Meta:
         unique_together = ('job', 'jobseeker')
         ordering = ['date', 'id']
+        indexes = [
+            # Đếm đơn theo job và trạng thái, lọc đơn mới theo ngày (bảng tổng hợp ứng viên của NTD)
+            models.Index(fields=['job', 'status', 'date'], name='application_job_status_idx'),
+            models.Index(fields=['job', 'date'], name='application_job_date_idx'),
+            # Đơn của một ứng viên theo ngày nộp (job__active nằm ở bảng Job nên lọc sau khi join theo khóa chính)
+            models.Index(fields=['jobseeker', 'date'], name='application_jobseeker_date_idx'),
+        ]
     def __str__(self):
         return self.job.title + ", " + self.jobseeker.user.username + " apply"
 
@@ -248,6 +345,11 @@ class Like(Interaction):
     class Meta:
         unique_together = [['jobseeker', 'job'], ['company', 'job']]
         ordering = ['id', ]
+        indexes = [
+            # Danh sách bài đã thích của ứng viên/nhà tuyển dụng
+            models.Index(fields=['jobseeker', 'active'], name='like_jobseeker_active_idx'),
+            models.Index(fields=['company', 'active'], name='like_company_active_idx'),
+        ]
 
 
 class Rating(Interaction):
@@ -265,3 +367,63 @@ class Rating(Interaction):
         return f'Rating: {self.rating}, Content: {self.comment}'
 
 
+
+
+# BẢNG THỐNG KÊ TỔNG HỢP (cập nhật dần trong jobs.stats, tính lại bằng lệnh rebuild_stats)
+# Mỗi khóa một dòng: các cột khóa có thể NULL (MySQL coi các NULL là khác nhau trong UNIQUE),
+# nên ràng buộc duy nhất đặt trên COALESCE(cột, 0) (chỉ mục theo biểu thức, MySQL 8.0.13+)
+
+# Số đơn ứng tuyển theo ngành nghề của bài đăng, theo quý
+class ApplicationQuarterStat(models.Model):
+    career = models.ForeignKey(Career, on_delete=models.CASCADE, null=True, blank=True)
+    year = models.IntegerField()
+    quarter = models.SmallIntegerField()
+    is_student = models.BooleanField(default=False)
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_student', 'year', 'quarter'], name='stat_quarter_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(Coalesce('career', 0), 'year', 'quarter', 'is_student',
+                                    name='stat_quarter_key_uniq'),
+        ]
+
+
+# Số đơn ứng tuyển theo tháng (ngày đầu tháng)
+class ApplicationMonthStat(models.Model):
+    month = models.DateField(unique=True)
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['month']
+
+
+# Số bài tuyển dụng theo nhà tuyển dụng, ngành nghề và loại công việc
+class JobPostStat(models.Model):
+    company = models.ForeignKey(Company, on_delete=models.CASCADE)
+    career = models.ForeignKey(Career, on_delete=models.CASCADE, null=True, blank=True)
+    employmenttype = models.ForeignKey(EmploymentType, on_delete=models.CASCADE, null=True, blank=True)
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint('company', Coalesce('career', 0), Coalesce('employmenttype', 0),
+                                    name='stat_job_post_key_uniq'),
+        ]
+
+
+# Số đơn ứng tuyển của mỗi bài đăng theo giới tính ứng viên
+class JobGenderStat(models.Model):
+    job = models.ForeignKey(Job, related_name='gender_stats', on_delete=models.CASCADE)
+    gender = models.IntegerField(choices=GENDER_CHOICES, null=True, blank=True)
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['gender', '-total'], name='stat_job_gender_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint('job', Coalesce('gender', -1), name='stat_job_gender_key_uniq'),
+        ]
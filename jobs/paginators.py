@@ -1,4 +1,11 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from datetime import date, datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination, CursorPagination
+from rest_framework.utils.urls import replace_query_param
 
 class JobPaginator(PageNumberPagination):
     page_size = 10  # Mỗi trang sẽ chứa tối đa 10 bài đăng tuyển dụng.
@@ -41,4 +48,165 @@ class UserPagination(PageNumberPagination):
 # Phân trang cho Application
 class ApplicationPagination(PageNumberPagination):
     page_size = 10
-    max_page_size = 20
\ No newline at end of file
+    max_page_size = 20
+
+# Phân trang danh sách đơn ứng tuyển của nhà tuyển dụng
+class CompanyApplicationPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+
+
+# PHÂN TRANG DẠNG CON TRỎ (keyset): không COUNT(*), không OFFSET => mỗi trang tốn chi phí như nhau
+# Client chọn bằng ?pagination=cursor, sau đó đi tiếp theo link next/previous
+CURSOR_PAGINATION_PARAM = 'pagination'
+
+
+def is_cursor_request(request):
+    return request.query_params.get(CURSOR_PAGINATION_PARAM) == 'cursor'
+
+
+# Các API vốn trả về cả danh sách chỉ phân trang khi client yêu cầu: ?pagination=page hoặc ?pagination=cursor
+def is_paginated_request(request):
+    return request.query_params.get(CURSOR_PAGINATION_PARAM) in ('page', 'cursor')
+
+
+# Chọn lớp phân trang theo request: con trỏ nếu client yêu cầu, mặc định là phân trang theo số trang
+def get_paginator(request, pagination_class, cursor_pagination_class):
+    if cursor_pagination_class is not None and is_cursor_request(request):
+        return cursor_pagination_class()
+    return pagination_class()
+
+
+# CursorPagination của DRF chỉ lưu ordering[0] trong con trỏ và bỏ qua các dòng trùng giá trị bằng OFFSET,
+# nên chỉ dùng nó khi ordering là một cột duy nhất, không đổi (id)
+# Ordering nhiều cột (vd deadline, id) dùng KeysetCursorPagination: con trỏ lưu giá trị của mọi cột,
+# trang tiếp theo lọc (a > x) OR (a = x AND id > y) giống dao.page_chat_inbox
+# Các cột trong ordering phải NOT NULL và cột cuối cùng phải là khóa duy nhất
+class KeysetCursorPagination(CursorPagination):
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.model = queryset.model
+        position, reverse = self.decode_cursor(request) or (None, False)
+
+        ordering = [self._flip(field) for field in self.ordering] if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    # Các dòng đứng sau position theo ordering (so sánh từng cột theo thứ tự từ điển)
+    def _after(self, ordering, position):
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def _position(self, instance):
+        values = []
+        for field in self.ordering:
+            value = getattr(instance, field.lstrip('-'))
+            values.append(value.isoformat() if isinstance(value, (date, datetime)) else value)
+        return values
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            values = data['p']
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = [self.model._meta.get_field(field.lstrip('-')).to_python(value)
+                        for field, value in zip(self.ordering, values)]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+        return position, bool(data.get('r'))
+
+    def encode_cursor(self, position, reverse=False):
+        data = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self._position(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self._position(self.page[0]), reverse=True)
+
+    def get_html_context(self):
+        return {'previous_url': self.get_previous_link(), 'next_url': self.get_next_link()}
+
+
+class JobCursorPaginator(CursorPagination): # Danh sách job mới nhất (/jobs/ sắp xếp -id)
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 20
+    ordering = ('-id',)
+
+class JobDeadlineCursorPaginator(KeysetCursorPagination): # Theo Job.Meta.ordering (deadline, id)
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 20
+    ordering = ('deadline', 'id')
+
+# JobApplication.date có thể NULL nên không dùng làm con trỏ, id tăng cùng thứ tự nộp đơn
+class ApplicationCursorPaginator(CursorPagination): # Đơn cũ trước
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 20
+    ordering = ('id',)
+
+class CompanyApplicationCursorPaginator(CursorPagination): # Đơn ứng tuyển mới nhất trước (nhà tuyển dụng)
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    ordering = ('-id',)
+
+class RatingCursorPaginator(CursorPagination): # Theo Rating.Meta.ordering (id)
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 20
+    ordering = ('id',)
+
+class LikedJobCursorPaginator(CursorPagination): # Theo Like.Meta.ordering (id)
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 20
+    ordering = ('id',)
+
+# Hộp thư chat theo hoạt động gần nhất. last_activity thay đổi khi có tin nhắn mới: con trỏ keyset
+# không lặp lại phòng giữa các trang, phòng vừa có tin nhắn nhảy lên đầu (client nhận qua websocket)
+class RoomCursorPaginator(KeysetCursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    ordering = ('-last_activity', '-id')
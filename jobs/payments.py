@@ -0,0 +1,205 @@
+import hashlib
+import hmac
+import logging
+import time
+import uuid
+from datetime import timedelta
+from types import SimpleNamespace
+import stripe
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+from jobs.models import Invoice
+from jobs.utils import redis_client
+
+logger = logging.getLogger(__name__)
+
+stripe.api_key = settings.STRIPE_SECRET_KEY
+
+# Trạng thái hóa đơn chưa kết thúc (chờ Stripe xác nhận)
+OPEN_PAYMENT_STATUSES = ('pending', 'unpaid')
+# Sau thời gian này mà phiên thanh toán vẫn chưa xong thì coi như hết hạn (phiên Stripe sống tối đa 24h)
+PENDING_INVOICE_MAX_AGE = timedelta(days=1)
+
+
+# Stripe giả lập (STRIPE_BACKEND = 'fake'): dùng khi test/dev, không gọi mạng
+class FakeCheckoutSession:
+    sessions = {}
+
+    @classmethod
+    def create(cls, idempotency_key=None, **params):
+        session_id = f'cs_test_{uuid.uuid5(uuid.NAMESPACE_OID, idempotency_key).hex}' if idempotency_key \
+            else f'cs_test_{uuid.uuid4().hex}'
+        if session_id not in cls.sessions:
+            cls.sessions[session_id] = SimpleNamespace(
+                id=session_id,
+                url=f'https://checkout.stripe.test/pay/{session_id}',
+                amount_total=0,
+                currency='vnd',
+                payment_status='unpaid',
+                status='open',
+                client_reference_id=params.get('client_reference_id'),
+                metadata=params.get('metadata', {}),
+                customer_details=SimpleNamespace(email=None),
+            )
+        return cls.sessions[session_id]
+
+    @classmethod
+    def retrieve(cls, session_id):
+        return cls.sessions[session_id]
+
+    # Giống Session.list của Stripe: mới nhất trước, phân trang bằng starting_after
+    @classmethod
+    def list(cls, limit=100, starting_after=None, created=None, **params):
+        sessions = list(reversed(list(cls.sessions.values())))
+        if starting_after:
+            ids = [session.id for session in sessions]
+            sessions = sessions[ids.index(starting_after) + 1:]
+        return SimpleNamespace(data=sessions[:limit], has_more=len(sessions) > limit)
+
+    @classmethod
+    def expire(cls, session_id):
+        session = cls.sessions[session_id]
+        session.status = 'expired'
+        return session
+
+    # Đánh dấu phiên đã thanh toán (mô phỏng khách hàng trả tiền trên trang Stripe)
+    @classmethod
+    def complete(cls, session_id, amount_total, email=None):
+        session = cls.sessions[session_id]
+        session.amount_total = amount_total
+        session.payment_status = 'paid'
+        session.status = 'complete'
+        session.customer_details = SimpleNamespace(email=email)
+        return session
+
+
+fake_stripe = SimpleNamespace(checkout=SimpleNamespace(Session=FakeCheckoutSession))
+
+
+def get_stripe():
+    if getattr(settings, 'STRIPE_BACKEND', 'stripe') == 'fake':
+        return fake_stripe
+    return stripe
+
+
+def purchase_limit_key(user_id):
+    return f"purchase_limit:{user_id}"
+
+
+# Trạng thái hóa đơn tương ứng với một phiên Checkout của Stripe
+def session_payment_status(session):
+    if session.status == 'expired':
+        return 'expired'
+    return session.payment_status
+
+
+# Cập nhật hóa đơn theo phiên Checkout (dùng chung cho webhook và reconcile)
+# Idempotent: nhận cùng một sự kiện nhiều lần không thay đổi gì thêm, hóa đơn đã 'paid' không bị hạ trạng thái.
+# Tìm theo stripe_session_id, nếu tác vụ nền chưa kịp lưu id phiên thì tìm theo client_reference_id (id hóa đơn)
+def apply_checkout_session(session):
+    payment_status = session_payment_status(session)
+    with transaction.atomic():
+        invoice = Invoice.objects.select_for_update().filter(stripe_session_id=session.id).first()
+        reference = getattr(session, 'client_reference_id', None)
+        if invoice is None and reference and str(reference).isdigit():
+            invoice = Invoice.objects.select_for_update().filter(pk=int(reference)).first()
+        if invoice is None:
+            return None
+        if invoice.payment_status == 'paid' or \
+                (invoice.payment_status == payment_status and invoice.stripe_session_id == session.id):
+            return invoice
+
+        invoice.stripe_session_id = session.id
+        invoice.payment_status = payment_status
+        if payment_status == 'paid':
+            invoice.amount_total = session.amount_total / 100  # Chuyển từ cents sang đơn vị tiền tệ
+            customer_details = getattr(session, 'customer_details', None)
+            invoice.customer_email = customer_details.email if customer_details else None
+            invoice.payment_date = timezone.now()
+        invoice.save()
+
+    if payment_status == 'expired':
+        # Phiên bị bỏ dở: cho phép người dùng mua gói khác ngay
+        redis_client.delete(purchase_limit_key(invoice.user_id))
+    return invoice
+
+
+# Các sự kiện Stripe làm thay đổi trạng thái hóa đơn
+CHECKOUT_SESSION_EVENTS = (
+    'checkout.session.completed',
+    'checkout.session.async_payment_succeeded',
+    'checkout.session.async_payment_failed',
+    'checkout.session.expired',
+)
+PROCESSED_EVENT_TIMEOUT = timedelta(days=3)  # Stripe gửi lại sự kiện trong tối đa 3 ngày
+
+
+# Xử lý một sự kiện webhook, bỏ qua sự kiện đã xử lý (Stripe có thể gửi một sự kiện nhiều lần)
+def handle_event(event):
+    if event.type not in CHECKOUT_SESSION_EVENTS:
+        return None
+    if not redis_client.set(f"stripe_event:{event.id}", 1, nx=True, ex=PROCESSED_EVENT_TIMEOUT):
+        return None
+    try:
+        return apply_checkout_session(event.data.object)
+    except Exception:
+        # Cho phép Stripe gửi lại sự kiện khi xử lý lỗi
+        redis_client.delete(f"stripe_event:{event.id}")
+        raise
+
+
+# Secret ký webhook; chưa cấu hình thì từ chối (HMAC với khóa rỗng ai cũng giả mạo được)
+def _webhook_secret():
+    secret = settings.STRIPE_WEBHOOK_SECRET
+    if not secret:
+        logger.error('STRIPE_WEBHOOK_SECRET is not configured, refusing Stripe webhook payloads')
+        raise ImproperlyConfigured('STRIPE_WEBHOOK_SECRET is not configured.')
+    return secret
+
+
+# Xác thực chữ ký header Stripe-Signature (HMAC, không gọi mạng) và trả về sự kiện
+def construct_event(payload, sig_header):
+    return stripe.Webhook.construct_event(payload, sig_header, _webhook_secret())
+
+
+# Tạo header Stripe-Signature cho payload (dùng với Stripe giả lập và fixture jobs/fixtures/stripe_events)
+def generate_signature_header(payload, secret=None, timestamp=None):
+    secret = _webhook_secret() if secret is None else secret
+    timestamp = int(timestamp or time.time())
+    signed_payload = f"{timestamp}.{payload}".encode('utf-8')
+    signature = hmac.new(secret.encode('utf-8'), signed_payload, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+# Đối chiếu các hóa đơn đang chờ với Stripe theo từng trang (100 phiên/lần gọi) thay vì retrieve từng phiên
+# Hóa đơn chờ quá PENDING_INVOICE_MAX_AGE mà không có phiên tương ứng thì chuyển sang 'expired'
+def reconcile_pending_invoices(max_age=PENDING_INVOICE_MAX_AGE, page_size=100):
+    cutoff = timezone.now() - max_age
+    pending = list(Invoice.objects.filter(payment_status__in=OPEN_PAYMENT_STATUSES, payment_date__gte=cutoff)
+                   .values_list('id', 'stripe_session_id', 'payment_date'))
+    updated = 0
+
+    if pending:
+        invoice_ids = {str(invoice_id) for invoice_id, _, _ in pending}
+        session_ids = {session_id for _, session_id, _ in pending}
+        params = {'limit': page_size, 'created': {'gte': int(min(date for _, _, date in pending).timestamp())}}
+        while True:
+            page = get_stripe().checkout.Session.list(**params)
+            for session in page.data:
+                if session.id in session_ids or getattr(session, 'client_reference_id', None) in invoice_ids:
+                    if session_payment_status(session) not in OPEN_PAYMENT_STATUSES:
+                        apply_checkout_session(session)
+                        updated += 1
+            if not page.has_more or not page.data:
+                break
+            params['starting_after'] = page.data[-1].id
+
+    stale = Invoice.objects.filter(payment_status__in=OPEN_PAYMENT_STATUSES, payment_date__lt=cutoff)
+    stale_user_ids = set(stale.exclude(user=None).values_list('user_id', flat=True))
+    expired = stale.update(payment_status='expired')
+    if stale_user_ids:
+        redis_client.delete(*[purchase_limit_key(user_id) for user_id in stale_user_ids])
+
+    return updated, expired
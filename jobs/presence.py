@@ -0,0 +1,68 @@
+import time
+
+import redis.asyncio as aioredis
+from django.conf import settings
+
+# Trạng thái online của người dùng và chỉ báo "đang nhập" cho websocket chat (lưu trong Redis)
+# Mỗi kết nối là một phần tử trong sorted set presence:<user_id>, điểm số là thời điểm hết hạn.
+# Client gửi heartbeat định kỳ để gia hạn, kết nối bị rớt sẽ tự hết hạn sau PRESENCE_TTL.
+PRESENCE_TTL = 60  # Giây
+TYPING_TTL = 3  # Giây, trong khoảng này chỉ phát một sự kiện typing cho mỗi người/phòng
+
+aioredis_client = aioredis.StrictRedis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0)
+
+
+def presence_key(user_id):
+    return f'presence:{user_id}'
+
+
+def typing_key(room_id, user_id):
+    return f'typing:{room_id}:{user_id}'
+
+
+# Đánh dấu kết nối đang hoạt động (gọi khi connect và mỗi heartbeat)
+# Trả về True nếu đây là kết nối đầu tiên của người dùng (vừa chuyển sang online)
+async def touch(user_id, channel_name):
+    now = time.time()
+    key = presence_key(user_id)
+    async with aioredis_client.pipeline(transaction=True) as pipe:
+        pipe.zremrangebyscore(key, '-inf', now)
+        pipe.zcard(key)
+        pipe.zadd(key, {channel_name: now + PRESENCE_TTL})
+        pipe.expire(key, PRESENCE_TTL)
+        _, active_before, _, _ = await pipe.execute()
+    return active_before == 0
+
+
+# Xóa kết nối khi disconnect, trả về True nếu người dùng không còn kết nối nào (offline)
+async def leave(user_id, channel_name):
+    key = presence_key(user_id)
+    async with aioredis_client.pipeline(transaction=True) as pipe:
+        pipe.zrem(key, channel_name)
+        pipe.zremrangebyscore(key, '-inf', time.time())
+        pipe.zcard(key)
+        _, _, remaining = await pipe.execute()
+    return remaining == 0
+
+
+# Trạng thái online của nhiều người dùng trong một round-trip
+async def get_online(user_ids):
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+    now = time.time()
+    async with aioredis_client.pipeline(transaction=False) as pipe:
+        for user_id in user_ids:
+            pipe.zcount(presence_key(user_id), now, '+inf')
+        counts = await pipe.execute()
+    return {user_id: count > 0 for user_id, count in zip(user_ids, counts)}
+
+
+# Gộp các sự kiện typing: chỉ trả True một lần trong mỗi khoảng TYPING_TTL
+async def should_broadcast_typing(room_id, user_id):
+    return bool(await aioredis_client.set(typing_key(room_id, user_id), 1, nx=True, ex=TYPING_TTL))
+
+
+# Khi gửi tin nhắn thì trạng thái typing kết thúc, lần gõ tiếp theo được phát ngay
+async def clear_typing(room_id, user_id):
+    await aioredis_client.delete(typing_key(room_id, user_id))
@@ -0,0 +1,88 @@
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from jobs.dao import get_latest_paid_invoice
+from jobs.utils import redis_client
+
+# Giới hạn đăng bài mỗi ngày của nhà tuyển dụng
+# - Bộ đếm job_posted:<user_id>:<ngày> tăng/giảm bằng script Lua (đặt chỗ + kiểm tra giới hạn trong một lệnh)
+# - Gói hiện tại (limit, hạn dùng) được cache ở post_quota:plan:<user_id>, làm mới khi Invoice thay đổi,
+#   hết hạn thì script tự quay về DEFAULT_DAILY_POST_LIMIT nên không cần truy vấn SQL
+DEFAULT_DAILY_POST_LIMIT = 1  # Chỉ được đăng 1 bài khi không có gói hợp lệ
+COUNTER_TIMEOUT = int(timedelta(days=1).total_seconds())
+PLAN_TIMEOUT = int(timedelta(days=1).total_seconds())
+
+Reservation = namedtuple('Reservation', ['allowed', 'limit', 'count'])
+
+# Trả về {-1} nếu chưa có gói trong cache, ngược lại {1|0, limit, count}
+RESERVE_SCRIPT = redis_client.register_script("""
+local plan = redis.call('HMGET', KEYS[2], 'limit', 'expires')
+if not plan[1] then
+    return {-1, 0, 0}
+end
+local limit = tonumber(ARGV[1])
+if tonumber(plan[2]) > tonumber(ARGV[2]) then
+    limit = tonumber(plan[1])
+end
+local count = redis.call('INCR', KEYS[1])
+if count == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+if count > limit then
+    redis.call('DECR', KEYS[1])
+    return {0, limit, count - 1}
+end
+return {1, limit, count}
+""")
+
+# Hoàn lại chỗ đã đặt nếu tạo bài đăng thất bại (không để bộ đếm âm)
+RELEASE_SCRIPT = redis_client.register_script("""
+local count = tonumber(redis.call('GET', KEYS[1]) or '0')
+if count > 0 then
+    return redis.call('DECR', KEYS[1])
+end
+return 0
+""")
+
+
+def counter_key(user_id):
+    return f"job_posted:{user_id}:{datetime.now().date()}"
+
+
+def plan_key(user_id):
+    return f"post_quota:plan:{user_id}"
+
+
+# Đọc gói từ SQL và ghi vào cache (chỉ khi cache trống hoặc khi Invoice thay đổi)
+def refresh_plan(user_id):
+    invoice = get_latest_paid_invoice(user_id)
+    if invoice and not invoice.is_expired:
+        limit, expires = invoice.daily_post_limit or DEFAULT_DAILY_POST_LIMIT, invoice.expiry_date.timestamp()
+    else:
+        limit, expires = DEFAULT_DAILY_POST_LIMIT, 0
+    pipe = redis_client.pipeline()
+    pipe.hset(plan_key(user_id), mapping={'limit': limit, 'expires': expires})
+    pipe.expire(plan_key(user_id), PLAN_TIMEOUT)
+    pipe.execute()
+
+
+def _reserve(user_id):
+    allowed, limit, count = RESERVE_SCRIPT(
+        keys=[counter_key(user_id), plan_key(user_id)],
+        args=[DEFAULT_DAILY_POST_LIMIT, time.time(), COUNTER_TIMEOUT],
+    )
+    return allowed, limit, count
+
+
+# Đặt chỗ cho một bài đăng, thường chỉ một lần gọi Redis
+def reserve_post(user_id):
+    allowed, limit, count = _reserve(user_id)
+    if allowed == -1:
+        refresh_plan(user_id)
+        allowed, limit, count = _reserve(user_id)
+    return Reservation(allowed == 1, limit, count)
+
+
+def release_post(user_id):
+    RELEASE_SCRIPT(keys=[counter_key(user_id)])
@@ -0,0 +1,78 @@
+import threading
+import time
+
+from jobs.models import Status, Career, Area, EmploymentType
+from jobs.text import fold_text
+from jobs.utils import redis_client
+
+# Cache trong process cho các bảng danh mục nhỏ (Status, Career, Area, EmploymentType)
+# - Mỗi bảng được nạp toàn bộ một lần, tra cứu theo id/giá trị không cần SQL
+# - Redis giữ số phiên bản refdata:version, sửa danh mục (admin) thì tăng phiên bản,
+#   các process khác thấy phiên bản đổi sẽ xóa cache và nạp lại
+# - Phiên bản chỉ được kiểm tra mỗi VERSION_CHECK_INTERVAL giây để không gọi Redis cho mỗi lần tra cứu
+REFDATA_MODELS = (Status, Career, Area, EmploymentType)
+VERSION_KEY = 'refdata:version'
+VERSION_CHECK_INTERVAL = 5  # Giây
+
+_tables = {}
+_version = None
+_checked_at = 0
+_lock = threading.Lock()
+
+
+def _check_version():
+    global _version, _checked_at
+    now = time.monotonic()
+    if now - _checked_at < VERSION_CHECK_INTERVAL:
+        return
+    version = redis_client.get(VERSION_KEY)
+    with _lock:
+        if version != _version:
+            _tables.clear()
+            _version = version
+        _checked_at = now
+
+
+# Toàn bộ bảng dạng {id: instance} (các instance chỉ dùng để đọc)
+def get_table(model):
+    _check_version()
+    table = _tables.get(model)
+    if table is None:
+        table = {obj.pk: obj for obj in model.objects.all()}
+        with _lock:
+            _tables[model] = table
+    return table
+
+
+def get(model, pk):
+    if pk is None:
+        return None
+    return get_table(model).get(pk)
+
+
+def get_all(model):
+    return list(get_table(model).values())
+
+
+# Tìm theo giá trị của một trường, vd get_by(Status, 'role', 'Pending')
+def get_by(model, field, value):
+    for obj in get_table(model).values():
+        if getattr(obj, field) == value:
+            return obj
+    return None
+
+
+# Id các dòng có trường chứa chuỗi tìm kiếm (không phân biệt hoa thường/dấu, giống icontains trên MySQL)
+def search_ids(model, field, text):
+    text = fold_text(text)
+    return [obj.pk for obj in get_table(model).values() if text in fold_text(getattr(obj, field))]
+
+
+# Gọi khi một bảng danh mục thay đổi (signal post_save/post_delete)
+def invalidate():
+    global _version, _checked_at
+    version = redis_client.incr(VERSION_KEY)
+    with _lock:
+        _tables.clear()
+        _version = str(version).encode()
+        _checked_at = time.monotonic()
@@ -0,0 +1,122 @@
+import functools
+import hashlib
+import time
+from urllib.parse import urlencode
+from django.core.cache import cache
+from rest_framework.response import Response
+
+# CACHE RESPONSE CHO CÁC API DANH SÁCH CÔNG KHAI (chỉ áp dụng cho người dùng chưa đăng nhập)
+# - Key = path + query params đã chuẩn hóa + phiên bản của các tag
+# - Xóa cache theo tag: tăng phiên bản tag => mọi key cũ của tag đó không còn được đọc tới
+# - Chống dồn request (stampede): hết hạn mềm thì chỉ một worker tính lại, các worker khác trả bản cũ
+
+RESPONSE_CACHE_TIMEOUT = 60  # Hạn mềm (giây)
+RESPONSE_CACHE_STALE_TIMEOUT = 300  # Thời gian được phép trả bản cũ sau hạn mềm
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2.0
+LOCK_POLL_INTERVAL = 0.05
+
+KEY_PREFIX = 'resp_cache'
+METRICS = ('hit', 'stale', 'miss')
+
+
+def _tag_key(tag):
+    return f'{KEY_PREFIX}:tag:{tag}'
+
+
+def _metric_key(name):
+    return f'{KEY_PREFIX}:metrics:{name}'
+
+
+def _incr(key):
+    cache.add(key, 0, timeout=None)
+    return cache.incr(key)
+
+
+def invalidate_tags(*tags):
+    for tag in tags:
+        _incr(_tag_key(tag))
+
+
+def record_metric(name):
+    try:
+        _incr(_metric_key(name))
+    except Exception:
+        pass  # Không để việc ghi số liệu làm hỏng request
+
+
+def get_metrics():
+    values = cache.get_many([_metric_key(name) for name in METRICS])
+    return {name: values.get(_metric_key(name), 0) for name in METRICS}
+
+
+def reset_metrics():
+    cache.delete_many([_metric_key(name) for name in METRICS])
+
+
+def build_cache_key(request, tags):
+    # Sắp xếp query params, bỏ giá trị rỗng và page=1 để các URL tương đương dùng chung một key
+    params = sorted(
+        (key, value)
+        for key in request.query_params
+        for value in request.query_params.getlist(key)
+        if value != '' and not (key == 'page' and value == '1')
+    )
+    tag_keys = [_tag_key(tag) for tag in tags]
+    versions = cache.get_many(tag_keys)
+    version_part = ','.join(f'{tag}:{versions.get(key, 0)}' for tag, key in zip(tags, tag_keys))
+    raw = f'{request.path}?{urlencode(params)}|{version_part}'
+    return f'{KEY_PREFIX}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def _wait_for_entry(key):
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+# Decorator cho các method GET của viewset: @cache_response('jobs', 'popular')
+def cache_response(*tags, timeout=RESPONSE_CACHE_TIMEOUT, stale_timeout=RESPONSE_CACHE_STALE_TIMEOUT):
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return view_method(self, request, *args, **kwargs)
+
+            key = build_cache_key(request, tags)
+            lock_key = f'{key}:lock'
+            entry = cache.get(key)
+
+            if entry is not None and entry['expires_at'] > time.time():
+                record_metric('hit')
+                return Response(entry['data'])
+
+            owns_lock = cache.add(lock_key, 1, timeout=LOCK_TIMEOUT)
+            if not owns_lock:
+                if entry is not None:
+                    # Worker khác đang tính lại => trả bản cũ
+                    record_metric('stale')
+                    return Response(entry['data'])
+                entry = _wait_for_entry(key)
+                if entry is not None:
+                    record_metric('hit')
+                    return Response(entry['data'])
+
+            record_metric('miss')
+            try:
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code == 200:
+                    cache.set(key, {'data': response.data, 'expires_at': time.time() + timeout},
+                              timeout=timeout + stale_timeout)
+                return response
+            finally:
+                if owns_lock:
+                    cache.delete(lock_key)
+
+        return wrapper
+
+    return decorator
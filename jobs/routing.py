@@ -2,6 +2,8 @@ from django.urls import path
 from .consumers import ChatConsumer
 
 websocket_urlpatterns = [
+    # Một kết nối cho tất cả các phòng chat của người dùng (nhóm user_<id>)
+    path('ws/chat/', ChatConsumer.as_asgi()),
     path('ws/chat/<str:room_name>/', ChatConsumer.as_asgi()),
     path(r'ws/chat/(?P<room_name>\w+)/$', ChatConsumer.as_asgi()),
 ]
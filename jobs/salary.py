@@ -0,0 +1,84 @@
+import re
+from django.conf import settings
+from jobs.text import fold_text
+
+NEGOTIABLE_WORDS = ('thoa thuan', 'canh tranh', 'negotiable', 'deal')
+LOWER_BOUND_WORDS = ('tren', 'tu', 'hon', 'toi thieu', 'from', 'over', '>')
+UPPER_BOUND_WORDS = ('duoi', 'den', 'toi', 'toi da', 'upto', 'up to', '<')
+
+UNIT_MULTIPLIERS = {
+    'ty': 1_000_000_000,
+    'billion': 1_000_000_000,
+    'trieu': 1_000_000,
+    'tr': 1_000_000,
+    'm': 1_000_000,
+    'million': 1_000_000,
+    'millions': 1_000_000,
+    'mil': 1_000_000,
+    'nghin': 1_000,
+    'ngan': 1_000,
+    'k': 1_000,
+    'thousand': 1_000,
+}
+# Các từ được phép đứng ngay sau một số ngoài đơn vị (tiền tệ, nối khoảng lương)
+CURRENCY_WORDS = ('vnd', 'dong', 'd', 'usd')
+RANGE_WORDS = ('den', 'toi', 'to')
+
+SALARY_NUMBER_RE = re.compile(r'(\d+(?:[.,]\d+)*)\s*([a-z]+)?')
+
+
+# So khớp nguyên từ ("tu" không khớp "tuyen", "toi" không khớp "toi thieu" vì cận dưới được xét trước)
+def _has_word(text, words):
+    return any(re.search(rf'(?<![a-z]){re.escape(word)}(?![a-z])', text) for word in words)
+
+
+def _to_number(token):
+    # "5.000.000" hoặc "5,000,000" là dấu phân cách hàng nghìn, "1.5" / "1,5" là số thập phân
+    if re.fullmatch(r'\d{1,3}([.,]\d{3})+', token):
+        return float(re.sub(r'[.,]', '', token))
+    return float(token.replace(',', '.'))
+
+
+# Phân tích chuỗi lương tự do thành khoảng (salary_min, salary_max) theo VNĐ
+# "10-15 triệu" -> (10000000, 15000000); "Trên 10 triệu" -> (10000000, None); "Lên tới 20 triệu" -> (None, 20000000)
+# "$1000" -> (25000000, 25000000) với SALARY_USD_TO_VND = 25000; "Thỏa thuận" -> (None, None)
+# Đơn vị không nhận ra ("10-15 lakh") -> (None, None) thay vì coi các số là VNĐ
+def parse_salary(text):
+    folded = fold_text(text).strip()
+    if not folded or any(word in folded for word in NEGOTIABLE_WORDS):
+        return None, None
+
+    matches = SALARY_NUMBER_RE.findall(folded)
+    if not matches:
+        return None, None
+
+    units = []
+    for number, word in matches:
+        if word and word not in UNIT_MULTIPLIERS and word not in CURRENCY_WORDS + RANGE_WORDS:
+            return None, None
+        units.append(word if word in UNIT_MULTIPLIERS else None)
+
+    is_usd = '$' in folded or 'usd' in folded
+    values = []
+    # Số không có đơn vị dùng đơn vị của số phía sau: "10-15 triệu"
+    next_unit = None
+    for (number, _), unit in zip(reversed(matches), reversed(units)):
+        unit = unit or next_unit
+        next_unit = unit
+        value = _to_number(number) * UNIT_MULTIPLIERS.get(unit, 1)
+        if is_usd:
+            value *= settings.SALARY_USD_TO_VND
+        values.append(int(value))
+    values.reverse()
+
+    if len(values) >= 2:
+        return min(values[:2]), max(values[:2])
+
+    # Chỉ có một mức lương: xét các từ đứng trước số để biết là cận dưới hay cận trên
+    value = values[0]
+    prefix = folded[:SALARY_NUMBER_RE.search(folded).start()]
+    if _has_word(prefix, LOWER_BOUND_WORDS):
+        return value, None
+    if _has_word(prefix, UPPER_BOUND_WORDS):
+        return None, value
+    return value, value
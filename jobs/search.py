@@ -0,0 +1,40 @@
+import re
+from django.db import connections
+from django.db.models.expressions import RawSQL
+from django.utils.html import strip_tags
+from jobs.text import fold_text
+
+# Chỉ giữ lại chữ và số để không lọt toán tử của BOOLEAN MODE (+ - * " ...) vào câu truy vấn
+SEARCH_TERM_RE = re.compile(r'\w+')
+
+
+# Văn bản tìm kiếm (đã bỏ dấu) của một bài tuyển dụng, được lưu vào Job.search_document
+def build_search_document(job):
+    company_name = job.company.companyName if job.company_id else ''
+    parts = [job.title, job.position, strip_tags(job.description or ''), job.location, company_name]
+    return fold_text(' '.join(part for part in parts if part))
+
+
+def get_search_terms(q):
+    return SEARCH_TERM_RE.findall(fold_text(q))
+
+
+# Tìm kiếm bài tuyển dụng theo từ khóa q, sắp xếp theo độ liên quan
+# MySQL: dùng chỉ mục FULLTEXT trên search_document (mỗi từ đều phải xuất hiện, cho phép khớp tiền tố)
+# CSDL khác (SQLite khi chạy local): lọc contains trên search_document, sắp xếp theo id
+def search_jobs(queryset, q):
+    terms = get_search_terms(q)
+    if not terms:
+        return queryset
+
+    if connections[queryset.db].vendor == 'mysql':
+        against = ' '.join(f'+{term}*' for term in terms)
+        relevance = RawSQL(
+            f'MATCH ({queryset.model._meta.db_table}.search_document) AGAINST (%s IN BOOLEAN MODE)',
+            (against,)
+        )
+        return queryset.annotate(relevance=relevance).filter(relevance__gt=0).order_by('-relevance', '-id')
+
+    for term in terms:
+        queryset = queryset.filter(search_document__contains=term)
+    return queryset.order_by('-id')
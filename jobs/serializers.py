@@ -1,10 +1,43 @@
 from rest_framework import serializers
 from jobs.models import (User, JobSeeker, Area, Career, EmploymentType, Company, Status, Job, Invoice,
-                         Rating, JobApplication, Like)
+                         Rating, JobApplication, Like, Room)
 from django.contrib.auth import get_user_model
 from .models import COMPANY_CHOICES
 from django.utils.html import strip_tags #loại bỏ thẻ html bên trong richtextfield
 from datetime import datetime
+from jobs import dao, refdata
+
+
+# Khai báo các quan hệ cần nạp sẵn (select_related/prefetch_related) cho từng serializer
+# để view dựng queryset theo serializer đang dùng, tránh truy vấn N+1 khi serialize danh sách
+class EagerLoadingMixin:
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return queryset
+
+
+def prefix_related(prefix, fields):
+    return tuple(f'{prefix}__{field}' for field in fields)
+
+
+# Serializer lồng của bảng danh mục: lấy đối tượng từ jobs.refdata theo <field>_id thay vì truy vấn/join
+class RefDataSerializerMixin:
+    def get_attribute(self, instance):
+        if len(self.source_attrs) == 1 and hasattr(instance, self.source_attrs[0] + '_id'):
+            pk = getattr(instance, self.source_attrs[0] + '_id')
+            if pk is None:
+                return None
+            obj = refdata.get(self.Meta.model, pk)
+            if obj is not None:
+                return obj
+        return super().get_attribute(instance)
 
 
 # class AvatarSerializer(serializers.ModelSerializer):
@@ -28,25 +61,25 @@ class InvoiceSerializer(serializers.ModelSerializer):
 #         fields = ['id', 'name']
 
 
-class AreaSerializer(serializers.ModelSerializer):
+class AreaSerializer(RefDataSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Area
         fields = ['id', 'name']
 
 
-class CareerSerializer(serializers.ModelSerializer):
+class CareerSerializer(RefDataSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Career
         fields = ['id', 'name']
 
 
-class EmploymentTypeSerializer(serializers.ModelSerializer):
+class EmploymentTypeSerializer(RefDataSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = EmploymentType
         fields = ['id', 'type']
 
 
-class StatusSerializer(serializers.ModelSerializer):
+class StatusSerializer(RefDataSerializerMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Status
@@ -223,7 +256,12 @@ class CompanyCreateSerializer(serializers.ModelSerializer):
         return dict(COMPANY_CHOICES).get(obj.company_type)
 
 
-class JobSerializer(serializers.ModelSerializer):
+class JobSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    # company__user__jobseeker: UserDetailSerializer đọc user.jobseeker và user.company
+    # (user.company được Django gán sẵn khi join ngược từ company__user)
+    # career/employmenttype/area lấy từ jobs.refdata nên không cần join
+    select_related_fields = ('company__user__jobseeker',)
+
     company = CompanySerializer()
     career = CareerSerializer()
     employmenttype = EmploymentTypeSerializer()
@@ -311,15 +349,21 @@ class JobCreateSerializer(serializers.ModelSerializer):
 class AuthenticatedJobSerializer(JobSerializer):
     liked = serializers.SerializerMethodField()
 
+    # liked được view gắn sẵn theo user hiện tại (dao.annotate_liked)
     def get_liked(self, job):
-        return job.like_set.filter(active=True).exists()
+        if hasattr(job, 'liked'):
+            return job.liked
+        request = self.context.get('request')
+        return dao.is_liked(job, request.user if request else None)
 
     class Meta:
         model = JobSerializer.Meta.model
         fields = JobSerializer.Meta.fields + ['liked']
 
 
-class RatingSerializer(serializers.ModelSerializer):
+class RatingSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('job', 'jobseeker__user__company')
+
     user = serializers.SerializerMethodField()
     created_date = serializers.SerializerMethodField()
 
@@ -349,7 +393,9 @@ class RatingUpdateSerializer(serializers.ModelSerializer):
         fields = ['rating', 'comment']
 
 
-class JobApplicationSerializer(serializers.ModelSerializer):
+class JobApplicationSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('jobseeker__user__company',)
+
     status = serializers.PrimaryKeyRelatedField(read_only=True)
     date = serializers.SerializerMethodField()
     job = serializers.PrimaryKeyRelatedField(queryset=Job.objects.all())
@@ -364,7 +410,7 @@ class JobApplicationSerializer(serializers.ModelSerializer):
         depth = 1
 
     def create(self, validated_data):
-        validated_data['status'] = Status.objects.get(role='Pending')
+        validated_data['status'] = refdata.get_by(Status, 'role', 'Pending')
         return super().create(validated_data)
 
     # Thêm phương thức get_date để định nghĩa cách trả về giá trị cho 'date'
@@ -384,7 +430,53 @@ class JobApplicationSerializer(serializers.ModelSerializer):
         return strip_tags(obj.content)
 
 
-class JobApplicationStatusSerializer(serializers.ModelSerializer):
+# Bản rút gọn của job, dùng làm từ điển "jobs" đi kèm danh sách đơn ứng tuyển (mỗi job chỉ serialize một lần)
+class JobSummarySerializer(serializers.ModelSerializer):
+    deadline = serializers.DateField(format="%d/%m/%Y")
+
+    class Meta:
+        model = Job
+        fields = ['id', 'title', 'deadline', 'active', 'application_count']
+
+
+# Đơn ứng tuyển rút gọn cho nhà tuyển dụng: job chỉ là id (tra trong từ điển "jobs"), ứng viên chỉ các trường cần thiết
+class CompanyApplicationSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('jobseeker__user',)
+
+    status = StatusSerializer()
+    date = serializers.DateTimeField(format="%d/%m/%Y %H:%M")
+    applicant = serializers.SerializerMethodField()
+
+    def get_applicant(self, obj):
+        jobseeker = obj.jobseeker
+        if jobseeker is None:
+            return None
+        user = jobseeker.user
+        return {
+            'id': user.id,
+            'jobseeker_id': jobseeker.id,
+            'username': user.username,
+            'email': user.email,
+            'avatar': user.avatar.url if user.avatar else None,
+            'position': jobseeker.position,
+            'cv': jobseeker.cv.url if jobseeker.cv else None,
+        }
+
+    class Meta:
+        model = JobApplication
+        fields = ['id', 'job', 'status', 'date', 'is_student', 'content', 'applicant']
+
+
+# Một dòng trong API cập nhật trạng thái hàng loạt: {"application_id": 1, "status": "Accepted"}
+class ApplicationStatusUpdateSerializer(serializers.Serializer):
+    application_id = serializers.IntegerField()
+    status = serializers.CharField(max_length=255)
+
+
+class JobApplicationStatusSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('jobseeker__user__company',) + \
+                            prefix_related('job', JobSerializer.select_related_fields)
+
     job = JobSerializer()
     status = StatusSerializer()
     date = serializers.SerializerMethodField()
@@ -412,9 +504,46 @@ class JobApplicationStatusSerializer(serializers.ModelSerializer):
         fields = ['id', 'job', 'user', 'jobseeker', 'status', 'content', 'is_student', 'date']
 
 
-class LikeSerializer(serializers.ModelSerializer):
+class LikeSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = prefix_related('job', JobSerializer.select_related_fields)
+
     job = JobSerializer()
 
     class Meta:
         model = Like
         fields = '__all__'
+
+
+# Một phòng trong hộp thư chat (dùng cho cả REST /rooms/ và websocket user_chat_rooms)
+# Queryset lấy từ dao.get_chat_inbox, context cần có 'user_id'
+class RoomInboxSerializer(serializers.ModelSerializer):
+    room_id = serializers.IntegerField(source='id')
+    job_title = serializers.CharField(source='job.title', default=None)
+    sender_user = serializers.SerializerMethodField()  # Người đối diện trong cuộc trò chuyện
+    last_message = serializers.SerializerMethodField()
+    unread_count = serializers.IntegerField()
+
+    def get_sender_user(self, room):
+        user = room.receiver if room.sender_id == self.context['user_id'] else room.sender
+        if user is None:
+            return None
+        return {
+            'id': user.id,
+            'username': user.username,
+            'avatar': user.avatar.url if user.avatar else None,
+        }
+
+    def get_last_message(self, room):
+        message = room.last_message
+        if message is None:
+            return None
+        return {
+            'id': message.id,
+            'message': message.message,
+            'sender_id': message.sender_id,
+            'created_at': message.created_at,
+        }
+
+    class Meta:
+        model = Room
+        fields = ['room_id', 'job_id', 'job_title', 'sender_user', 'last_message', 'unread_count', 'last_activity']
@@ -0,0 +1,136 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from jobs.models import User, Invoice, Company, Job, JobApplication, Like, Career, Area, EmploymentType, Status
+from jobs.search import build_search_document
+from jobs.response_cache import invalidate_tags
+from jobs import quota, refdata, stats
+from django.db import transaction
+from jobs.auth import invalidate_token, invalidate_user_tokens
+from oauth2_provider.models import AccessToken
+
+
+# Giữ lại tên công ty cũ để chỉ dựng lại văn bản tìm kiếm khi tên thực sự thay đổi
+@receiver(pre_save, sender=Company)
+def remember_company_name(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._old_company_name = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and 'companyName' not in update_fields:
+        return
+    instance._old_company_name = Company.objects.filter(pk=instance.pk) \
+        .values_list('companyName', flat=True).first()
+
+
+# Đổi tên công ty thì cập nhật lại văn bản tìm kiếm của các bài tuyển dụng thuộc công ty đó
+@receiver(post_save, sender=Company)
+def refresh_company_jobs_search_document(sender, instance, created, **kwargs):
+    old_name = getattr(instance, '_old_company_name', None)
+    if created or old_name is None or old_name == instance.companyName:
+        return
+    jobs = list(Job.objects.filter(company=instance))
+    for job in jobs:
+        job.company = instance
+        job.search_document = build_search_document(job)
+    Job.objects.bulk_update(jobs, ['search_document'], batch_size=500)
+
+
+# XÓA CACHE RESPONSE THEO TAG
+@receiver([post_save, post_delete], sender=Job)
+@receiver([post_save, post_delete], sender=Company)
+def invalidate_job_cache(sender, **kwargs):
+    invalidate_tags('jobs', 'popular')
+
+
+# Thêm/xóa đơn ứng tuyển làm thay đổi thứ tự /jobs/popular/
+@receiver([post_save, post_delete], sender=JobApplication)
+def invalidate_popular_cache(sender, **kwargs):
+    # Đổi trạng thái đơn (post_save với created=False) không ảnh hưởng thứ tự
+    if kwargs.get('created', True):
+        invalidate_tags('popular')
+
+
+# like_count nằm trên Job nhưng được cập nhật bằng F() nên không phát signal của Job
+@receiver([post_save, post_delete], sender=Like)
+def invalidate_like_cache(sender, **kwargs):
+    invalidate_tags('jobs', 'popular')
+
+
+# Tên ngành nghề/khu vực/loại công việc nằm lồng trong mỗi job
+@receiver([post_save, post_delete], sender=Career)
+@receiver([post_save, post_delete], sender=Area)
+@receiver([post_save, post_delete], sender=EmploymentType)
+def invalidate_reference_cache(sender, **kwargs):
+    invalidate_tags(sender.__name__.lower(), 'jobs', 'popular')
+
+
+# Token bị thu hồi (xóa) hoặc thay đổi (làm mới, đổi hạn) thì xóa khỏi cache xác thực
+@receiver([post_save, post_delete], sender=AccessToken)
+def invalidate_access_token_cache(sender, instance, **kwargs):
+    invalidate_token(instance.token)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_token_cache(sender, instance, **kwargs):
+    invalidate_user_tokens(instance.pk)
+
+
+# Hóa đơn được thanh toán/hết hạn/thay đổi thì làm mới giới hạn đăng bài đã cache của người dùng
+@receiver([post_save, post_delete], sender=Invoice)
+def refresh_post_quota_plan(sender, instance, **kwargs):
+    if instance.user_id:
+        user_id = instance.user_id
+        transaction.on_commit(lambda: quota.refresh_plan(user_id))
+
+
+# Bảng danh mục thay đổi thì tăng phiên bản refdata để mọi process nạp lại (sau khi commit)
+@receiver([post_save, post_delete], sender=Status)
+@receiver([post_save, post_delete], sender=Career)
+@receiver([post_save, post_delete], sender=Area)
+@receiver([post_save, post_delete], sender=EmploymentType)
+def invalidate_refdata(sender, **kwargs):
+    transaction.on_commit(refdata.invalidate)
+
+
+# CẬP NHẬT BẢNG THỐNG KÊ TỔNG HỢP (jobs.stats), cùng transaction với thao tác ghi
+# Đổi trạng thái đơn (post_save với created=False, kể cả bulk_update) không ảnh hưởng các bảng tổng hợp
+@receiver(post_save, sender=JobApplication)
+def add_application_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.record_application(instance, 1)
+
+
+@receiver(post_delete, sender=JobApplication)
+def remove_application_stats(sender, instance, **kwargs):
+    stats.record_application(instance, -1)
+
+
+# Giữ lại nhà tuyển dụng/ngành nghề/loại công việc cũ để chuyển bộ đếm khi bài đăng bị sửa
+# Lấy từ giá trị lúc nạp (Job.from_db); chỉ SELECT khi bài đăng không được nạp từ DB hoặc bị defer các cột khóa
+@receiver(pre_save, sender=Job)
+def remember_job_stat_keys(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._stat_keys = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not {'company', 'career', 'employmenttype'} & set(update_fields):
+        return
+    instance._stat_keys = getattr(instance, '_loaded_stat_keys', None) or \
+        Job.objects.filter(pk=instance.pk).values(*stats.JOB_POST_KEYS).first()
+
+
+@receiver(post_save, sender=Job)
+def update_job_stats(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        stats.record_job(instance, 1)
+    elif getattr(instance, '_stat_keys', None):
+        stats.move_job(instance, instance._stat_keys)
+    else:
+        return
+    # Lần save sau so sánh với khóa vừa ghi
+    instance._loaded_stat_keys = stats.job_post_keys(instance)
+
+
+@receiver(post_delete, sender=Job)
+def remove_job_stats(sender, instance, **kwargs):
+    stats.record_job(instance, -1)
@@ -0,0 +1,75 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import ExtractQuarter, ExtractYear
+from django.utils import timezone
+
+from jobs.models import (ApplicationQuarterStat, ApplicationMonthStat, JobPostStat, JobGenderStat,
+                         Job, JobApplication, User)
+
+# Cập nhật dần các bảng thống kê tổng hợp khi thêm/xóa đơn ứng tuyển và bài tuyển dụng (gọi từ jobs.signals)
+# - Chạy trong cùng transaction với thao tác ghi, bảng tổng hợp luôn khớp với bảng gốc khi commit
+# - Đổi giới tính người dùng không cập nhật JobGenderStat: chạy rebuild_stats định kỳ để sửa lệch
+JOB_POST_KEYS = Job.STAT_KEY_FIELDS
+
+
+# Cộng delta vào dòng tổng hợp của khóa, chưa có thì tạo (mỗi khóa một dòng nhờ ràng buộc duy nhất)
+def _bump(model, delta, **keys):
+    if not delta:
+        return
+    rows = model.objects.filter(**keys)
+    if rows.update(total=F('total') + delta) or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(total=delta, **keys)
+    except IntegrityError:
+        # Process khác vừa tạo cùng khóa: cộng vào dòng đó
+        # (UPDATE đọc bản mới nhất, kể cả khi SELECT trong REPEATABLE READ của MySQL chưa thấy dòng này)
+        rows.update(total=F('total') + delta)
+
+
+def _quarter_month(date):
+    date = timezone.localtime(date) if timezone.is_aware(date) else date
+    return date.year, (date.month - 1) // 3 + 1, date.date().replace(day=1)
+
+
+# delta = 1 khi thêm đơn, -1 khi xóa đơn
+def record_application(application, delta):
+    job = application.job
+    if application.date:
+        year, quarter, month = _quarter_month(application.date)
+        _bump(ApplicationQuarterStat, delta, career_id=job.career_id if job else None,
+              year=year, quarter=quarter, is_student=bool(application.is_student))
+        _bump(ApplicationMonthStat, delta, month=month)
+
+    if application.job_id:
+        gender = User.objects.filter(jobseeker__id=application.jobseeker_id) \
+            .values_list('gender', flat=True).first()
+        _bump(JobGenderStat, delta, job_id=application.job_id, gender=gender)
+
+
+def job_post_keys(job):
+    return {key: getattr(job, key) for key in JOB_POST_KEYS}
+
+
+def record_job(job, delta):
+    _bump(JobPostStat, delta, **job_post_keys(job))
+
+
+# Bài đăng đổi nhà tuyển dụng/ngành nghề/loại công việc: chuyển bộ đếm sang khóa mới,
+# các đơn của bài đăng cũng chuyển sang ngành nghề mới (một GROUP BY trên chỉ mục job)
+def move_job(job, old_keys):
+    new_keys = job_post_keys(job)
+    if new_keys == old_keys:
+        return
+    _bump(JobPostStat, -1, **old_keys)
+    _bump(JobPostStat, 1, **new_keys)
+
+    if new_keys['career_id'] != old_keys['career_id']:
+        rows = JobApplication.objects.filter(job_id=job.pk, date__isnull=False) \
+            .annotate(year=ExtractYear('date'), quarter=ExtractQuarter('date')) \
+            .values('year', 'quarter', 'is_student').annotate(n=Count('id')).order_by()
+        for row in rows:
+            keys = {'year': row['year'], 'quarter': row['quarter'], 'is_student': bool(row['is_student'])}
+            _bump(ApplicationQuarterStat, -row['n'], career_id=old_keys['career_id'], **keys)
+            _bump(ApplicationQuarterStat, row['n'], career_id=new_keys['career_id'], **keys)
@@ -0,0 +1,262 @@
+import json
+import logging
+import socket
+import time
+import traceback
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.template.loader import render_to_string
+from jobs import payments, refdata
+from jobs.models import JobApplication, Status, Invoice, User
+from jobs.utils import redis_client, upload_image_from_url
+
+logger = logging.getLogger(__name__)
+
+# HÀNG ĐỢI TÁC VỤ NỀN TRÊN REDIS
+# - tasks:queue   : LIST các tác vụ chờ chạy (LPUSH khi enqueue)
+# - tasks:processing:<worker_id> : LIST tác vụ worker đang chạy (BRPOPLPUSH từ tasks:queue),
+#   chỉ xóa sau khi chạy xong hoặc đã lên lịch thử lại; worker khởi động lại trả các tác vụ còn sót về hàng đợi
+# - tasks:delayed : ZSET các tác vụ chờ thử lại, score = thời điểm được chạy lại
+# - tasks:dead    : LIST các tác vụ đã thử lại quá số lần cho phép (dead-letter)
+# Worker: python manage.py run_worker [--worker-id ...] (mỗi worker đang chạy cần một worker_id riêng)
+
+QUEUE_KEY = 'tasks:queue'
+DELAYED_KEY = 'tasks:delayed'
+DEAD_KEY = 'tasks:dead'
+PROCESSING_KEY = 'tasks:processing:{}'
+
+MAX_RETRIES = 5
+RETRY_BACKOFF = 2  # Giây, nhân đôi sau mỗi lần thử lại
+MAX_RETRY_BACKOFF = 300
+
+_registry = {}
+
+
+# Đăng ký một hàm thành tác vụ nền, gọi bằng func.delay(*args, **kwargs)
+# on_dead(*args, **kwargs): dọn dẹp khi tác vụ bị chuyển vào tasks:dead (vd trả lại trạng thái cho người dùng)
+def task(max_retries=MAX_RETRIES, on_dead=None):
+    def decorator(func):
+        func.task_name = f'{func.__module__}.{func.__name__}'
+        func.max_retries = max_retries
+        func.on_dead = on_dead
+        func.delay = lambda *args, **kwargs: enqueue(func, *args, **kwargs)
+        _registry[func.task_name] = func
+        return func
+
+    return decorator
+
+
+def enqueue(func, *args, **kwargs):
+    if getattr(settings, 'TASKS_ALWAYS_EAGER', False):
+        return func(*args, **kwargs)
+
+    payload = json.dumps({
+        'id': uuid.uuid4().hex,
+        'task': func.task_name,
+        'args': args,
+        'kwargs': kwargs,
+        'attempts': 0,
+    })
+    # Chỉ đưa vào hàng đợi sau khi transaction commit để worker đọc được dữ liệu vừa ghi
+    transaction.on_commit(lambda: redis_client.lpush(QUEUE_KEY, payload))
+
+
+# Đưa các tác vụ đã tới giờ thử lại từ tasks:delayed về tasks:queue
+def promote_delayed_tasks():
+    for payload in redis_client.zrangebyscore(DELAYED_KEY, '-inf', time.time()):
+        # Chỉ worker xóa được phần tử khỏi ZSET mới được đưa nó vào hàng đợi
+        if redis_client.zrem(DELAYED_KEY, payload):
+            redis_client.lpush(QUEUE_KEY, payload)
+
+
+def execute(raw_payload):
+    payload = json.loads(raw_payload)
+    func = _registry.get(payload['task'])
+    if func is None:
+        payload['error'] = 'Unknown task'
+        redis_client.lpush(DEAD_KEY, json.dumps(payload))
+        return
+
+    close_old_connections()
+    try:
+        func(*payload['args'], **payload['kwargs'])
+    except Exception:
+        payload['attempts'] += 1
+        payload['error'] = traceback.format_exc()
+        if payload['attempts'] > func.max_retries:
+            logger.error('Task %s moved to dead-letter list', payload['task'])
+            redis_client.lpush(DEAD_KEY, json.dumps(payload))
+            if func.on_dead is not None:
+                try:
+                    func.on_dead(*payload['args'], **payload['kwargs'])
+                except Exception:
+                    logger.exception('on_dead hook of task %s failed', payload['task'])
+        else:
+            delay = min(RETRY_BACKOFF * 2 ** (payload['attempts'] - 1), MAX_RETRY_BACKOFF)
+            logger.warning('Task %s failed, retrying in %ss', payload['task'], delay)
+            redis_client.zadd(DELAYED_KEY, {json.dumps(payload): time.time() + delay})
+    finally:
+        close_old_connections()
+
+
+# Các tác vụ trong tasks:dead (mới nhất trước)
+def list_dead_tasks():
+    return [json.loads(payload) for payload in redis_client.lrange(DEAD_KEY, 0, -1)]
+
+
+# Đưa tác vụ dead-letter về hàng đợi với số lần thử lại = 0 (task_ids=None: tất cả)
+def requeue_dead_tasks(task_ids=None):
+    requeued = 0
+    for raw_payload in redis_client.lrange(DEAD_KEY, 0, -1):
+        payload = json.loads(raw_payload)
+        if task_ids is not None and payload['id'] not in task_ids:
+            continue
+        # Chỉ tiến trình xóa được phần tử khỏi tasks:dead mới đưa nó vào hàng đợi
+        if redis_client.lrem(DEAD_KEY, 1, raw_payload):
+            payload['attempts'] = 0
+            payload.pop('error', None)
+            redis_client.lpush(QUEUE_KEY, json.dumps(payload))
+            requeued += 1
+    return requeued
+
+
+def purge_dead_tasks(task_ids=None):
+    if task_ids is None:
+        count = redis_client.llen(DEAD_KEY)
+        redis_client.delete(DEAD_KEY)
+        return count
+    return sum(redis_client.lrem(DEAD_KEY, 1, raw_payload) for raw_payload in redis_client.lrange(DEAD_KEY, 0, -1)
+               if json.loads(raw_payload)['id'] in task_ids)
+
+
+# Trả các tác vụ còn trong danh sách processing của worker (worker trước đó bị kill/OOM giữa chừng) về hàng đợi
+def requeue_processing_tasks(worker_id):
+    processing_key = PROCESSING_KEY.format(worker_id)
+    requeued = 0
+    while redis_client.rpoplpush(processing_key, QUEUE_KEY) is not None:
+        requeued += 1
+    if requeued:
+        logger.warning('Requeued %s unfinished task(s) of worker %s', requeued, worker_id)
+    return requeued
+
+
+def run_worker(poll_timeout=5, burst=False, worker_id=None):
+    worker_id = worker_id or socket.gethostname()
+    processing_key = PROCESSING_KEY.format(worker_id)
+    requeue_processing_tasks(worker_id)
+    while True:
+        promote_delayed_tasks()
+        # Tác vụ nằm trong processing_key cho tới khi chạy xong (hoặc đã vào tasks:delayed/tasks:dead)
+        raw_payload = redis_client.brpoplpush(QUEUE_KEY, processing_key, timeout=poll_timeout)
+        if raw_payload is None:
+            if burst:
+                return
+            continue
+        try:
+            execute(raw_payload)
+        finally:
+            redis_client.lrem(processing_key, 1, raw_payload)
+
+
+# CÁC TÁC VỤ NỀN
+
+# GỬI MAIL THÔNG BÁO ỨNG TUYỂN
+def build_application_status_email(jobseeker, job, status):
+    subject = f'Thông báo kết quả ứng tuyển vị trí "{job.title}"'
+    context = {
+        'jobseeker': jobseeker,
+        'job': job,
+        'status': status
+    }
+
+    message = render_to_string('email/send_email.txt', context)
+    return EmailMessage(subject, message, settings.EMAIL_HOST_USER, [jobseeker.user.email])
+
+
+@task()
+def send_application_status_email(application_id, status_id):
+    application = JobApplication.objects.select_related('jobseeker__user', 'job').get(pk=application_id)
+    status = refdata.get(Status, status_id)
+    build_application_status_email(application.jobseeker, application.job, status).send()
+
+
+# Số mail gửi trong một tác vụ (một kết nối SMTP), lỗi chỉ làm thử lại lô đó
+EMAIL_BATCH_SIZE = 50
+
+
+# Gửi mail thông báo cho nhiều đơn ứng tuyển qua một kết nối SMTP
+# updates: [[application_id, status_id], ...]
+@task()
+def send_application_status_emails(updates):
+    applications = JobApplication.objects.select_related('jobseeker__user', 'job') \
+        .in_bulk([application_id for application_id, _ in updates])
+    statuses = refdata.get_table(Status)
+
+    messages = [
+        build_application_status_email(applications[application_id].jobseeker,
+                                       applications[application_id].job, statuses[status_id])
+        for application_id, status_id in updates
+        if application_id in applications and status_id in statuses
+    ]
+    if messages:
+        with get_connection() as connection:
+            connection.send_messages(messages)
+
+
+def send_application_status_emails_in_batches(updates):
+    for i in range(0, len(updates), EMAIL_BATCH_SIZE):
+        send_application_status_emails.delay(updates[i:i + EMAIL_BATCH_SIZE])
+
+
+# Tạo phiên thanh toán Stripe cho hóa đơn đang chờ, link thanh toán được lưu vào cache cho client lấy
+CHECKOUT_URL_TIMEOUT = 60 * 60
+
+
+def checkout_url_cache_key(invoice_id):
+    return f'checkout_url:{invoice_id}'
+
+
+# Tác vụ tạo phiên thất bại hẳn: bỏ hóa đơn chờ và gỡ giới hạn mua gói để người dùng mua lại được ngay
+def discard_pending_checkout(invoice_id, price_id):
+    invoice = Invoice.objects.filter(pk=invoice_id, payment_status='pending',
+                                     stripe_session_id__startswith='pending_').first()
+    if invoice is not None:
+        invoice.delete()
+        redis_client.delete(payments.purchase_limit_key(invoice.user_id))
+
+
+@task(on_dead=discard_pending_checkout)
+def create_checkout_session(invoice_id, price_id):
+    # Hóa đơn đã bị bỏ (vd chạy lại tác vụ từ tasks:dead): không tạo phiên Stripe mồ côi
+    if not Invoice.objects.filter(pk=invoice_id).exists():
+        return None
+    checkout_session = payments.get_stripe().checkout.Session.create(
+        line_items=[
+            {
+                'price': price_id,
+                'quantity': 1,
+            },
+        ],
+        payment_method_types=['card'],
+        mode='payment',
+        success_url=settings.SITE_URL + '/payment_success?session_id={CHECKOUT_SESSION_ID}',
+        cancel_url=settings.SITE_URL + '?canceled=true',
+        client_reference_id=str(invoice_id),
+        metadata={'invoice_id': invoice_id},
+        # Thử lại sau lỗi không tạo thêm phiên mới trên Stripe
+        idempotency_key=f'invoice-{invoice_id}-checkout',
+    )
+    Invoice.objects.filter(pk=invoice_id).update(stripe_session_id=checkout_session.id)
+    cache.set(checkout_url_cache_key(invoice_id), checkout_session.url, timeout=CHECKOUT_URL_TIMEOUT)
+    return checkout_session.url
+
+
+# Tải ảnh đại diện Google lên Cloudinary
+@task()
+def upload_user_avatar(user_id, image_url):
+    avatar_url = upload_image_from_url(image_url)
+    if avatar_url:
+        User.objects.filter(pk=user_id).update(avatar=avatar_url)
@@ -0,0 +1,568 @@
+import asyncio
+import json
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from jobs import payments, refdata, stats, tasks
+from jobs.db import router
+from jobs.consumers import ChatConsumer, MessageBatcher, user_group
+from jobs.management.commands.explain_hot_queries import explain_hot_queries
+from jobs.salary import parse_salary
+from jobs.models import (User, Company, JobSeeker, Job, JobApplication, Like, Career, EmploymentType, Area,
+                         Status, Room, Message, Invoice, JobPostStat)
+from jobs.utils import redis_client
+
+# Số bài đăng/đơn ứng tuyển được tạo: đủ lớn để truy vấn N+1 làm số truy vấn tăng theo số dòng
+ROWS = 5
+
+
+class QueryCountTestCase(TestCase):
+    # Khóa số truy vấn SQL của các API danh sách chính (chống quay lại truy vấn N+1)
+    @classmethod
+    def setUpTestData(cls):
+        career = Career.objects.create(name='IT')
+        employment_type = EmploymentType.objects.create(type='Full-time')
+        area = Area.objects.create(name='HCM')
+        Status.objects.create(role='Pending')
+
+        cls.employer = User.objects.create_user(username='employer', email='employer@example.com', role=1)
+        cls.company = Company.objects.create(user=cls.employer, companyName='Company')
+        cls.applicant = User.objects.create_user(username='applicant', email='applicant@example.com', role=0)
+        cls.jobseeker = JobSeeker.objects.create(user=cls.applicant, salary_expectation='10 triệu',
+                                                 career=career)
+
+        deadline = (timezone.now() + timedelta(days=30)).date()
+        for i in range(ROWS):
+            job = Job.objects.create(company=cls.company, user=cls.employer, career=career,
+                                     employmenttype=employment_type, area=area, title=f'Job {i}',
+                                     deadline=deadline, quantity=1, location='HCM', salary='10-15 triệu',
+                                     position='Developer', experience='1 năm')
+            JobApplication.objects.create(job=job, jobseeker=cls.jobseeker, company=cls.company,
+                                          status_id=Status.objects.get(role='Pending').pk)
+            Like.objects.create(job=job, jobseeker=cls.jobseeker)
+
+    def setUp(self):
+        # Cache response của người dùng chưa đăng nhập không được trả thay cho truy vấn
+        cache.clear()
+        # Bảng danh mục (ngành nghề, khu vực...) được nạp một lần mỗi process, không tính vào số truy vấn
+        refdata.invalidate()
+        for model in refdata.REFDATA_MODELS:
+            refdata.get_table(model)
+        self.client = APIClient()
+
+    def assert_list(self, url, num_queries, user=None):
+        if user is not None:
+            self.client.force_authenticate(user)
+        with self.assertNumQueries(num_queries):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def test_job_list_anonymous(self):
+        self.assert_list('/jobs/', 2)
+
+    # Cờ liked tính bằng EXISTS trong cùng truy vấn
+    def test_job_list_authenticated(self):
+        self.assert_list('/jobs/', 2, user=self.applicant)
+
+    def test_popular_jobs(self):
+        self.assert_list('/jobs/popular/', 2)
+
+    # Mặc định: cả danh sách như trước, phân trang khi client yêu cầu (thêm truy vấn COUNT)
+    def test_company_list_job(self):
+        response = self.assert_list('/companies/list_job/', 1, user=self.employer)
+        self.assertEqual(len(response.data), ROWS)
+        self.assert_list('/companies/list_job/?pagination=page', 2, user=self.employer)
+
+    def test_company_list_applications(self):
+        response = self.assert_list('/companies/list_applications/', 1, user=self.employer)
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), ROWS)
+        self.assertIsInstance(response.data[0]['job'], dict)
+
+        response = self.client.get('/companies/list_applications/?pagination=page')
+        self.assertEqual(response.data['count'], ROWS)
+        self.assertEqual(set(response.data['jobs']), {application['job'] for application in response.data['results']})
+
+    def test_jobseeker_list_job_apply(self):
+        self.assert_list('/jobseeker/list_job_apply/', 1, user=self.applicant)
+
+
+class JobPostStatTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='employer', email='employer@example.com', role=1)
+        cls.company = Company.objects.create(user=user, companyName='Company')
+        cls.career = Career.objects.create(name='IT')
+
+    def create_job(self, title, **kwargs):
+        return Job.objects.create(company=self.company, title=title, deadline=timezone.now().date(), quantity=1,
+                                  location='HCM', salary='Thỏa thuận', position='Developer', experience='1 năm',
+                                  **kwargs)
+
+    def totals(self):
+        return list(JobPostStat.objects.order_by('career_id').values_list('career_id', 'employmenttype_id', 'total'))
+
+    # Khóa NULL (chưa chọn ngành nghề/loại công việc) vẫn chỉ có một dòng
+    def test_null_keys_share_one_row(self):
+        self.create_job('Job 1')
+        self.create_job('Job 2')
+        stats.record_job(Job(company=self.company), 1)
+        self.assertEqual(self.totals(), [(None, None, 3)])
+
+    # Khóa cũ lấy từ lúc nạp bài đăng: save không SELECT lại, đổi ngành nghề thì chuyển bộ đếm
+    def test_move_job_uses_loaded_keys(self):
+        self.create_job('Job 1')
+        job = Job.objects.select_related('company').get()
+        job.location = 'HN'
+        with self.assertNumQueries(1):
+            job.save()
+        job.career = self.career
+        job.save()
+        self.assertEqual(self.totals(), [(None, None, 0), (self.career.id, None, 1)])
+        job.career = None
+        job.save()
+        self.assertEqual(self.totals(), [(None, None, 1), (self.career.id, None, 0)])
+
+
+class PipelineTestCase(TestCase):
+    # Tên role là dữ liệu tự do: dấu cách, "__" hay trùng tên cột ("total") không làm hỏng truy vấn
+    def test_free_form_roles(self):
+        employer = User.objects.create_user(username='employer', email='employer@example.com', role=1)
+        company = Company.objects.create(user=employer, companyName='Company')
+        applicant = User.objects.create_user(username='applicant', email='applicant@example.com')
+        jobseeker = JobSeeker.objects.create(user=applicant, salary_expectation='10 triệu')
+        job = Job.objects.create(company=company, title='Job', deadline=timezone.now().date(), quantity=1,
+                                 location='HCM', salary='Thỏa thuận', position='Developer', experience='1 năm')
+        statuses = [Status.objects.create(role=role) for role in ('In review', 'total', "o'neil__x")]
+        JobApplication.objects.create(job=job, jobseeker=jobseeker, company=company, status=statuses[0])
+        refdata.invalidate()
+
+        client = APIClient()
+        client.force_authenticate(employer)
+        response = client.get('/companies/pipeline/')
+        self.assertEqual(response.status_code, 200, response.content)
+        row = response.data['jobs'][0]
+        self.assertEqual(row['total'], 1)
+        self.assertEqual(row['statuses'], {'in review': 1, 'total': 0, "o'neil__x": 0})
+        self.assertEqual(response.data['totals']['statuses']['in review'], 1)
+
+
+class ParseSalaryTestCase(TestCase):
+    def test_units(self):
+        self.assertEqual(parse_salary('10-15 triệu'), (10_000_000, 15_000_000))
+        self.assertEqual(parse_salary('10-15 million'), (10_000_000, 15_000_000))
+        self.assertEqual(parse_salary('500k - 1 triệu'), (500_000, 1_000_000))
+        self.assertEqual(parse_salary('Trên 10 triệu'), (10_000_000, None))
+
+    # "tới/đến X" là cận trên; "tu" trong "tuyển" không phải "từ"
+    def test_bounds(self):
+        self.assertEqual(parse_salary('Lên tới 20 triệu'), (None, 20_000_000))
+        self.assertEqual(parse_salary('đến 20 triệu'), (None, 20_000_000))
+        self.assertEqual(parse_salary('Tối thiểu 5 triệu'), (5_000_000, None))
+        self.assertEqual(parse_salary('Tuyển gấp, lương 10 triệu'), (10_000_000, 10_000_000))
+
+    # Vượt giới hạn INT 32 bit: cột salary_min/salary_max là BIGINT
+    def test_large_values_are_saved(self):
+        self.assertEqual(parse_salary('3 tỷ'), (3_000_000_000, 3_000_000_000))
+        user = User.objects.create_user(username='employer', email='employer@example.com', role=1)
+        job = Job.objects.create(company=Company.objects.create(user=user, companyName='Company'), title='CEO',
+                                 deadline=timezone.now().date(), quantity=1, location='HCM', salary='3 tỷ',
+                                 position='CEO', experience='10 năm')
+        job.refresh_from_db()
+        self.assertEqual((job.salary_min, job.salary_max), (3_000_000_000, 3_000_000_000))
+
+    # Đơn vị lạ không được coi là VNĐ (bài đăng sẽ bị lọc sai theo salary_min)
+    def test_unknown_unit(self):
+        self.assertEqual(parse_salary('10-15 lakh'), (None, None))
+        self.assertEqual(parse_salary('Thỏa thuận'), (None, None))
+
+    @override_settings(SALARY_USD_TO_VND=20000)
+    def test_usd_rate_setting(self):
+        self.assertEqual(parse_salary('$1000'), (20_000_000, 20_000_000))
+
+
+class CompanySearchDocumentTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='company', email='company@example.com', role=1)
+        cls.company = Company.objects.create(user=user, companyName='Old Name')
+        cls.job = Job.objects.create(company=cls.company, title='Developer', deadline=timezone.now().date(),
+                                     quantity=1, location='HCM', salary='Thỏa thuận', position='Developer',
+                                     experience='1 năm')
+
+    def test_rename_rebuilds_jobs(self):
+        self.company.companyName = 'New Name'
+        self.company.save()
+        self.job.refresh_from_db()
+        self.assertIn('new name', self.job.search_document)
+
+    # Lưu công ty mà không đổi tên: chỉ đọc lại tên cũ, không nạp/cập nhật các bài đăng
+    def test_save_without_rename_skips_jobs(self):
+        self.company.address = 'HCM'
+        with self.assertNumQueries(2):
+            self.company.save()
+
+
+class KeysetPaginationTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = User.objects.create_user(username='employer', email='employer@example.com', role=1)
+        company = Company.objects.create(user=cls.employer, companyName='Company')
+        today = timezone.now().date()
+        # Nhiều bài đăng trùng deadline: con trỏ phải phân biệt chúng bằng id
+        for i in range(7):
+            Job.objects.create(company=company, title=f'Job {i}', deadline=today + timedelta(days=i % 2),
+                               quantity=1, location='HCM', salary='Thỏa thuận', position='Developer',
+                               experience='1 năm')
+        cls.expected = list(Job.objects.order_by('deadline', 'id').values_list('id', flat=True))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.employer)
+
+    # Đi theo link next/previous, trả về id của từng trang và response cuối cùng
+    def walk(self, url, direction):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            pages.append([job['id'] for job in response.data['results']])
+            url = response.data[direction]
+        return pages, response
+
+    def test_next_and_previous_cover_every_job_once(self):
+        pages, last = self.walk('/companies/list_job/?pagination=cursor&page_size=2', 'next')
+        self.assertEqual(sum(pages, []), self.expected)
+
+        back, _ = self.walk(last.data['previous'], 'previous')
+        self.assertEqual(sum(reversed(back), []), self.expected[:-len(pages[-1])])
+
+    # Các phòng cùng last_activity không bị lặp/bỏ sót giữa các trang hộp thư
+    def test_room_inbox_pages(self):
+        activity = timezone.now()
+        for i in range(5):
+            other = User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com')
+            Room.objects.create(sender=self.employer, receiver=other, last_activity=activity)
+        expected = list(Room.objects.order_by('-last_activity', '-id').values_list('id', flat=True))
+
+        url, ids = '/rooms/?page_size=2', []
+        while url:
+            response = self.client.get(url)
+            ids += [room['room_id'] for room in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(ids, expected)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/companies/list_job/?pagination=cursor&cursor=bad')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(STRIPE_BACKEND='fake', TASKS_ALWAYS_EAGER=True)
+class StripeCheckoutTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='buyer', email='buyer@example.com', role=1)
+
+    def setUp(self):
+        redis_client.delete(f'purchase_limit:{self.user.id}')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    # Client hiện tại: 200 {"url": ...} như trước khi có hàng đợi tác vụ
+    def test_checkout_returns_url(self):
+        response = self.client.post('/payment_stripe/payment/', {'price_id': 'price_basic'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        invoice = Invoice.objects.get(user=self.user)
+        self.assertTrue(response.data['url'].endswith(invoice.stripe_session_id))
+
+    # Tác vụ tạo phiên vào tasks:dead: xóa hóa đơn chờ và gỡ giới hạn mua gói
+    @override_settings(TASKS_ALWAYS_EAGER=False)
+    def test_dead_async_checkout_releases_purchase_limit(self):
+        redis_client.delete(tasks.QUEUE_KEY, tasks.DEAD_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/payment_stripe/v2/payment/', {'price_id': 'price_basic'}, format='json')
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertTrue(redis_client.exists(f'purchase_limit:{self.user.id}'))
+
+        payload = json.loads(redis_client.rpop(tasks.QUEUE_KEY))
+        payload['attempts'] = tasks.create_checkout_session.max_retries
+        with mock.patch('jobs.payments.get_stripe', side_effect=RuntimeError('Stripe is down')), \
+                self.assertLogs('jobs.tasks', 'ERROR'):
+            tasks.execute(json.dumps(payload))
+
+        self.assertFalse(Invoice.objects.filter(user=self.user).exists())
+        self.assertFalse(redis_client.exists(f'purchase_limit:{self.user.id}'))
+        redis_client.delete(tasks.DEAD_KEY)
+
+    def test_async_checkout_status(self):
+        response = self.client.post('/payment_stripe/v2/payment/', {'price_id': 'price_basic'}, format='json')
+        self.assertEqual(response.status_code, 202, response.content)
+        status_response = self.client.get(response.data['status_url'])
+        self.assertEqual(status_response.status_code, 200)
+        self.assertIn('url', status_response.data)
+
+
+class StripeWebhookTestCase(TestCase):
+    payload = '{"id": "evt_1", "type": "ping", "data": {"object": {}}}'
+
+    def post(self, signature):
+        return APIClient().post('/payment_stripe/webhook/', self.payload, content_type='application/json',
+                                HTTP_STRIPE_SIGNATURE=signature)
+
+    # Chưa cấu hình secret: từ chối cả payload ký bằng khóa rỗng
+    @override_settings(STRIPE_WEBHOOK_SECRET=None)
+    def test_missing_secret_fails_closed(self):
+        with self.assertLogs('jobs.payments', 'ERROR'):
+            response = self.post(payments.generate_signature_header(self.payload, secret=''))
+        self.assertEqual(response.status_code, 503)
+
+    @override_settings(STRIPE_WEBHOOK_SECRET='whsec_test')
+    def test_signed_payload(self):
+        self.assertEqual(self.post(payments.generate_signature_header(self.payload)).status_code, 200)
+        self.assertEqual(self.post('t=1,v1=bad').status_code, 400)
+
+
+class DeadTaskTestCase(TestCase):
+    def setUp(self):
+        redis_client.delete(tasks.QUEUE_KEY, tasks.DEAD_KEY)
+
+    def test_requeue_resets_attempts(self):
+        redis_client.lpush(tasks.DEAD_KEY, '{"id": "a", "task": "t", "args": [], "kwargs": {}, "attempts": 6, '
+                                           '"error": "boom"}')
+        self.assertEqual([payload['id'] for payload in tasks.list_dead_tasks()], ['a'])
+        self.assertEqual(tasks.requeue_dead_tasks({'a'}), 1)
+        self.assertEqual(tasks.list_dead_tasks(), [])
+        self.assertEqual(json.loads(redis_client.rpop(tasks.QUEUE_KEY))['attempts'], 0)
+
+
+class WorkerTestCase(TestCase):
+    PROCESSING_KEY = tasks.PROCESSING_KEY.format('test-worker')
+
+    def setUp(self):
+        redis_client.delete(tasks.QUEUE_KEY, tasks.DELAYED_KEY, tasks.DEAD_KEY, self.PROCESSING_KEY)
+
+    # Worker bị kill giữa chừng: tác vụ còn trong danh sách processing được chạy lại khi worker khởi động
+    def test_unfinished_task_is_requeued_at_startup(self):
+        calls = []
+        func = tasks.task()(lambda: calls.append(1))
+        func.task_name = 'jobs.tests.unfinished'
+        tasks._registry[func.task_name] = func
+        self.addCleanup(tasks._registry.pop, func.task_name)
+        redis_client.lpush(self.PROCESSING_KEY, json.dumps(
+            {'id': 'a', 'task': func.task_name, 'args': [], 'kwargs': {}, 'attempts': 0}))
+
+        with self.assertLogs('jobs.tasks', 'WARNING'):
+            tasks.run_worker(poll_timeout=1, burst=True, worker_id='test-worker')
+        self.assertEqual(calls, [1])
+        self.assertEqual(redis_client.llen(self.PROCESSING_KEY), 0)
+        self.assertEqual(redis_client.llen(tasks.QUEUE_KEY), 0)
+
+
+class MessageBatcherTestCase(SimpleTestCase):
+    def run_batcher(self, failures, max_attempts=3):
+        dropped, written = [], []
+        calls = {'count': 0}
+
+        async def bulk_create(batch):
+            calls['count'] += 1
+            if calls['count'] <= failures:
+                raise RuntimeError('database is down')
+            written.extend(batch)
+
+        async def on_failure(batch):
+            dropped.extend(batch)
+
+        async def scenario():
+            batcher = MessageBatcher(batch_size=10, interval=0.001, on_failure=on_failure, max_attempts=max_attempts)
+            batcher.bulk_create = bulk_create
+            await batcher.add('a')
+            await batcher.add('b')
+            await asyncio.sleep(0.1)
+            return batcher
+
+        batcher = asyncio.run(scenario())
+        return batcher, written, dropped
+
+    # Lỗi tạm thời: lô được giữ lại và ghi ở lần thử lại
+    def test_retry_keeps_batch(self):
+        with self.assertLogs('jobs.consumers', 'WARNING'):
+            batcher, written, dropped = self.run_batcher(failures=1)
+        self.assertEqual(written, ['a', 'b'])
+        self.assertEqual((batcher.pending, dropped), ([], []))
+
+    # Lỗi kéo dài: bỏ lô sau max_attempts lần, ghi log và báo cho người gửi
+    def test_gives_up_and_reports(self):
+        with self.assertLogs('jobs.consumers', 'ERROR'):
+            batcher, written, dropped = self.run_batcher(failures=10)
+        self.assertEqual(dropped, ['a', 'b'])
+        self.assertEqual((batcher.pending, written), ([], []))
+
+
+class TypingTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice, cls.bob, cls.mallory = [
+            User.objects.create_user(username=name, email=f'{name}@example.com') for name in ('alice', 'bob', 'mallory')]
+        cls.room = Room.objects.create(sender=cls.alice, receiver=cls.bob)
+
+    def typing(self, user, room_id, receiver_id):
+        consumer = ChatConsumer()
+        consumer.user_id = user.id
+        consumer.user_group_name = user_group(user.id)
+        consumer.channel_layer = mock.Mock(group_send=mock.AsyncMock())
+        with mock.patch('jobs.presence.should_broadcast_typing', mock.AsyncMock(return_value=True)):
+            async_to_sync(consumer.typing)({'type': 'typing', 'room_id': room_id, 'receiver_id': receiver_id})
+        return consumer.channel_layer.group_send
+
+    # Gửi tới người còn lại của phòng, không theo receiver_id của client
+    def test_member_reaches_peer(self):
+        group_send = self.typing(self.bob, self.room.id, self.mallory.id)
+        group_send.assert_awaited_once()
+        self.assertEqual(group_send.await_args.args[0], user_group(self.alice.id))
+
+    def test_non_member_is_ignored(self):
+        group_send = self.typing(self.mallory, self.room.id, self.alice.id)
+        group_send.assert_not_awaited()
+
+
+# Kế hoạch EXPLAIN của các truy vấn nóng (jobs/management/commands/explain_hot_queries.py) chỉ đọc được trên MySQL
+# TransactionTestCase: ANALYZE TABLE tự commit và chỉ thấy dữ liệu đã commit
+@skipUnless(connection.vendor == 'mysql', 'EXPLAIN FORMAT=JSON plans are MySQL specific')
+class ExplainHotQueriesTestCase(TransactionTestCase):
+    TABLES = ('jobs_job', 'jobs_jobapplication', 'jobs_like', 'jobs_invoice', 'jobs_message')
+
+    # Nhiều nhà tuyển dụng/ứng viên để mỗi khóa chỉ khớp một phần nhỏ của bảng, như dữ liệu thật
+    def setUp(self):
+        status = Status.objects.create(role='Pending')
+        users = User.objects.bulk_create([User(username=f'user{i}', email=f'user{i}@example.com', role=i % 2)
+                                          for i in range(40)])
+        companies = Company.objects.bulk_create([Company(user=user, companyName=user.username)
+                                                 for user in users[1::2]])
+        jobseekers = JobSeeker.objects.bulk_create([JobSeeker(user=user, salary_expectation='Thỏa thuận')
+                                                    for user in users[::2]])
+        deadline = timezone.now().date()
+        jobs = Job.objects.bulk_create([
+            Job(company=company, user=company.user, title=f'Job {i}', deadline=deadline + timedelta(days=i),
+                active=i % 4 != 0, quantity=1, location='HCM', salary='Thỏa thuận', position='Developer',
+                experience='1 năm')
+            for company in companies for i in range(10)])
+        JobApplication.objects.bulk_create([
+            JobApplication(job=job, jobseeker=jobseeker, company=job.company, status=status)
+            for n, jobseeker in enumerate(jobseekers) for job in jobs[n * 10:n * 10 + 10]])
+        Like.objects.bulk_create([Like(job=job, jobseeker=jobseeker)
+                                  for n, jobseeker in enumerate(jobseekers) for job in jobs[n::20]])
+        Like.objects.bulk_create([Like(job=job, company=company)
+                                  for n, company in enumerate(companies) for job in jobs[n::20]])
+        Invoice.objects.bulk_create([
+            Invoice(user=user, stripe_session_id=f'cs_{user.id}_{i}', amount_total=100, currency='usd',
+                    payment_status='paid' if i % 2 else 'unpaid')
+            for user in users for i in range(5)])
+        rooms = Room.objects.bulk_create([Room(sender=company.user, receiver=jobseeker.user)
+                                          for company, jobseeker in zip(companies, jobseekers)])
+        Message.objects.bulk_create([Message(room=room, sender=room.sender, message=f'Message {i}')
+                                     for room in rooms for i in range(20)])
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE TABLE {', '.join(self.TABLES)}")
+            cursor.fetchall()
+
+    # Lỗi khi một truy vấn nóng không còn dùng chỉ mục (vd chỉ mục bị xóa/đổi cột) và quét toàn bộ bảng
+    def test_hot_queries_use_an_index(self):
+        for name, table, rows, plan in explain_hot_queries():
+            with self.subTest(name):
+                for row in rows:
+                    self.assertNotEqual(row['access_type'], 'ALL', json.dumps(plan, indent=2))
+
+
+class PreviousMessagesTestCase(SimpleTestCase):
+    def previous_messages(self, **frame):
+        consumer = ChatConsumer()
+        consumer.user_id = 1
+        consumer.send = mock.AsyncMock()
+        consumer.message_batcher = mock.Mock(flush=mock.AsyncMock())
+        consumer.get_previous_messages = mock.AsyncMock(return_value={'messages': []})
+        async_to_sync(consumer.previous_messages)({'type': 'previous_messages', 'receiver_id': 2, **frame})
+        return consumer, json.loads(consumer.send.await_args.kwargs['text_data'])
+
+    def test_invalid_before_id_replies_with_error(self):
+        consumer, reply = self.previous_messages(before_id='abc')
+        self.assertEqual(reply['type'], 'error')
+        consumer.get_previous_messages.assert_not_awaited()
+
+    # limit bị kẹp trong [1, HISTORY_MAX_PAGE_SIZE]
+    def test_limit_is_clamped(self):
+        consumer, reply = self.previous_messages(before_id='10', limit=-5)
+        self.assertEqual(reply['type'], 'previous_messages')
+        self.assertEqual(consumer.get_previous_messages.await_args.args[3:], (10, 1))
+
+
+# Định tuyến primary/replica (jobs/db/router.py)
+# TransactionTestCase: trong atomic() (TestCase luôn mở) mọi truy vấn đọc đều về primary
+# Bộ định tuyến được ghi lại quyết định rồi vẫn chạy truy vấn trên DB test, không cần kết nối replica thật
+class ReplicaRoutingTestCase(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='employer', email='employer@example.com', role=1)
+        self.reads = []
+        db_for_read = router.PrimaryReplicaRouter.db_for_read
+
+        def record_read(router_self, model, **hints):
+            self.reads.append(db_for_read(router_self, model, **hints))
+            return 'default'
+
+        for patcher in (mock.patch.object(router, 'replica_configured', return_value=True),
+                        mock.patch.object(router.PrimaryReplicaRouter, 'db_for_read', record_read)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_viewset_list_reads_from_replica(self):
+        response = APIClient().get('/jobs/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('replica', self.reads)
+        self.assertNotIn('default', self.reads)
+
+    # Trong transaction: đọc và ghi đều ở primary (replica chưa có dữ liệu của transaction)
+    def test_atomic_block_uses_primary(self):
+        with router.read_from_replica():
+            self.assertEqual(router.read_alias(), 'replica')
+            with transaction.atomic():
+                self.assertEqual(router.read_alias(), 'default')
+                list(Job.objects.all())
+                self.assertEqual(router.PrimaryReplicaRouter().db_for_write(Job), 'default')
+        self.assertEqual(self.reads, ['default'])
+
+    # Sau một request ghi, người dùng bị ghim vào primary cho tới khi khóa db_pin:<user> hết hạn
+    def test_write_pins_user_to_primary(self):
+        aliases = []
+
+        def view(request):
+            with router.read_from_replica():
+                aliases.append(router.read_alias())
+            return HttpResponse(status=201 if request.method == 'POST' else 200)
+
+        middleware = router.ReplicaPinMiddleware(view)
+        factory = RequestFactory()
+
+        def send(method):
+            request = getattr(factory, method)('/jobs/')
+            request.user = self.user
+            return middleware(request)
+
+        with mock.patch.object(router, 'PIN_SECONDS', 1):
+            send('get')
+            send('post')
+            self.assertTrue(cache.get(router.pin_cache_key(self.user.id)))
+            send('get')
+            time.sleep(1.1)
+            send('get')
+        self.assertEqual(aliases, ['replica', 'replica', 'default', 'replica'])
@@ -0,0 +1,11 @@
+import unicodedata
+
+
+# Bỏ dấu tiếng Việt và chuyển về chữ thường: "Thỏa thuận" -> "thoa thuan"
+def fold_text(text):
+    if not text:
+        return ''
+    text = text.replace('đ', 'd').replace('Đ', 'D')
+    text = unicodedata.normalize('NFD', text)
+    text = ''.join(ch for ch in text if unicodedata.category(ch) != 'Mn')
+    return text.lower()
@@ -18,6 +18,7 @@ router.register('jobseeker', views.JobSeekerViewSet, basename='jobseeker')
 router.register('careers', views.CareerViewSet, basename='careers')
 router.register('employmenttypes', views.EmploymentTypeViewSet, basename='employmenttypes')
 router.register('areas', views.AreaViewSet, basename='areas')
+router.register('rooms', views.RoomViewSet, basename='rooms')
 # router.register('skills', views.SkillViewSet, basename='skills')
 
 
@@ -25,7 +26,14 @@ router.register('areas', views.AreaViewSet, basename='areas')
 
 urlpatterns = [
     path('', include(router.urls)),
+    # Tạo session Stripe trong request, trả về {"url": ...}
     path('payment_stripe/payment/', StripeCheckoutViewSet.as_view({'post': 'create'}), name='create_invoice'),
+    # v2: trả về 202 {"invoice_id", "status", "status_url"}, link thanh toán lấy qua status_url
+    path('payment_stripe/v2/payment/', StripeCheckoutViewSet.as_view({'post': 'create_async'}),
+         name='create_invoice_async'),
+    path('payment_stripe/v2/payment/<int:invoice_id>/', StripeCheckoutViewSet.as_view({'get': 'checkout_status'}),
+         name='checkout_status'),
+    path('payment_stripe/webhook/', views.StripeWebhookViewSet.as_view({'post': 'create'}), name='stripe_webhook'),
     path('payment_success/', StripeCheckoutViewSet.as_view({'get': 'retrieve_payment'}), name='payment-success'),
     path('invoices/', StripeCheckoutViewSet.as_view({'get': 'list_invoices'}), name='list_invoices'),
 ]
\ No newline at end of file
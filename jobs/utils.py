@@ -1,5 +1,7 @@
 import requests
+import redis
 import cloudinary.uploader
+from django.conf import settings
 from io import BytesIO
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
@@ -7,6 +9,9 @@ from oauth2_provider.models import AccessToken, RefreshToken, Application
 from oauthlib.common import generate_token
 from datetime import timedelta
 
+# Kết nối tới Redis (dùng chung cho giới hạn đăng bài, thanh toán và hàng đợi tác vụ nền)
+redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0)
+
 
 def upload_image_from_url(image_url):
     response = requests.get(image_url)
@@ -1,20 +1,25 @@
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+import uuid
+import stripe #Thanh toán với Stripe (xác thực webhook)
 from jobs.models import Job, Rating
 from jobs import serializers, perms, utils
 from jobs import paginators
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.db import transaction
 from rest_framework.response import Response
 from rest_framework import viewsets, generics, permissions, status
 from rest_framework.decorators import action
-from jobs import dao
-from .dao import get_paid_invoices, get_latest_paid_invoice
+from jobs import dao, search, tasks, payments, quota, refdata #payments: Thanh toán với Stripe
+from jobs.response_cache import cache_response
+from jobs.db.router import ReplicaReadMixin
+from .dao import get_paid_invoices
 from .models import JobApplication, Company, JobSeeker, User, Like, Status, Invoice
 from .serializers import (JobApplicationSerializer, RatingSerializer, Career, EmploymentType, Area, JobSeekerCreateSerializer
                           ,AuthenticatedJobSerializer, LikeSerializer, JobSerializer, JobCreateSerializer,
                           JobApplicationStatusSerializer, AreaSerializer)
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
 from .paginators import LikedJobPagination
 from datetime import datetime, timedelta
 from .filters import JobFilter
@@ -24,14 +29,13 @@ from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from .schemas import jobSeeker_create_schema, employer_create_schema, num_application_schema
 
-from jobPortal import settings
-import stripe #Thanh toán với Stripe
 from google.oauth2 import id_token  # Dùng để xác thực id_token của Google
 from google.auth.transport import requests as gg_requests  # Dùng để gửi request xác thực token
 from rest_framework.permissions import AllowAny
-import redis
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
 # Kết nối tới Redis
-redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0)
+from jobs.utils import redis_client
 
 # Create your views here.
 # Làm việc với GenericViewSet
@@ -47,71 +51,101 @@ redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=settings.REDIS_P
 # RetrieveUpdateDestroyAPIView = GET + PUT + PATCH + DELETE : Xem chi tiết + cập nhật toàn phần + cập nhật một phần + xóa
 
 
+# Số đơn tối đa trong một lần cập nhật trạng thái hàng loạt
+BULK_STATUS_MAX_SIZE = 500
+
+
 #######      THANH TOÁN   ########
-stripe.api_key = settings.STRIPE_SECRET_KEY
 
 class StripeCheckoutViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated]  # Chỉ cho phép người dùng đã xác thực
 
+    # Kiểm tra dữ liệu và giới hạn mua gói, trả về Response lỗi hoặc None
+    def _check_purchase(self, request):
+        if not request.data.get('price_id'):
+            return Response({"error": "Price ID is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Check Redis for the user's purchase restriction
+        try:
+            if redis_client.exists(payments.purchase_limit_key(request.user.id)):
+                return Response(
+                    {"error": "Hãy kiểm tra lịch sử đơn hàng. Bạn chỉ có thể mua gói mới sau khi hết hạn!"},
+                    status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({"error": "Redis connection failed: " + str(e)},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return None
+
+    # Lưu hóa đơn với trạng thái pending
+    # (stripe_session_id tạm thời sẽ được thay bằng id session thật)
+    def _create_pending_invoice(self, request):
+        return Invoice.objects.create(
+            user=request.user,
+            stripe_session_id=f'pending_{uuid.uuid4().hex}',
+            amount_total=0.00,  # Tổng số tiền sẽ được cập nhật sau
+            currency='VNĐ',  # Bạn có thể điều chỉnh nếu cần
+            payment_status='pending',  # Trạng thái ban đầu là pending
+            product_item=request.data.get('product_item'),  # Lưu tên sản phẩm
+            daily_post_limit=request.data.get('daily_post_limit')  # Số lần đăng tin/1ngày
+        )
+
+    # Set the purchase restriction in Redis for 3 days
+    def _restrict_purchase(self, user_id):
+        redis_client.setex(payments.purchase_limit_key(user_id), timedelta(days=3), "restricted")
+
+    # POST /payment_stripe/payment/ (client hiện tại): tạo session Stripe ngay trong request, trả về {"url": ...}
     def create(self, request):
         try:
-            # Lấy price_id từ request body
-            price_id = request.data.get('price_id')
-            product_item = request.data.get('product_item')
-            daily_post_limit = request.data.get('daily_post_limit')
-
-            if not price_id:
-                return Response({"error": "Price ID is required."}, status=status.HTTP_400_BAD_REQUEST)
-
-            # Check Redis for the user's purchase restriction
-            user_id = request.user.id
-            redis_key = f"purchase_limit:{user_id}"
+            error = self._check_purchase(request)
+            if error is not None:
+                return error
 
+            invoice = self._create_pending_invoice(request)
             try:
-                if redis_client.exists(redis_key):
-                    return Response(
-                        {"error": "Hãy kiểm tra lịch sử đơn hàng. Bạn chỉ có thể mua gói mới sau khi hết hạn!"},
-                        status=status.HTTP_400_BAD_REQUEST)
-            except Exception as e:
-                return Response({"error": "Redis connection failed: " + str(e)},
-                                status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-            # Tạo session thanh toán với price_id được gửi từ front-end
-            checkout_session = stripe.checkout.Session.create(
-                line_items=[
-                    {
-                        'price': price_id,
-                        'quantity': 1,
-                    },
-                ],
-                payment_method_types=['card'],
-                mode='payment',
-                success_url=settings.SITE_URL + '/payment_success?session_id={CHECKOUT_SESSION_ID}',
-                cancel_url=settings.SITE_URL + '?canceled=true',
-            )
+                url = tasks.create_checkout_session(invoice.id, request.data.get('price_id'))
+            except Exception:
+                invoice.delete()
+                raise
+            self._restrict_purchase(request.user.id)
+
+            return Response({"url": url}, status=status.HTTP_200_OK)
+        except stripe.StripeError as e:
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        except Exception as e:
+            return Response({'error': 'Something went wrong: ' + str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            # Lưu session với trạng thái pending
-            invoice = Invoice(
-                user=request.user,
-                stripe_session_id=checkout_session.id,
-                amount_total=0.00,  # Tổng số tiền sẽ được cập nhật sau
-                currency='VNĐ',  # Bạn có thể điều chỉnh nếu cần
-                payment_status='pending',  # Trạng thái ban đầu là pending
-                product_item=product_item,  # Lưu tên sản phẩm
-                daily_post_limit =daily_post_limit #Số lần đăng tin/1ngày
-            )
-            invoice.save()
+    # POST /payment_stripe/v2/payment/: session Stripe được tạo ở tác vụ nền, trả về 202 ngay
+    # Client hỏi link thanh toán qua status_url (GET /payment_stripe/v2/payment/<invoice_id>/)
+    def create_async(self, request):
+        try:
+            error = self._check_purchase(request)
+            if error is not None:
+                return error
 
-            # Set the purchase restriction in Redis for 3 days
-            redis_client.setex(redis_key, timedelta(days=3), "restricted")
+            invoice = self._create_pending_invoice(request)
+            tasks.create_checkout_session.delay(invoice.id, request.data.get('price_id'))
+            self._restrict_purchase(request.user.id)
 
-            return Response({"url": checkout_session.url}, status=status.HTTP_200_OK)
-        except stripe.error.StripeError as e:
-            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return Response({
+                "invoice_id": invoice.id,
+                "status": "pending",
+                "status_url": request.build_absolute_uri(reverse('checkout_status', args=[invoice.id])),
+            }, status=status.HTTP_202_ACCEPTED)
         except Exception as e:
             return Response({'error': 'Something went wrong: ' + str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+    # Lấy link thanh toán của hóa đơn sau khi tác vụ nền tạo xong session Stripe
+    def checkout_status(self, request, invoice_id=None):
+        if not Invoice.objects.filter(pk=invoice_id, user=request.user).exists():
+            return Response({"error": "Invoice not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        url = cache.get(tasks.checkout_url_cache_key(invoice_id))
+        if not url:
+            return Response({"status": "pending"}, status=status.HTTP_202_ACCEPTED)
+        return Response({"url": url}, status=status.HTTP_200_OK)
+
+    # Trang thanh toán thành công chỉ đọc trạng thái trong database (webhook/reconcile cập nhật hóa đơn)
     def retrieve_payment(self, request):
         session_id = request.GET.get('session_id')
 
@@ -119,20 +153,8 @@ class StripeCheckoutViewSet(viewsets.ViewSet):
             return Response({"error": "Session ID is required."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            # Lấy thông tin session từ Stripe để cập nhật thông tin hóa đơn
-            checkout_session = stripe.checkout.Session.retrieve(session_id)
-
             # Lấy hóa đơn từ database bằng session_id
-            invoice = Invoice.objects.get(stripe_session_id=session_id)
-
-            # Cập nhật thông tin thanh toán từ Stripe vào hóa đơn
-            invoice.amount_total = checkout_session.amount_total / 100  # Chuyển từ cents sang đơn vị tiền tệ
-            invoice.payment_status = checkout_session.payment_status
-            invoice.customer_email = checkout_session.customer_details.email
-            invoice.payment_date = timezone.now()  # Cập nhật thời gian thanh toán
-
-            # Lưu lại hóa đơn sau khi cập nhật
-            invoice.save()
+            invoice = Invoice.objects.get(stripe_session_id=session_id, user=request.user)
 
             # Chuyển thông tin hóa đơn thành định dạng JSON
             invoice_data = {
@@ -150,8 +172,6 @@ class StripeCheckoutViewSet(viewsets.ViewSet):
             return Response(invoice_data, status=status.HTTP_200_OK)
         except Invoice.DoesNotExist:
             return Response({"error": "Invoice not found."}, status=status.HTTP_404_NOT_FOUND)
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     def list_invoices(self, request):
         try:
@@ -182,44 +202,61 @@ class StripeCheckoutViewSet(viewsets.ViewSet):
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-# GỬI MAIL THÔNG BÁO ỨNG TUYỂN
-def send_application_status_email(jobseeker, job, status):
-    subject = f'Thông báo kết quả ứng tuyển vị trí "{job.title}"'
-    context = {
-        'jobseeker': jobseeker,
-        'job': job,
-        'status': status
-    }
+# Webhook của Stripe: xác thực chữ ký rồi cập nhật hóa đơn (idempotent theo stripe_session_id)
+class StripeWebhookViewSet(viewsets.ViewSet):
+    authentication_classes = []
+    permission_classes = [AllowAny]
 
-    message = render_to_string('email/send_email.txt', context)
-    email_from = settings.EMAIL_HOST_USER
-    recipient_list = [jobseeker.user.email]
+    def create(self, request):
+        try:
+            event = payments.construct_event(request.body, request.META.get('HTTP_STRIPE_SIGNATURE', ''))
+        except (ValueError, stripe.SignatureVerificationError):
+            return Response({"error": "Invalid payload or signature."}, status=status.HTTP_400_BAD_REQUEST)
+        except ImproperlyConfigured:
+            # Chưa cấu hình secret: không xử lý sự kiện, Stripe sẽ gửi lại khi endpoint hoạt động
+            return Response({"error": "Webhook is not configured."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
-    send_mail(subject, message, email_from, recipient_list)
+        payments.handle_event(event)
+        return Response({"received": True}, status=status.HTTP_200_OK)
 
 
-class JobViewSet(viewsets.ModelViewSet):
+class JobViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Job.objects.filter(active=True).order_by('id')
     queryset = Job.objects.order_by('id')
     serializer_class = serializers.JobSerializer
 
     # Thiết lập lớp phân trang (pagination class) cho một API view cụ thể.
     pagination_class = paginators.JobPaginator
+    # Phân trang con trỏ khi client gửi ?pagination=cursor
+    cursor_pagination_class = paginators.JobCursorPaginator
 
     filter_backends = [DjangoFilterBackend]
     filterset_class = JobFilter
 
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            self._paginator = paginators.get_paginator(self.request, self.pagination_class,
+                                                       self.cursor_pagination_class)
+        return self._paginator
+
     # parser_classes = [parsers.MultiPartParser, ]
     def get_permissons(self):
         if self.action in ['destroy']:
             return [perms.EmIsAuthenticated()]
         return [permissions.AllowAny()]
 
+    # Các action trả về bài đăng kèm cờ liked của user hiện tại
+    liked_actions = ['list', 'retrieve', 'add_like', 'check_like']
+
     #ghi đè json
     def get_serializer_class(self):
         if self.action == 'create':
             return serializers.JobCreateSerializer
 
+        if self.action in ['list', 'retrieve'] and self.request and self.request.user.is_authenticated:
+            return serializers.AuthenticatedJobSerializer
+
         if self.action == 'create_rating':
             return serializers.RatingSerializer
 
@@ -249,68 +286,71 @@ class JobViewSet(viewsets.ModelViewSet):
 
         # Kiểm tra nếu hành động là 'list' (tức là yêu cầu danh sách các bài đăng)
         if self.action == 'list':
+            q = self.request.query_params.get('q')
             title = self.request.query_params.get('title')
             company_id = self.request.query_params.get('company_id')
             career = self.request.query_params.get('career')
             employment_type = self.request.query_params.get('employmenttype')
             location = self.request.query_params.get('location')
 
-            # Lọc theo tiêu đề
-            if title:
-                queries = queries.filter(title__icontains=title)
+            # Tìm kiếm toàn văn theo từ khóa, tiêu đề và địa điểm (chỉ mục FULLTEXT, không phân biệt dấu)
+            search_terms = ' '.join(term for term in [q, title, location] if term)
+            if search_terms:
+                queries = search.search_jobs(queries, search_terms)
 
             # Lọc theo id của nhà tuyển dụng
             if company_id:
                 queries = queries.filter(company_id=company_id)
 
-            # Lọc theo ngành nghề
+            # Lọc theo ngành nghề (tra bảng Career trong jobs.refdata rồi lọc theo khóa ngoại)
             if career:
-                queries = queries.filter(career__name__icontains=career)
+                queries = queries.filter(career_id__in=refdata.search_ids(Career, 'name', career))
 
             # Lọc theo loại hình công việc
             if employment_type:
-                queries = queries.filter(employmenttype__type__icontains=employment_type)
+                queries = queries.filter(
+                    employmenttype_id__in=refdata.search_ids(EmploymentType, 'type', employment_type))
+
+        if self.action in self.liked_actions and self.request.user.is_authenticated:
+            queries = dao.annotate_liked(queries, self.request.user)
+
+        return self.setup_eager_loading(queries)
 
-            # Lọc theo địa điểm
-            if location:
-                queries = queries.filter(location__icontains=location)
+    # Người dùng chưa đăng nhập dùng chung response đã cache
+    @cache_response('jobs')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
+    # Nạp sẵn các quan hệ theo serializer của action hiện tại (chỉ khi serializer serialize Job)
+    def setup_eager_loading(self, queries):
+        serializer_class = self.get_serializer_class()
+        if issubclass(serializer_class, serializers.EagerLoadingMixin) and serializer_class.Meta.model is Job:
+            queries = serializer_class.setup_eager_loading(queries)
         return queries
 
 
     #TẠO BÀI TUYỂN DỤNG
     def create(self, request, *args, **kwargs):
         user_id = request.user.id
-        today_date = datetime.now().date()
-        redis_key = f"job_posted:{user_id}:{today_date}"
 
-        # Truy vấn hóa đơn gần nhất của người dùng
-        invoice = get_latest_paid_invoice(user_id)
-
-        # Kiểm tra nếu không có hóa đơn hoặc hóa đơn đã hết hạn
-        if not invoice or invoice.is_expired:
-            daily_post_limit = 1  # Chỉ được đăng 1 bài khi không có gói hợp lệ
-        else:
-            daily_post_limit = invoice.daily_post_limit  # Lấy số lượng bài đăng từ hóa đơn
-
-        # Kiểm tra số bài đã đăng trong ngày qua Redis
-        current_post_count = redis_client.get(redis_key)
-        current_post_count = int(current_post_count) if current_post_count else 0
-
-        if current_post_count >= daily_post_limit:
-            return Response({"detail": f"Đã đạt giới hạn đăng {daily_post_limit} bài trong 1 ngày."},
+        # Đặt chỗ trong giới hạn đăng bài của ngày (kiểm tra và tăng bộ đếm nguyên tử trong Redis)
+        reservation = quota.reserve_post(user_id)
+        if not reservation.allowed:
+            return Response({"detail": f"Đã đạt giới hạn đăng {reservation.limit} bài trong 1 ngày."},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        # Tạo bài đăng tuyển dụng mới
-        job_posting_data = request.data.copy()
-        job_posting_data['company'] = request.user.company.id
-
-        serializer = JobCreateSerializer(data=job_posting_data)
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        try:
+            # Tạo bài đăng tuyển dụng mới
+            job_posting_data = request.data.copy()
+            job_posting_data['company'] = request.user.company.id
 
-        # Cập nhật số lượng bài đã đăng vào Redis
-        redis_client.set(redis_key, current_post_count + 1, ex=timedelta(days=1))
+            serializer = JobCreateSerializer(data=job_posting_data)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        except Exception:
+            # Tạo thất bại thì hoàn lại chỗ đã đặt
+            quota.release_post(user_id)
+            raise
 
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -327,16 +367,10 @@ class JobViewSet(viewsets.ModelViewSet):
     # /recruitments_post/filter_salary/?min_salary=5000000 => bài đăng có mức lương từ 5,000,000 VND trở lên
     # /recruitments_post/filter_salary/?max_salary=10000000 => bài đăng có mức lương dưới 10,000,000 VND
     # /recruitments_post/filter_salary/?min_salary=5000000&max_salary=10000000 => bài đăng có mức lương từ 5000000 đến 10000000
+    # min_salary/max_salary được JobFilter áp dụng trên salary_min/salary_max trong filter_queryset
     @action(detail=False, methods=['get'])
     def filter_salary(self, request):
         queryset = self.filter_queryset(self.get_queryset())
-        min_salary = request.query_params.get('min_salary')
-        max_salary = request.query_params.get('max_salary')
-
-        if min_salary is not None:
-            queryset = queryset.filter(salary__gte=min_salary)
-        if max_salary is not None:
-            queryset = queryset.filter(salary__lte=max_salary)
 
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -356,11 +390,12 @@ class JobViewSet(viewsets.ModelViewSet):
     # API xem danh sách bài đăng tuyển dụng phổ biến (được apply nhiều) (giảm dần theo số lượng apply)
     # /recruitments_post/popular/
     @action(detail=False, methods=['get'])
+    @cache_response('popular')
     def popular(self, request):
         try:
             # Lấy danh sách các bài đăng tuyển dụng được sắp xếp theo số lượng apply giảm dần
             # Truy vấn ngược
-            jobs = dao.recruiment_posts_by_appy()
+            jobs = JobSerializer.setup_eager_loading(dao.recruiment_posts_by_appy())
             # Phân trang cho danh sách bài đăng
             paginator = self.pagination_class()
             paginated_jobs = paginator.paginate_queryset(jobs, request)
@@ -404,7 +439,13 @@ class JobViewSet(viewsets.ModelViewSet):
         except Job.DoesNotExist:
             return Response({"detail": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        job_applications = JobApplication.objects.filter(job=job)
+        job_applications = JobApplicationStatusSerializer.setup_eager_loading(JobApplication.objects.filter(job=job))
+        if paginators.is_cursor_request(request):
+            paginator = paginators.ApplicationCursorPaginator()
+            paginated_applications = paginator.paginate_queryset(job_applications, request)
+            return paginator.get_paginated_response(
+                JobApplicationStatusSerializer(paginated_applications, many=True).data)
+
         serializer = JobApplicationStatusSerializer(job_applications, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -439,14 +480,18 @@ class JobViewSet(viewsets.ModelViewSet):
     def add_like(self, request, pk):
         user = getattr(request.user, 'jobseeker', None) or getattr(request.user, 'company', None)
         if user:
-            li, created = Like.objects.get_or_create(
-                    job=self.get_object(),
-                    **{user.__class__.__name__.lower(): user}
-                )
-            if not created:
-                li.active = not li.active
-                li.save()
-            return Response(AuthenticatedJobSerializer(self.get_object()).data, status=status.HTTP_200_OK)
+            job = self.get_object()
+            with transaction.atomic():
+                li, created = Like.objects.get_or_create(
+                        job=job,
+                        **{user.__class__.__name__.lower(): user}
+                    )
+                if not created:
+                    li.active = not li.active
+                    li.save()
+                dao.update_job_counters(job.id, like_count=1 if li.active else -1)
+            return Response(AuthenticatedJobSerializer(self.get_object(), context={'request': request}).data,
+                            status=status.HTTP_200_OK)
         else:
             return Response({"error": "User is not an applicant or employer."},
                             status=status.HTTP_400_BAD_REQUEST)
@@ -455,12 +500,9 @@ class JobViewSet(viewsets.ModelViewSet):
     # /jobs/<pk>/check_liked/
     @action(methods=['get'], url_path='check_liked', detail=True)
     def check_like(self, request, pk):
+        # Cờ liked đã được annotate trong get_queryset (một truy vấn cùng với việc lấy job)
         job = self.get_object()
-        user = getattr(request.user, 'jobseeker', None) or getattr(request.user, 'company', None)
-        liked = Like.objects.filter(job=job, **{user.__class__.__name__.lower(): user}, active=1).exists()
-        if not liked:
-            return Response({'liked': False}, status=status.HTTP_200_OK)
-        return Response({'liked': True }, status=status.HTTP_200_OK)
+        return Response({'liked': bool(getattr(job, 'liked', False))}, status=status.HTTP_200_OK)
 
 
     # API lấy danh sách các bài yêu thích của user
@@ -468,11 +510,11 @@ class JobViewSet(viewsets.ModelViewSet):
     def get_liked_job(self, request, pk=None):
         try:
             user = getattr(request.user, 'jobseeker', None) or getattr(request.user, 'company', None)
-            liked = Like.objects.filter(
+            liked = LikeSerializer.setup_eager_loading(Like.objects.filter(
                 **{user.__class__.__name__.lower(): user},
                 active=True
-            )
-            paginator = LikedJobPagination()
+            ))
+            paginator = paginators.get_paginator(request, LikedJobPagination, paginators.LikedJobCursorPaginator)
             paginated_liked = paginator.paginate_queryset(liked, request)
 
             return paginator.get_paginated_response(LikeSerializer(paginated_liked, many=True).data)
@@ -499,7 +541,9 @@ class JobViewSet(viewsets.ModelViewSet):
             }
             serializer = JobApplicationSerializer(data=job_application_data)
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+                dao.update_job_counters(job.id, application_count=1)
 
             # Trả về thông tin về ứng tuyển mới được tạo dưới dạng JSON response
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -528,16 +572,23 @@ class JobViewSet(viewsets.ModelViewSet):
                                 status=status.HTTP_403_FORBIDDEN)
 
              # Cập nhật một phần của đơn ứng tuyển
+            notify_status = None
             for k, v in request.data.items():
                 if k == "status":
-                    status_instance = get_object_or_404(Status, role=v)
+                    status_instance = refdata.get_by(Status, 'role', v)
+                    if status_instance is None:
+                        return Response({"error": "Status not found."}, status=status.HTTP_404_NOT_FOUND)
                     setattr(application, k, status_instance)
                     if v in ["Accepted", "Rejected"]:
-                        send_application_status_email(application.jobseeker, job, status_instance)
+                        notify_status = status_instance
                 else:
                     setattr(application, k, v)
             application.save()
 
+            # Gửi mail thông báo ở tác vụ nền
+            if notify_status:
+                tasks.send_application_status_email.delay(application.id, notify_status.id)
+
             return Response({"message": "Job application updated successfully"}, status=status.HTTP_200_OK)
 
         except Job.DoesNotExist:
@@ -547,6 +598,54 @@ class JobViewSet(viewsets.ModelViewSet):
 
 
 
+    # API CẬP NHẬT TRẠNG THÁI NHIỀU ĐƠN ỨNG TUYỂN
+    # /jobs/applications/bulk-status/  body: [{"application_id": 1, "status": "Accepted"}, ...]
+    @action(detail=False, methods=['patch'], url_path='applications/bulk-status', url_name='bulk_update_status',
+            permission_classes=[IsAuthenticated])
+    def bulk_update_application_status(self, request):
+        items = request.data.get('applications') if isinstance(request.data, dict) else request.data
+        input_serializer = serializers.ApplicationStatusUpdateSerializer(data=items, many=True)
+        input_serializer.is_valid(raise_exception=True)
+        updates = {item['application_id']: item['status'] for item in input_serializer.validated_data}
+
+        if not updates:
+            return Response({"error": "No applications to update."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(updates) > BULK_STATUS_MAX_SIZE:
+            return Response({"error": f"At most {BULK_STATUS_MAX_SIZE} applications per request."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        statuses = {s.role: s for s in refdata.get_all(Status) if s.role in set(updates.values())}
+        unknown_statuses = set(updates.values()) - set(statuses)
+        if unknown_statuses:
+            return Response({"error": f"Unknown status: {', '.join(sorted(unknown_statuses))}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # Kiểm tra quyền bằng một truy vấn: chỉ lấy các đơn thuộc bài đăng của nhà tuyển dụng (admin: tất cả)
+        applications = JobApplication.objects.filter(pk__in=updates.keys()).only('id', 'status_id')
+        if not request.user.is_staff:
+            applications = applications.filter(job__company__user=request.user)
+        applications = list(applications)
+
+        missing = set(updates) - {application.id for application in applications}
+        if missing:
+            return Response({"error": "Job applications not found or not owned by you.",
+                             "application_ids": sorted(missing)}, status=status.HTTP_403_FORBIDDEN)
+
+        notifications = []
+        for application in applications:
+            new_status = statuses[updates[application.id]]
+            if application.status_id != new_status.id and new_status.role in ["Accepted", "Rejected"]:
+                notifications.append([application.id, new_status.id])
+            application.status = new_status
+
+        with transaction.atomic():
+            JobApplication.objects.bulk_update(applications, ['status'], batch_size=500)
+            # Gửi mail thông báo theo lô ở tác vụ nền (một kết nối SMTP cho mỗi lô)
+            transaction.on_commit(lambda: tasks.send_application_status_emails_in_batches(notifications))
+
+        return Response({"message": "Job applications updated successfully", "updated": len(applications)},
+                        status=status.HTTP_200_OK)
+
     # API xóa đơn ứng tuyển vào bài đăng tuyển dụng
     # /jobs/{pk}/applications/{application_id}/delete/
     @action(detail=True, methods=['delete'], url_path='applications/(?P<application_id>\d+)/delete',
@@ -570,7 +669,9 @@ class JobViewSet(viewsets.ModelViewSet):
                                 status=status.HTTP_403_FORBIDDEN)
 
             # Xóa đơn ứng tuyển
-            application.delete()
+            with transaction.atomic():
+                application.delete()
+                dao.update_job_counters(job.id, application_count=-1)
             return Response({"message": "Job application deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
 
         except Job.DoesNotExist:
@@ -589,10 +690,11 @@ class JobViewSet(viewsets.ModelViewSet):
 
             if request.method == 'GET':
                 # Lấy danh sách rating của bài đăng
-                ratings = job.rating_set.all()
+                ratings = RatingSerializer.setup_eager_loading(job.rating_set.all())
 
                 # Phân trang danh sách rating
-                paginator = paginators.RatingPaginator()
+                paginator = paginators.get_paginator(request, paginators.RatingPaginator,
+                                                     paginators.RatingCursorPaginator)
                 paginated_ratings = paginator.paginate_queryset(ratings, request)
 
                 # Serialize danh sách rating
@@ -608,12 +710,14 @@ class JobViewSet(viewsets.ModelViewSet):
                     raise PermissionDenied("Chỉ JobSeeker mới được phép tạo đánh giá.")
 
                 # Tạo một đánh giá mới
-                rating = Rating.objects.create(
-                    job=job,
-                    jobseeker=jobseeker,
-                    rating=request.data.get('rating'),
-                    comment=request.data.get('comment'),
-                )
+                with transaction.atomic():
+                    rating = Rating.objects.create(
+                        job=job,
+                        jobseeker=jobseeker,
+                        rating=request.data.get('rating'),
+                        comment=request.data.get('comment'),
+                    )
+                    dao.update_job_counters(job.id, rating_count=1, rating_sum=int(rating.rating))
                 serializer = RatingSerializer(rating)
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -638,9 +742,12 @@ class JobViewSet(viewsets.ModelViewSet):
                             status=status.HTTP_403_FORBIDDEN)
 
             # Serialize và trả về thông tin cập nhật của rating
+            old_rating = rating.rating
             serializer = RatingSerializer(rating, data=request.data, partial=True)
             if serializer.is_valid():
-                serializer.save()
+                with transaction.atomic():
+                    serializer.save()
+                    dao.update_job_counters(job.id, rating_sum=serializer.instance.rating - old_rating)
                 return Response(serializer.data, status=status.HTTP_200_OK)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -674,7 +781,9 @@ class JobViewSet(viewsets.ModelViewSet):
                                 status=status.HTTP_403_FORBIDDEN)
 
             # Xóa rating
-            rating.delete()
+            with transaction.atomic():
+                rating.delete()
+                dao.update_job_counters(job.id, rating_count=-1, rating_sum=-rating.rating)
 
             return Response({"message": "Rating deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
 
@@ -819,15 +928,13 @@ class UserViewSet(viewsets.ViewSet, generics.CreateAPIView, generics.ListAPIView
                 user = User.objects.create(
                     username=user_name,
                     email=user_email,
-                    avatar=utils.upload_image_from_url(user_avatar),
                     role=0  # Gán role = 0 mặc định cho người dùng mới
                 )
                 created = True  # Đánh dấu là người dùng mới được tạo
 
-                # Nếu người dùng đã tồn tại, không cần tạo mới, chỉ cần cập nhật avatar nếu cần
-            else:
-                user.avatar = utils.upload_image_from_url(user_avatar)
-                user.save()
+            # Tải avatar Google lên Cloudinary ở tác vụ nền (cả người dùng mới và đã tồn tại)
+            if user_avatar:
+                tasks.upload_user_avatar.delay(user.id, user_avatar)
 
             access_token, refresh_token = utils.create_user_token(user=user)
             if not access_token or not refresh_token:
@@ -855,7 +962,7 @@ class UserViewSet(viewsets.ViewSet, generics.CreateAPIView, generics.ListAPIView
                             status=status.HTTP_400_BAD_REQUEST)
 
 
-class CompanyViewSet(viewsets.ViewSet, generics.ListAPIView, generics.RetrieveAPIView, generics.CreateAPIView, generics.UpdateAPIView):
+class CompanyViewSet(ReplicaReadMixin, viewsets.ViewSet, generics.ListAPIView, generics.RetrieveAPIView, generics.CreateAPIView, generics.UpdateAPIView):
     queryset = Company.objects.all()
     serializer_class = serializers.CompanySerializer
 
@@ -863,7 +970,7 @@ class CompanyViewSet(viewsets.ViewSet, generics.ListAPIView, generics.RetrieveAP
         if self.action == 'get_list_job':
             return serializers.JobSerializer
         if self.action == 'list_applications':
-            return JobApplicationStatusSerializer
+            return serializers.CompanyApplicationSerializer
         else:
             return serializers.CompanySerializer
 
@@ -879,23 +986,98 @@ class CompanyViewSet(viewsets.ViewSet, generics.ListAPIView, generics.RetrieveAP
             return Response({'detail': 'User is not a verified company.'}, status=status.HTTP_403_FORBIDDEN)
 
     # API lấy danh sách đơn ứng tuyển vào các job của NTD tạo ra
+    # Lọc: ?job=1,2&status=Pending&date_from=2024-10-01&date_to=2024-10-31
+    # Mặc định trả về cả danh sách như trước; ?pagination=page|cursor: bản rút gọn có phân trang, mới nhất trước,
+    # mỗi đơn chỉ chứa id của job, thông tin job nằm trong từ điển "jobs" của trang
     @action(detail=False, methods=['get'])
     def list_applications(self, request):
         user = request.user
         if not hasattr(user, 'company'):  # Nếu không phải là công ty
             return Response({'detail': 'User is not  an Employer'}, status=status.HTTP_403_FORBIDDEN)
 
-        # Lấy công ty của người dùng
+        # Lấy các đơn ứng tuyển vào các công việc của công ty
+        applications = JobApplication.objects.filter(job__company_id=user.company.id)
+
+        job_ids = request.query_params.get('job')
+        if job_ids:
+            try:
+                applications = applications.filter(job_id__in=[int(i) for i in job_ids.split(',')])
+            except ValueError:
+                return Response({'detail': 'job must be a comma separated list of ids'},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        status_role = request.query_params.get('status')
+        if status_role:
+            status_instance = refdata.get_by(Status, 'role', status_role)
+            applications = applications.filter(status_id=status_instance.id) if status_instance \
+                else applications.none()
+
+        # Lọc theo khoảng ngày bằng mốc thời gian (dùng được chỉ mục trên date, không cần hàm DATE())
+        for param, lookup, days in (('date_from', 'date__gte', 0), ('date_to', 'date__lt', 1)):
+            value = request.query_params.get(param)
+            if value:
+                date = parse_date(value)
+                if date is None:
+                    return Response({'detail': f'{param} must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+                start = timezone.make_aware(datetime.combine(date + timedelta(days=days), datetime.min.time()))
+                applications = applications.filter(**{lookup: start})
+
+        if not paginators.is_paginated_request(request):
+            applications = JobApplicationStatusSerializer.setup_eager_loading(applications)
+            return Response(JobApplicationStatusSerializer(applications, many=True).data, status=status.HTTP_200_OK)
+
+        applications = serializers.CompanyApplicationSerializer.setup_eager_loading(
+            applications.order_by('-date', '-id'))
+        paginator = paginators.get_paginator(request, paginators.CompanyApplicationPagination,
+                                             paginators.CompanyApplicationCursorPaginator)
+        page = paginator.paginate_queryset(applications, request)
+
+        # Các job xuất hiện trong trang, một truy vấn
+        jobs = Job.objects.filter(pk__in={application.job_id for application in page}) \
+            .only('id', 'title', 'deadline', 'active', 'application_count')
+        response = paginator.get_paginated_response(
+            serializers.CompanyApplicationSerializer(page, many=True).data)
+        response.data['jobs'] = {job.id: serializers.JobSummarySerializer(job).data for job in jobs}
+        return response
+
+
+    # API bảng tổng hợp ứng viên: số đơn theo trạng thái (Pending/Accepted/Rejected) và số đơn mới
+    # từ lần xem trước của mỗi job, một truy vấn cho cả bảng
+    # Xem chi tiết: /companies/list_applications/?job=<id>&status=<role>&pagination=page
+    @action(detail=False, methods=['get'])
+    def pipeline(self, request):
+        user = request.user
+        if not hasattr(user, 'company'):  # Nếu không phải là công ty
+            return Response({'detail': 'User is not  an Employer'}, status=status.HTTP_403_FORBIDDEN)
+
         company = user.company
-        # Lấy tất cả các công việc của công ty
-        jobs = Job.objects.filter(company=company)
-        # Lấy tất cả các ứng viên ứng tuyển vào các công việc của công ty
-        applications = JobApplication.objects.filter(job__in=jobs)
-        serializer = self.get_serializer(applications, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        since = company.applications_seen_at
+        statuses = refdata.get_all(Status)
+        rows = list(dao.get_applicant_pipeline(company.id, statuses, since))
+
+        # Số đơn theo trạng thái nằm trong "statuses", khóa là tên role viết thường
+        totals = {'total': 0, 'new': 0, 'statuses': {}}
+        for row in rows:
+            row['deadline'] = row['deadline'].strftime("%d/%m/%Y") if row['deadline'] else None
+            row['statuses'] = {}
+            for status_instance in statuses:
+                count = row.pop(dao.pipeline_status_key(status_instance))
+                if not status_instance.role:
+                    continue
+                role = status_instance.role.lower()
+                row['statuses'][role] = row['statuses'].get(role, 0) + count
+                totals['statuses'][role] = totals['statuses'].get(role, 0) + count
+            totals['total'] += row['total']
+            totals['new'] += row['new']
+
+        # Ghi nhận lần xem này (update trực tiếp, không phát signal của Company)
+        Company.objects.filter(pk=company.pk).update(applications_seen_at=timezone.now())
+
+        return Response({'since': since, 'totals': totals, 'jobs': rows}, status=status.HTTP_200_OK)
 
 
     # API xem danh sách các bài tuyển dụng mà user đó đã đăng (khi user là 1 employer)
+    # Mặc định trả về cả danh sách; phân trang khi client gửi ?pagination=page hoặc ?pagination=cursor
     @action(methods=['get'], detail=False, url_path='list_job')
     def get_list_job(self, request, pk=None):
         user = request.user
@@ -904,13 +1086,17 @@ class CompanyViewSet(viewsets.ViewSet, generics.ListAPIView, generics.RetrieveAP
         if not hasattr(user, 'company'):
             return Response({'error': 'User is not an Employer'}, status=status.HTTP_400_BAD_REQUEST)
 
-        jobs = Job.objects.filter(company__user=user)
-        serializer = JobSerializer(jobs, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        jobs = JobSerializer.setup_eager_loading(Job.objects.filter(company__user=user))
+        if not paginators.is_paginated_request(request):
+            return Response(JobSerializer(jobs, many=True).data, status=status.HTTP_200_OK)
 
+        paginator = paginators.get_paginator(request, paginators.JobPaginator, paginators.JobDeadlineCursorPaginator)
+        paginated_jobs = paginator.paginate_queryset(jobs, request)
+        return paginator.get_paginated_response(JobSerializer(paginated_jobs, many=True).data)
 
 
-class JobSeekerViewSet(viewsets.ViewSet, generics.ListAPIView, generics.RetrieveAPIView, generics.UpdateAPIView):
+
+class JobSeekerViewSet(ReplicaReadMixin, viewsets.ViewSet, generics.ListAPIView, generics.RetrieveAPIView, generics.UpdateAPIView):
     queryset = JobSeeker.objects.all()
     serializer_class = serializers.JobSeekerSerializer
     # Thiết lập lớp phân trang (pagination class) cho một API view cụ thể.
@@ -967,25 +1153,71 @@ class JobSeekerViewSet(viewsets.ViewSet, generics.ListAPIView, generics.Retrieve
         if not hasattr(user, 'jobseeker'):
             return Response({'error': 'User is not an Job Seeker'}, status=status.HTTP_400_BAD_REQUEST)
 
-        jobapplications = JobApplication.objects.filter(jobseeker__user=user, job__active=True)
+        jobapplications = JobApplicationStatusSerializer.setup_eager_loading(
+            JobApplication.objects.filter(jobseeker__user=user, job__active=True))
+        if paginators.is_cursor_request(request):
+            paginator = paginators.ApplicationCursorPaginator()
+            paginated_applications = paginator.paginate_queryset(jobapplications, request)
+            return paginator.get_paginated_response(
+                JobApplicationStatusSerializer(paginated_applications, many=True).data)
+
         serializer = JobApplicationStatusSerializer(jobapplications, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class CareerViewSet(viewsets.ViewSet, generics.ListAPIView, generics.RetrieveAPIView):
+class CareerViewSet(ReplicaReadMixin, viewsets.ViewSet, generics.ListAPIView, generics.RetrieveAPIView):
     queryset = Career.objects.all()
     serializer_class = serializers.CareerSerializer
 
+    @cache_response('career')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
-class EmploymentTypeViewSet(viewsets.ViewSet, generics.ListAPIView, generics.RetrieveAPIView):
+class EmploymentTypeViewSet(ReplicaReadMixin, viewsets.ViewSet, generics.ListAPIView, generics.RetrieveAPIView):
     queryset = EmploymentType.objects.all()
     serializer_class = serializers.EmploymentTypeSerializer
 
+    @cache_response('employmenttype')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
-class AreaViewSet(viewsets.ViewSet, generics.ListAPIView, generics.RetrieveAPIView):
+
+class AreaViewSet(ReplicaReadMixin, viewsets.ViewSet, generics.ListAPIView, generics.RetrieveAPIView):
     queryset = Area.objects.all()
     serializer_class = serializers.AreaSerializer
 
+    @cache_response('area')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+# Hộp thư chat của người dùng đang đăng nhập, phân trang cursor theo hoạt động gần nhất
+class RoomViewSet(viewsets.ViewSet, generics.ListAPIView):
+    serializer_class = serializers.RoomInboxSerializer
+    pagination_class = paginators.RoomCursorPaginator
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return dao.get_chat_inbox(self.request.user.id)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['user_id'] = self.request.user.id
+        return context
+
+    # Đánh dấu đã đọc tới message_id (mặc định là tin nhắn cuối của phòng)
+    @action(methods=['post'], url_path='read', detail=True)
+    def mark_read(self, request, pk=None):
+        room = get_object_or_404(self.get_queryset(), pk=pk)
+        message_id = request.data.get('message_id') or room.last_message_id
+        if message_id:
+            try:
+                dao.mark_room_read(room.id, request.user.id, int(message_id))
+            except (TypeError, ValueError):
+                return Response({"detail": "message_id không hợp lệ."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 
 # class SkillViewSet(viewsets.ViewSet, generics.ListAPIView, generics.RetrieveAPIView):
 #     queryset = Skill.objects.all()